@@ -2,36 +2,517 @@
 
 from reportlab.lib.pagesizes import A4
 from reportlab.lib.units import cm, mm
-from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer, Image
+from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer, Image, Flowable, Frame
 from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
 from reportlab.lib.enums import TA_CENTER, TA_LEFT
 from reportlab.lib import colors
-from reportlab.graphics.shapes import Drawing, Line, Rect
-from reportlab.graphics import renderPDF
+from reportlab import rl_config
+from reportlab.pdfgen.canvas import Canvas
+from reportlab.lib.utils import simpleSplit
+from reportlab.pdfbase.pdfmetrics import stringWidth
 from io import BytesIO
-from datetime import datetime
+from functools import lru_cache
+from config import get_settings
+from typing import List, Optional, Tuple
 import logging
 import os
+import threading
 
 logger = logging.getLogger("admit_card")
 
+# Write binary streams: ASCII85 adds 25% to every embedded image and its
+# pure-Python encoder dominated per-card render time
+rl_config.useA85 = 0
+
 # Get the directory where this file is located
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 ASSETS_DIR = os.path.join(BASE_DIR, "assets")
 LOGO_PATH = os.path.join(ASSETS_DIR, "pw-logo.PNG")
 
+# Logo is drawn at 18cm x 3cm; 150 dpi is plenty for print and keeps the card small
+LOGO_WIDTH = 18 * cm
+LOGO_HEIGHT = 3 * cm
+LOGO_DPI = 150
+LOGO_JPEG_QUALITY = 85
+
+# Bump whenever the rendered output changes so cached PDFs are not reused
+TEMPLATE_VERSION = "2026.2"
+
+# Name of the form XObject holding the fixed layout inside each PDF
+STATIC_FORM_NAME = "AdmitCardStatic"
+
+# (field key, label) in the order they appear on the card
+FIELD_LABELS = [
+    ("roll_no", "Roll No."),
+    ("name", "Name of the Student"),
+    ("father_name", "Father's Name"),
+    ("current_class", "Current Class"),
+    ("medium", "Medium"),
+    ("course", "Course Opted for"),
+    ("exam_centre", "Exam Centre"),
+    ("exam_date", "Date of Exam"),
+    ("exam_time", "Exam Time"),
+]
+
+INSTRUCTIONS = [
+    "1. This admit card must be brought to the examination centre.",
+    "2. Arrive at the examination centre 30 minutes before the examination starts.",
+    "3. Carry a valid identity proof (Aadhar/School ID) along with this admit card.",
+    "4. Write your roll number on OMR sheet.",
+    "5. Follow all instructions given by the invigilator.",
+    "6. Any malpractice will result in disqualification.",
+    "7. Mobile phones and electronic devices are strictly prohibited inside the exam hall.",
+    "8. Carry a Blue / Black ball point pen."
+]
+
+# Field table geometry (shared by the platypus story and the template overlay)
+FIELD_COL_WIDTHS = [5 * cm, 12 * cm]
+FIELD_CELL_PADDING = 6
+FIELD_TOP_PADDING = 6
+FIELD_BOTTOM_PADDING = 3
+FIELD_FONT_SIZE = 12
+# Values too long for one line wrap onto two at this size, which is the
+# largest whose two lines fit in a field row, shrinking no further than
+# FIELD_MIN_FONT_SIZE; anything longer is narrowed, never made smaller
+FIELD_WRAP_FONT_SIZE = 9
+FIELD_MIN_FONT_SIZE = 8
+FIELD_LINE_SPACING = 1.15
+
+
+@lru_cache()
+def _load_logo() -> Optional[bytes]:
+    """
+    Load the header logo once per process, downsampled and recompressed as JPEG.
+
+    The source PNG is ~1500px wide with an alpha channel, which reportlab would
+    otherwise re-encode losslessly into every single card.
+
+    Returns:
+        Image bytes ready for embedding, or None if the logo is unavailable
+    """
+    if not os.path.exists(LOGO_PATH):
+        return None
+
+    try:
+        from PIL import Image as PILImage
+
+        with PILImage.open(LOGO_PATH) as src:
+            src = src.convert("RGBA")
+            # Flatten onto the white page background; JPEG has no alpha
+            flat = PILImage.new("RGB", src.size, (255, 255, 255))
+            flat.paste(src, mask=src.split()[3])
+
+        target = (
+            round(LOGO_WIDTH / 72 * LOGO_DPI),
+            round(LOGO_HEIGHT / 72 * LOGO_DPI)
+        )
+        if flat.width > target[0] or flat.height > target[1]:
+            flat = flat.resize(target, PILImage.LANCZOS)
+
+        out = BytesIO()
+        flat.save(out, format="JPEG", quality=LOGO_JPEG_QUALITY, optimize=True)
+        logger.info(f"Admit card logo prepared: {flat.width}x{flat.height}, {out.tell()} bytes")
+        return out.getvalue()
+    except ImportError:
+        with open(LOGO_PATH, "rb") as f:
+            return f.read()
+    except Exception as e:
+        logger.warning(f"Could not load logo: {e}")
+        return None
+
+
+@lru_cache()
+def _get_styles() -> dict:
+    """Build the paragraph styles once; they are read-only during rendering."""
+    styles = getSampleStyleSheet()
+    return {
+        "header": ParagraphStyle(
+            'Header',
+            parent=styles['Heading1'],
+            fontSize=18,
+            textColor=AdmitCardGenerator.RED_COLOR,
+            alignment=TA_CENTER,
+            fontName='Helvetica-Bold',
+            spaceAfter=6
+        ),
+        "main_title": ParagraphStyle(
+            'MainTitle',
+            parent=styles['Heading2'],
+            fontSize=12,
+            textColor=AdmitCardGenerator.DARK_TEXT,
+            alignment=TA_CENTER,
+            fontName='Helvetica-Bold',
+            spaceAfter=4
+        ),
+        "admit_title": ParagraphStyle(
+            'AdmitTitle',
+            parent=styles['Heading1'],
+            fontSize=22,
+            textColor=AdmitCardGenerator.RED_COLOR,
+            alignment=TA_CENTER,
+            fontName='Helvetica-Bold',
+            spaceAfter=8
+        ),
+        "photo_box": ParagraphStyle(
+            'PhotoBox',
+            parent=styles['Normal'],
+            fontSize=9,
+            textColor=AdmitCardGenerator.DARK_TEXT,
+            alignment=TA_CENTER,
+            leading=12
+        ),
+        "field_label": ParagraphStyle(
+            'FieldLabel',
+            parent=styles['Normal'],
+            fontSize=FIELD_FONT_SIZE,
+            textColor=colors.black,
+            fontName='Helvetica-Bold'
+        ),
+        "field_value": ParagraphStyle(
+            'FieldValue',
+            parent=styles['Normal'],
+            fontSize=FIELD_FONT_SIZE,
+            textColor=AdmitCardGenerator.DARK_TEXT,
+            fontName='Helvetica'
+        ),
+        "instructions_title": ParagraphStyle(
+            'InstructionsTitle',
+            parent=styles['Heading2'],
+            fontSize=11,
+            textColor=AdmitCardGenerator.RED_COLOR,
+            spaceAfter=6,
+            fontName='Helvetica-Bold'
+        ),
+        "instructions_text": ParagraphStyle(
+            'InstructionsText',
+            parent=styles['Normal'],
+            fontSize=9,
+            spaceAfter=2,
+            leftIndent=0.3 * cm,
+            textColor=AdmitCardGenerator.DARK_TEXT
+        ),
+    }
+
+
+def _build_story(fields: Optional[dict] = None) -> list:
+    """
+    Build the platypus story for one admit card.
+
+    Args:
+        fields: Field values keyed as in FIELD_LABELS. When None, the value
+            cells are left empty so the story describes only the fixed layout.
+
+    Returns:
+        List of flowables
+    """
+    styles = _get_styles()
+    story = []
+
+    # ===== HEADER WITH LOGO =====
+    logo_bytes = _load_logo()
+    if logo_bytes:
+        logo = Image(BytesIO(logo_bytes), width=LOGO_WIDTH, height=LOGO_HEIGHT)
+        logo.hAlign = 'CENTER'
+        story.append(logo)
+    else:
+        # Fallback header text
+        story.append(Paragraph("SVPS &nbsp;&nbsp;&nbsp; PW VIDYAPEETH", styles["header"]))
+
+    # ===== MAIN TITLE =====
+    story.append(Paragraph("PHYSICS WALLAH NATIONAL SCHOLARSHIP CUM ADMISSION TEST - 2026", styles["main_title"]))
+
+    # ===== PWNSAT (Admit Card) =====
+    story.append(Paragraph("PWNSAT (Admit Card)", styles["admit_title"]))
+
+    # ===== PHOTO BOX (centered) =====
+    photo_text = Paragraph(
+        "Affix your<br/>recent passport<br/>size colour<br/>photograph<br/>here.",
+        styles["photo_box"]
+    )
+
+    story.append(Spacer(1, 1.3 * cm))
+
+    photo_table = Table([[photo_text]], colWidths=[4*cm], rowHeights=[3*cm])
+    photo_table.setStyle(TableStyle([
+        ('BOX', (0, 0), (0, 0), 1, colors.black),
+        ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
+        ('ALIGN', (0, 0), (0, 0), 'CENTER'),
+    ]))
+    photo_table.hAlign = 'CENTER'
+    story.append(photo_table)
+
+    story.append(Spacer(1, 1.3 * cm))
+
+    # ===== FORM FIELDS WITH UNDERLINES =====
+    for key, label in FIELD_LABELS:
+        value = AdmitCardGenerator.display_value(key, fields[key]) if fields is not None else ""
+        field_data = [[
+            Paragraph(f"<b>{label}</b>", styles["field_label"]),
+            Paragraph(value, styles["field_value"])
+        ]]
+
+        field_table = Table(field_data, colWidths=FIELD_COL_WIDTHS)
+        field_table.setStyle(TableStyle([
+            ('VALIGN', (0, 0), (-1, -1), 'BOTTOM'),
+            ('ALIGN', (0, 0), (0, 0), 'LEFT'),
+            ('ALIGN', (1, 0), (1, 0), 'LEFT'),
+            ('LINEBELOW', (1, 0), (1, 0), 1, colors.black),
+            ('TOPPADDING', (0, 0), (-1, -1), FIELD_TOP_PADDING),
+            ('BOTTOMPADDING', (0, 0), (-1, -1), FIELD_BOTTOM_PADDING),
+        ]))
+        field_table._admit_field = key
+        story.append(field_table)
+
+    story.append(Spacer(1, 1.4 * cm))
+
+    # ===== INSTRUCTIONS SECTION =====
+    story.append(Paragraph("INSTRUCTIONS FOR CANDIDATES", styles["instructions_title"]))
+    for instruction in INSTRUCTIONS:
+        story.append(Paragraph(instruction, styles["instructions_text"]))
+
+    story.append(Spacer(1, 1.5 * cm))
+
+    # ===== SIGNATURE SECTION =====
+    signature_data = [
+        ['_______________________', '_______________________'],
+        ["Student's Signature", "Authorized Signature"]
+    ]
+
+    signature_table = Table(
+        signature_data,
+        colWidths=[9 * cm, 9 * cm]
+    )
+    signature_table.setStyle(TableStyle([
+        ('FONT', (0, 0), (-1, -1), 'Helvetica', 10),
+        ('TOPPADDING', (0, 0), (-1, -1), 4),
+        ('BOTTOMPADDING', (0, 0), (-1, -1), 2),
+        ('HALIGN', (0, 0), (-1, -1), 'CENTER'),
+    ]))
+    story.append(signature_table)
+
+    return story
+
+
+def _fit_value(text: str, width: float) -> Tuple[float, List[str]]:
+    """
+    Choose the font size and lines for a field value in the template overlay.
+
+    Args:
+        text: Value to print
+        width: Width of the value slot
+
+    Returns:
+        (font size, one or two lines); a line may still be wider than the
+        slot at FIELD_MIN_FONT_SIZE and is then drawn narrowed
+    """
+    if stringWidth(text, 'Helvetica', FIELD_FONT_SIZE) <= width:
+        return FIELD_FONT_SIZE, [text]
+    size = FIELD_WRAP_FONT_SIZE
+    while True:
+        lines = simpleSplit(text, 'Helvetica', size, width)
+        fits = len(lines) <= 2 and all(stringWidth(line, 'Helvetica', size) <= width for line in lines)
+        if fits or size <= FIELD_MIN_FONT_SIZE:
+            break
+        size -= 0.5
+    if len(lines) > 2:
+        lines = [lines[0], " ".join(lines[1:])]
+    return size, lines
+
+
+class _PlacedFlowable(Flowable):
+    """Wraps a flowable and records where a Frame placed it instead of drawing it."""
+
+    def __init__(self, flowable: Flowable):
+        self.flowable = flowable
+        self.hAlign = getattr(flowable, 'hAlign', 'LEFT')
+        self.position = None
+
+    def wrap(self, availWidth, availHeight):
+        self.width, self.height = self.flowable.wrap(availWidth, availHeight)
+        return self.width, self.height
+
+    def getSpaceBefore(self):
+        return self.flowable.getSpaceBefore()
+
+    def getSpaceAfter(self):
+        return self.flowable.getSpaceAfter()
+
+    def drawOn(self, canvas, x, y, _sW=0):
+        self.position = (self._hAlignAdjust(x, _sW), y)
+
+
+class _StaticLayer:
+    """
+    The fixed parts of the admit card, laid out once.
+
+    Holds the wrapped static flowables with their page positions plus the
+    baseline origin and width of every value slot, so rendering a card only
+    draws the nine field values on top of the shared form.
+    """
+
+    def __init__(self):
+        gen = AdmitCardGenerator
+        frame = Frame(
+            gen.MARGIN,
+            gen.MARGIN,
+            gen.PAGE_WIDTH - 2 * gen.MARGIN,
+            gen.PAGE_HEIGHT - gen.TOP_MARGIN - gen.MARGIN
+        )
+        placed = [_PlacedFlowable(f) for f in _build_story()]
+        # Lay out against a scratch canvas; _PlacedFlowable draws nothing
+        frame.addFromList(list(placed), Canvas(BytesIO(), pagesize=A4))
+
+        self.flowables = []
+        self.slots = {}
+        for p in placed:
+            if p.position is None:
+                raise RuntimeError("Admit card static layout does not fit on one page")
+            self.flowables.append((p.flowable, p.position))
+            key = getattr(p.flowable, '_admit_field', None)
+            if key:
+                x, y = p.position
+                self.slots[key] = (
+                    x + FIELD_COL_WIDTHS[0] + FIELD_CELL_PADDING,
+                    y + FIELD_BOTTOM_PADDING,
+                    FIELD_COL_WIDTHS[1] - 2 * FIELD_CELL_PADDING,
+                )
+
+    def draw(self, canvas: Canvas) -> None:
+        """Draw the static flowables at their precomputed positions."""
+        for flowable, (x, y) in self.flowables:
+            flowable.drawOn(canvas, x, y)
+
+
+# Flowables keep per-draw state on themselves, so each thread gets its own layout
+_static_local = threading.local()
+
+
+def _get_static_layer() -> _StaticLayer:
+    """Return this thread's static layer, laying it out on first use."""
+    layer = getattr(_static_local, "layer", None)
+    if layer is None:
+        layer = _StaticLayer()
+        _static_local.layer = layer
+    return layer
+
 
 class AdmitCardGenerator:
     """Generate PDF admit cards using reportlab - PWNSAT 2026 format."""
-    
+
     PAGE_WIDTH, PAGE_HEIGHT = A4
     MARGIN = 0.8 * cm
     TOP_MARGIN = 0.5 * cm
-    
+
     # Colors matching the design
     RED_COLOR = colors.HexColor('#C41E3A')
     DARK_TEXT = colors.HexColor('#333333')
-    
+
+    @staticmethod
+    def display_value(key: str, value: Optional[str]) -> str:
+        """Return the text printed on the card for a field value."""
+        if key in ("current_class", "exam_time"):
+            return value or "-"
+        return value or ""
+
+    @staticmethod
+    def fields_from_registration(registration) -> dict:
+        """
+        Extract the admit card field values from a Registration row.
+
+        Args:
+            registration: Registration model instance
+
+        Returns:
+            Dict of keyword arguments for generate_pdf
+        """
+        return {
+            "roll_no": registration.roll_no,
+            "name": registration.name,
+            "father_name": registration.father_name,
+            "current_class": registration.current_class or "",
+            "medium": registration.medium,
+            "course": registration.course,
+            "exam_centre": registration.exam_centre,
+            "exam_date": registration.exam_date,
+            "exam_time": registration.exam_time or "",
+        }
+
+    @staticmethod
+    def draw_card(canvas: Canvas, fields: dict) -> None:
+        """
+        Draw one admit card onto the current page of a canvas.
+
+        The fixed layout is emitted once per document as a form XObject and
+        referenced from every page, so multi-card documents stay small.
+
+        Args:
+            canvas: Target reportlab canvas
+            fields: Field values keyed as in FIELD_LABELS
+        """
+        layer = _get_static_layer()
+        if not getattr(canvas, "_admit_static_form", False):
+            canvas.beginForm(STATIC_FORM_NAME)
+            layer.draw(canvas)
+            canvas.endForm()
+            canvas._admit_static_form = True
+        canvas.doForm(STATIC_FORM_NAME)
+
+        canvas.setFillColor(AdmitCardGenerator.DARK_TEXT)
+        for key, _ in FIELD_LABELS:
+            x, y, width = layer.slots[key]
+            text = AdmitCardGenerator.display_value(key, fields.get(key))
+            font_size, lines = _fit_value(text, width)
+            # The last line sits on the underline; a first line goes above it
+            line_y = y + (len(lines) - 1) * font_size * FIELD_LINE_SPACING
+            for line in lines:
+                text_object = canvas.beginText(x, line_y)
+                text_object.setFont('Helvetica', font_size)
+                line_width = stringWidth(line, 'Helvetica', font_size)
+                if line_width > width:
+                    text_object.setHorizScale(100 * width / line_width)
+                text_object.textOut(line)
+                canvas.drawText(text_object)
+                line_y -= font_size * FIELD_LINE_SPACING
+
+    @staticmethod
+    def render_bytes(fields: dict) -> bytes:
+        """
+        Render an admit card and return the PDF bytes.
+
+        Module-level and picklable, so it can be submitted to a process pool.
+
+        Args:
+            fields: Keyword arguments for generate_pdf
+
+        Returns:
+            PDF content as bytes
+        """
+        return AdmitCardGenerator.generate_pdf(**fields).getvalue()
+
+    @staticmethod
+    def render_merged_pdf(cards: List[dict], path: str) -> int:
+        """
+        Render many admit cards into one multi-page PDF file.
+
+        The static layout is stored once and referenced from every page, so
+        each extra card adds well under a kilobyte. Output goes straight to
+        disk rather than into memory.
+
+        Args:
+            cards: Field dicts, one page per entry, in page order
+            path: Destination file path
+
+        Returns:
+            Number of pages written
+        """
+        canvas = Canvas(path, pagesize=A4)
+        for fields in cards:
+            AdmitCardGenerator.draw_card(canvas, fields)
+            canvas.showPage()
+        canvas.save()
+        logger.info(f"Merged admit card PDF generated: {len(cards)} pages")
+        return len(cards)
+
     @staticmethod
     def generate_pdf(
         roll_no: str,
@@ -46,7 +527,7 @@ class AdmitCardGenerator:
     ) -> BytesIO:
         """
         Generate admit card PDF as BytesIO matching PWNSAT 2026 format.
-        
+
         Args:
             roll_no: Student roll number
             name: Student name
@@ -57,226 +538,47 @@ class AdmitCardGenerator:
             exam_centre: Exam centre
             exam_date: Date of exam
             exam_time: Exam time slot
-            
+
         Returns:
             BytesIO object containing PDF
         """
+        fields = {
+            "roll_no": roll_no,
+            "name": name,
+            "father_name": father_name,
+            "current_class": current_class,
+            "medium": medium,
+            "course": course,
+            "exam_centre": exam_centre,
+            "exam_date": exam_date,
+            "exam_time": exam_time,
+        }
+
         try:
-            # Create PDF in memory
             pdf_buffer = BytesIO()
-            doc = SimpleDocTemplate(
-                pdf_buffer,
-                pagesize=A4,
-                rightMargin=AdmitCardGenerator.MARGIN,
-                leftMargin=AdmitCardGenerator.MARGIN,
-                topMargin=AdmitCardGenerator.TOP_MARGIN,
-                bottomMargin=AdmitCardGenerator.MARGIN
-            )
-            
-            # Container for PDF elements
-            story = []
-            styles = getSampleStyleSheet()
-            
-            # ===== HEADER WITH LOGO =====
-            # Check if logo exists
-            if os.path.exists(LOGO_PATH):
-                try:
-                    logo = Image(LOGO_PATH, width=18*cm, height=3*cm)
-                    logo.hAlign = 'CENTER'
-                    story.append(logo)
-                except Exception as e:
-                    logger.warning(f"Could not load logo: {e}")
-                    # Fallback header text
-                    header_style = ParagraphStyle(
-                        'Header',
-                        parent=styles['Heading1'],
-                        fontSize=18,
-                        textColor=AdmitCardGenerator.RED_COLOR,
-                        alignment=TA_CENTER,
-                        fontName='Helvetica-Bold',
-                        spaceAfter=6
-                    )
-                    story.append(Paragraph("SVPS &nbsp;&nbsp;&nbsp; PW VIDYAPEETH", header_style))
+
+            if get_settings().admit_card_template_mode:
+                canvas = Canvas(pdf_buffer, pagesize=A4)
+                AdmitCardGenerator.draw_card(canvas, fields)
+                canvas.showPage()
+                canvas.save()
             else:
-                # Fallback header text
-                header_style = ParagraphStyle(
-                    'Header',
-                    parent=styles['Heading1'],
-                    fontSize=18,
-                    textColor=AdmitCardGenerator.RED_COLOR,
-                    alignment=TA_CENTER,
-                    fontName='Helvetica-Bold',
-                    spaceAfter=6
+                doc = SimpleDocTemplate(
+                    pdf_buffer,
+                    pagesize=A4,
+                    rightMargin=AdmitCardGenerator.MARGIN,
+                    leftMargin=AdmitCardGenerator.MARGIN,
+                    topMargin=AdmitCardGenerator.TOP_MARGIN,
+                    bottomMargin=AdmitCardGenerator.MARGIN
                 )
-                story.append(Paragraph("SVPS &nbsp;&nbsp;&nbsp; PW VIDYAPEETH", header_style))
-            
-            # ===== MAIN TITLE =====
-            main_title_style = ParagraphStyle(
-                'MainTitle',
-                parent=styles['Heading2'],
-                fontSize=12,
-                textColor=AdmitCardGenerator.DARK_TEXT,
-                alignment=TA_CENTER,
-                fontName='Helvetica-Bold',
-                spaceAfter=4
-            )
-            story.append(Paragraph("PHYSICS WALLAH NATIONAL SCHOLARSHIP CUM ADMISSION TEST - 2026", main_title_style))
-            
-            # ===== PWNSAT (Admit Card) =====
-            admit_title_style = ParagraphStyle(
-                'AdmitTitle',
-                parent=styles['Heading1'],
-                fontSize=22,
-                textColor=AdmitCardGenerator.RED_COLOR,
-                alignment=TA_CENTER,
-                fontName='Helvetica-Bold',
-                spaceAfter=8
-            )
-            story.append(Paragraph("PWNSAT (Admit Card)", admit_title_style))
-            
-            # ===== PHOTO BOX (right aligned) =====
-            photo_box_style = ParagraphStyle(
-                'PhotoBox',
-                parent=styles['Normal'],
-                fontSize=9,
-                textColor=AdmitCardGenerator.DARK_TEXT,
-                alignment=TA_CENTER,
-                leading=12
-            )
-            
-            photo_text = Paragraph(
-                "Affix your<br/>recent passport<br/>size colour<br/>photograph<br/>here.",
-                photo_box_style
-            )
-            
-            story.append(Spacer(1, 1.3 * cm))
-            
-            # Create table with photo box centered
-            photo_table_data = [[photo_text]]
-            photo_table = Table(photo_table_data, colWidths=[4*cm], rowHeights=[3*cm])
-            photo_table.setStyle(TableStyle([
-                ('BOX', (0, 0), (0, 0), 1, colors.black),
-                ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
-                ('ALIGN', (0, 0), (0, 0), 'CENTER'),
-            ]))
-            photo_table.hAlign = 'CENTER'
-            story.append(photo_table)
-            
-            story.append(Spacer(1, 1.3 * cm))
-            
-            # ===== FORM FIELDS WITH UNDERLINES =====
-            field_label_style = ParagraphStyle(
-                'FieldLabel',
-                parent=styles['Normal'],
-                fontSize=12,
-                textColor=colors.black,
-                fontName='Helvetica-Bold'
-            )
-            
-            field_value_style = ParagraphStyle(
-                'FieldValue',
-                parent=styles['Normal'],
-                fontSize=12,
-                textColor=AdmitCardGenerator.DARK_TEXT,
-                fontName='Helvetica'
-            )
-            
-            # Create form fields
-            fields = [
-                ("Roll No.", roll_no),
-                ("Name of the Student", name),
-                ("Father's Name", father_name),
-                ("Current Class", current_class or "-"),
-                ("Medium", medium),
-                ("Course Opted for", course),
-                ("Exam Centre", exam_centre),
-                ("Date of Exam", exam_date),
-                ("Exam Time", exam_time or "-"),
-            ]
-            
-            for label, value in fields:
-                # Create row with label and value with underline
-                field_data = [[
-                    Paragraph(f"<b>{label}</b>", field_label_style),
-                    Paragraph(value, field_value_style)
-                ]]
-                
-                field_table = Table(field_data, colWidths=[5*cm, 12*cm])
-                field_table.setStyle(TableStyle([
-                    ('VALIGN', (0, 0), (-1, -1), 'BOTTOM'),
-                    ('ALIGN', (0, 0), (0, 0), 'LEFT'),
-                    ('ALIGN', (1, 0), (1, 0), 'LEFT'),
-                    ('LINEBELOW', (1, 0), (1, 0), 1, colors.black),
-                    ('TOPPADDING', (0, 0), (-1, -1), 6),
-                    ('BOTTOMPADDING', (0, 0), (-1, -1), 3),
-                ]))
-                story.append(field_table)
-            
-            story.append(Spacer(1, 1.4 * cm))
-            
-            # ===== INSTRUCTIONS SECTION =====
-            instructions_title = ParagraphStyle(
-                'InstructionsTitle',
-                parent=styles['Heading2'],
-                fontSize=11,
-                textColor=AdmitCardGenerator.RED_COLOR,
-                spaceAfter=6,
-                fontName='Helvetica-Bold'
-            )
-            story.append(Paragraph("INSTRUCTIONS FOR CANDIDATES", instructions_title))
-            
-            instructions_text = ParagraphStyle(
-                'InstructionsText',
-                parent=styles['Normal'],
-                fontSize=9,
-                spaceAfter=2,
-                leftIndent=0.3 * cm,
-                textColor=AdmitCardGenerator.DARK_TEXT
-            )
-            
-            instructions = [
-                "1. This admit card must be brought to the examination centre.",
-                "2. Arrive at the examination centre 30 minutes before the examination starts.",
-                "3. Carry a valid identity proof (Aadhar/School ID) along with this admit card.",
-                "4. Write your roll number on OMR sheet.",
-                "5. Follow all instructions given by the invigilator.",
-                "6. Any malpractice will result in disqualification.",
-                "7. Mobile phones and electronic devices are strictly prohibited inside the exam hall.",
-                "8. Carry a Blue / Black ball point pen."
-            ]
-            
-            for instruction in instructions:
-                story.append(Paragraph(instruction, instructions_text))
-            
-            story.append(Spacer(1, 1.5 * cm))
-            
-            # ===== SIGNATURE SECTION =====
-            signature_data = [
-                ['_______________________', '_______________________'],
-                ["Student's Signature", "Authorized Signature"]
-            ]
-            
-            signature_table = Table(
-                signature_data,
-                colWidths=[9 * cm, 9 * cm]
-            )
-            signature_table.setStyle(TableStyle([
-                ('FONT', (0, 0), (-1, -1), 'Helvetica', 10),
-                ('TOPPADDING', (0, 0), (-1, -1), 4),
-                ('BOTTOMPADDING', (0, 0), (-1, -1), 2),
-                ('HALIGN', (0, 0), (-1, -1), 'CENTER'),
-            ]))
-            story.append(signature_table)
-            
-            # Build PDF
-            doc.build(story)
-            
+                doc.build(_build_story(fields))
+
             # Reset buffer position
             pdf_buffer.seek(0)
             logger.info(f"Admit card generated for roll_no: {roll_no}")
-            
+
             return pdf_buffer
-            
+
         except Exception as e:
             logger.error(f"Error generating admit card: {str(e)}")
             raise
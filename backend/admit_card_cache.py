@@ -0,0 +1,247 @@
+"""Content-addressed cache for rendered admit card PDFs."""
+
+from collections import OrderedDict
+from pathlib import Path
+from typing import Optional
+from admit_card import AdmitCardGenerator, TEMPLATE_VERSION
+from config import get_settings
+from executor import run_in_thread, run_in_process
+import hashlib
+import json
+import logging
+import os
+import threading
+
+logger = logging.getLogger("admit_card_cache")
+
+CACHE_DIR = Path(__file__).parent / "data" / "admit_card_cache"
+
+
+class AdmitCardCache:
+    """
+    Two-level (memory + disk) LRU cache of admit card PDFs.
+
+    Entries are keyed on a hash of the rendered field values plus the
+    template version, so identical registrations share one rendered card and
+    a layout change never serves stale PDFs.
+    """
+
+    def __init__(self, cache_dir: Path = CACHE_DIR):
+        settings = get_settings()
+        self.enabled = settings.admit_card_cache_enabled
+        self.max_memory_items = settings.admit_card_cache_memory_items
+        self.max_disk_items = settings.admit_card_cache_disk_items
+        self.cache_dir = cache_dir
+
+        self._memory: "OrderedDict[str, bytes]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._disk_count: Optional[int] = None
+        self.stats = {
+            "memory_hits": 0,
+            "disk_hits": 0,
+            "misses": 0,
+            "invalidations": 0,
+        }
+
+    @staticmethod
+    def make_key(fields: dict) -> str:
+        """
+        Build the cache key for a set of admit card fields.
+
+        Args:
+            fields: Field values as passed to AdmitCardGenerator.generate_pdf
+
+        Returns:
+            Hex digest identifying the rendered PDF
+        """
+        mode = "template" if get_settings().admit_card_template_mode else "story"
+        payload = json.dumps(
+            {"v": TEMPLATE_VERSION, "mode": mode, "fields": fields},
+            sort_keys=True,
+            ensure_ascii=False
+        )
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def _path(self, key: str) -> Path:
+        return self.cache_dir / f"{key}.pdf"
+
+    def _remember(self, key: str, pdf: bytes) -> None:
+        """Insert into the in-memory LRU; caller must hold the lock."""
+        self._memory[key] = pdf
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_memory_items:
+            self._memory.popitem(last=False)
+
+    def _write_disk(self, key: str, pdf: bytes) -> None:
+        """Persist an entry atomically and prune the directory when over budget."""
+        try:
+            self.cache_dir.mkdir(parents=True, exist_ok=True)
+            path = self._path(key)
+            tmp = path.with_suffix(f".{os.getpid()}.{threading.get_ident()}.tmp")
+            tmp.write_bytes(pdf)
+            # Replacing an existing entry doesn't add a file
+            added = not path.exists()
+            os.replace(tmp, path)
+        except OSError as e:
+            logger.warning(f"Could not write admit card cache entry: {e}")
+            return
+
+        with self._lock:
+            if self._disk_count is None:
+                self._disk_count = sum(1 for _ in self.cache_dir.glob("*.pdf"))
+            elif added:
+                self._disk_count += 1
+            over_budget = self._disk_count > self.max_disk_items
+
+        if over_budget:
+            self._prune_disk()
+
+    def _touch(self, path: Path) -> None:
+        """Mark a disk entry as used; pruning goes by mtime, as atime is often not kept (noatime/relatime)."""
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+
+    def _prune_disk(self) -> None:
+        """Drop the least recently used files down to 90% of the disk budget."""
+        with self._lock:
+            in_memory = set(self._memory)
+        entries = []
+        for path in self.cache_dir.glob("*.pdf"):
+            try:
+                # Entries served from memory don't touch their file; count them as newest
+                entries.append((path.stem in in_memory, path.stat().st_mtime, path))
+            except OSError:
+                continue
+        entries.sort()
+        keep = int(self.max_disk_items * 0.9)
+        for _, _, path in entries[:max(0, len(entries) - keep)]:
+            path.unlink(missing_ok=True)
+        with self._lock:
+            self._disk_count = min(len(entries), keep)
+        logger.info(f"Admit card disk cache pruned to {keep} entries")
+
+    def lookup(self, fields: dict) -> Optional[bytes]:
+        """
+        Return the cached PDF for the given fields without rendering.
+
+        Args:
+            fields: Field values as passed to AdmitCardGenerator.generate_pdf
+
+        Returns:
+            PDF content as bytes, or None on a miss
+        """
+        if not self.enabled:
+            return None
+
+        key = self.make_key(fields)
+
+        with self._lock:
+            pdf = self._memory.get(key)
+            if pdf is not None:
+                self._memory.move_to_end(key)
+                self.stats["memory_hits"] += 1
+                return pdf
+
+        path = self._path(key)
+        try:
+            pdf = path.read_bytes()
+        except OSError:
+            with self._lock:
+                self.stats["misses"] += 1
+            return None
+        self._touch(path)
+
+        with self._lock:
+            self.stats["disk_hits"] += 1
+            self._remember(key, pdf)
+        return pdf
+
+    def store(self, fields: dict, pdf: bytes) -> None:
+        """
+        Add a freshly rendered PDF to the cache.
+
+        Args:
+            fields: Field values the card was rendered with
+            pdf: PDF content as bytes
+        """
+        if not self.enabled:
+            return
+
+        key = self.make_key(fields)
+        with self._lock:
+            self._remember(key, pdf)
+        self._write_disk(key, pdf)
+
+    def get_pdf(self, fields: dict) -> bytes:
+        """
+        Return the PDF for the given fields, rendering it on a miss.
+
+        Args:
+            fields: Field values as passed to AdmitCardGenerator.generate_pdf
+
+        Returns:
+            PDF content as bytes
+        """
+        pdf = self.lookup(fields)
+        if pdf is None:
+            pdf = AdmitCardGenerator.render_bytes(fields)
+            self.store(fields, pdf)
+        return pdf
+
+    async def get_pdf_async(self, fields: dict) -> bytes:
+        """
+        Like get_pdf, for async routes: cache I/O runs in the thread pool and
+        rendering in the process pool.
+
+        Args:
+            fields: Field values as passed to AdmitCardGenerator.generate_pdf
+
+        Returns:
+            PDF content as bytes
+        """
+        pdf = await run_in_thread(self.lookup, fields)
+        if pdf is None:
+            pdf = await run_in_process(AdmitCardGenerator.render_bytes, fields)
+            await run_in_thread(self.store, fields, pdf)
+        return pdf
+
+    def invalidate(self, fields: dict) -> None:
+        """
+        Drop the cached PDF for a set of fields (e.g. before a registration edit).
+
+        Args:
+            fields: Field values the card was rendered with
+        """
+        if not self.enabled:
+            return
+
+        key = self.make_key(fields)
+        with self._lock:
+            self._memory.pop(key, None)
+            self.stats["invalidations"] += 1
+        try:
+            self._path(key).unlink()
+            with self._lock:
+                if self._disk_count:
+                    self._disk_count -= 1
+        except FileNotFoundError:
+            pass
+        except OSError as e:
+            logger.warning(f"Could not remove admit card cache entry: {e}")
+
+    def get_stats(self) -> dict:
+        """Return hit/miss counters and current sizes."""
+        with self._lock:
+            stats = dict(self.stats)
+            stats["memory_items"] = len(self._memory)
+            stats["disk_items"] = self._disk_count
+        lookups = stats["memory_hits"] + stats["disk_hits"] + stats["misses"]
+        stats["hit_ratio"] = round((lookups - stats["misses"]) / lookups, 4) if lookups else 0.0
+        stats["template_version"] = TEMPLATE_VERSION
+        return stats
+
+
+# Singleton instance
+admit_card_cache = AdmitCardCache()
@@ -0,0 +1,107 @@
+"""Streaming exports of many admit cards (merged PDF or ZIP of per-roll PDFs)."""
+
+from typing import AsyncIterator, BinaryIO, Iterator, List, Tuple
+from admit_card import AdmitCardGenerator
+from admit_card_cache import admit_card_cache
+from executor import run_in_process, process_pool_size
+import asyncio
+import io
+import logging
+import os
+import tempfile
+import zipfile
+
+logger = logging.getLogger("admit_card_export")
+
+# Bytes read per chunk when streaming a rendered file back to the client
+FILE_CHUNK_SIZE = 64 * 1024
+
+
+class _ChunkSink(io.RawIOBase):
+    """Write-only, non-seekable sink that collects zipfile output for streaming."""
+
+    def __init__(self):
+        self._chunks: List[bytes] = []
+        self._position = 0
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, data) -> int:
+        self._chunks.append(bytes(data))
+        self._position += len(data)
+        return len(data)
+
+    def tell(self) -> int:
+        return self._position
+
+    def drain(self) -> bytes:
+        """Return and forget everything written since the last drain."""
+        data = b"".join(self._chunks)
+        self._chunks.clear()
+        return data
+
+
+async def stream_zip(cards: List[dict]) -> AsyncIterator[bytes]:
+    """
+    Yield a ZIP archive of admit_card_<roll_no>.pdf files.
+
+    Cards are rendered (or read from the cache) a batch at a time in the
+    process pool, and each batch is flushed to the client before the next
+    starts, so only one batch of PDFs is held in memory.
+
+    Args:
+        cards: Field dicts as returned by AdmitCardGenerator.fields_from_registration
+    """
+    sink = _ChunkSink()
+    batch_size = 2 * process_pool_size()
+
+    # PDFs are already compressed; deflating them again only burns CPU
+    with zipfile.ZipFile(sink, mode="w", compression=zipfile.ZIP_STORED) as archive:
+        for start in range(0, len(cards), batch_size):
+            batch = cards[start:start + batch_size]
+            pdfs = await asyncio.gather(*(admit_card_cache.get_pdf_async(f) for f in batch))
+            for fields, pdf in zip(batch, pdfs):
+                archive.writestr(f"admit_card_{fields['roll_no']}.pdf", pdf)
+            yield sink.drain()
+    yield sink.drain()
+
+    logger.info(f"ZIP export streamed: {len(cards)} admit cards")
+
+
+async def render_merged_file(cards: List[dict]) -> Tuple[BinaryIO, int]:
+    """
+    Render all cards into one multi-page PDF in an unlinked temporary file.
+
+    A reportlab canvas keeps every page until it is saved, so the whole
+    document is rendered in one pool task; keep `cards` bounded
+    (ADMIT_CARD_EXPORT_PDF_MAX_CARDS). The file is unlinked before this
+    returns, so its space is freed when the handle is closed or collected,
+    however the response ends.
+
+    Args:
+        cards: Field dicts in page order
+
+    Returns:
+        (open file at offset 0, size in bytes)
+    """
+    fd, path = tempfile.mkstemp(prefix="admit_cards_", suffix=".pdf")
+    try:
+        await run_in_process(AdmitCardGenerator.render_merged_pdf, cards, path)
+        size = os.fstat(fd).st_size
+        return os.fdopen(fd, "rb"), size
+    except BaseException:
+        os.close(fd)
+        raise
+    finally:
+        os.unlink(path)
+
+
+def iter_file(file: BinaryIO) -> Iterator[bytes]:
+    """Yield an open file in chunks, closing it once streaming ends or is aborted."""
+    with file:
+        while True:
+            chunk = file.read(FILE_CHUNK_SIZE)
+            if not chunk:
+                break
+            yield chunk
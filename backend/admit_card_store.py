@@ -0,0 +1,231 @@
+"""Pre-generated admit card files, served straight from disk.
+
+Each registration's card lives at ``data/admit_cards/<roll_no>_<key>.pdf``,
+where ``key`` is a prefix of the admit card cache key. A download whose
+file exists costs a stat and a file response (or an nginx X-Accel-Redirect);
+a stale or missing file is re-rendered on demand. Saving a registration
+re-renders just that student's file.
+
+Run as a script to pre-generate every card before release:
+
+    python admit_card_store.py [--workers N] [--force]
+"""
+
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+from pathlib import Path
+from typing import Optional
+from fastapi.responses import FileResponse, Response, StreamingResponse
+from io import BytesIO
+from admit_card import AdmitCardGenerator
+from admit_card_cache import AdmitCardCache, admit_card_cache
+from config import get_settings
+from executor import run_in_process, run_in_thread
+import argparse
+import logging
+import multiprocessing
+import os
+import re
+import threading
+import time
+
+logger = logging.getLogger("admit_card_store")
+
+STORE_DIR = Path(__file__).parent / "data" / "admit_cards"
+
+# Characters of the content hash kept in file names
+KEY_LENGTH = 16
+
+
+def _safe_roll(roll_no: str) -> str:
+    return re.sub(r"[^A-Za-z0-9-]", "_", roll_no)
+
+
+def render_to_file(fields: dict, path: str) -> str:
+    """
+    Render one admit card directly into the store and drop older versions.
+
+    Runs inside pool workers, so it writes the file itself rather than
+    shipping PDF bytes back to the parent.
+
+    Args:
+        fields: Field values as passed to AdmitCardGenerator.generate_pdf
+        path: Destination file path
+
+    Returns:
+        The path written
+    """
+    target = Path(path)
+    target.parent.mkdir(parents=True, exist_ok=True)
+    # Unique per thread too: a refresh and a download may render the same card at once
+    tmp = target.with_suffix(f".{os.getpid()}.{threading.get_ident()}.tmp")
+    tmp.write_bytes(AdmitCardGenerator.render_bytes(fields))
+    os.replace(tmp, target)
+
+    for old in target.parent.glob(f"{_safe_roll(fields['roll_no'])}_*.pdf"):
+        if old != target:
+            old.unlink(missing_ok=True)
+    return path
+
+
+class AdmitCardStore:
+    """Directory of pre-rendered admit card PDFs, one current file per roll number."""
+
+    def __init__(self, store_dir: Path = STORE_DIR):
+        settings = get_settings()
+        self.enabled = settings.admit_card_store_enabled
+        self.accel_prefix = settings.admit_card_accel_redirect_prefix
+        self.store_dir = store_dir
+
+    def path_for(self, fields: dict) -> Path:
+        """Return where the file for exactly these field values lives."""
+        key = AdmitCardCache.make_key(fields)[:KEY_LENGTH]
+        return self.store_dir / f"{_safe_roll(fields['roll_no'])}_{key}.pdf"
+
+    async def ensure_async(self, fields: dict) -> Path:
+        """
+        Return the path of an up-to-date file, rendering it in the process pool if needed.
+
+        Args:
+            fields: Field values as passed to AdmitCardGenerator.generate_pdf
+
+        Returns:
+            Path of the current PDF for these fields
+        """
+        path = self.path_for(fields)
+        # A stat can block on a busy or network disk; keep it off the event loop
+        if not await run_in_thread(path.exists):
+            await run_in_process(render_to_file, fields, str(path))
+        return path
+
+    async def refresh_async(self, fields: dict) -> None:
+        """Re-render one student's file after their registration changed."""
+        if not self.enabled:
+            return
+        try:
+            await self.ensure_async(fields)
+        except Exception as e:
+            logger.warning(f"Could not refresh admit card for roll_no {fields['roll_no']}: {e}")
+
+    def remove(self, roll_no: str) -> None:
+        """Delete every stored file for a roll number."""
+        for path in self.store_dir.glob(f"{_safe_roll(roll_no)}_*.pdf"):
+            path.unlink(missing_ok=True)
+
+    def file_response(self, path: Path, filename: str) -> Response:
+        """
+        Serve a stored file, handing it to nginx when X-Accel-Redirect is configured.
+
+        Args:
+            path: Stored PDF path
+            filename: Download filename for Content-Disposition
+        """
+        headers = {"Content-Disposition": f"attachment; filename={filename}"}
+        if self.accel_prefix:
+            headers["X-Accel-Redirect"] = self.accel_prefix.rstrip("/") + "/" + path.name
+            return Response(media_type="application/pdf", headers=headers)
+        return FileResponse(path, media_type="application/pdf", headers=headers)
+
+    async def response_for(self, fields: dict, filename: str) -> Response:
+        """
+        Build the download response for a card.
+
+        Serves the stored file when the store is enabled, otherwise streams
+        the PDF from the admit card cache.
+
+        Args:
+            fields: Field values as passed to AdmitCardGenerator.generate_pdf
+            filename: Download filename for Content-Disposition
+        """
+        if self.enabled:
+            path = await self.ensure_async(fields)
+            return self.file_response(path, filename)
+
+        pdf_bytes = await admit_card_cache.get_pdf_async(fields)
+        return StreamingResponse(
+            BytesIO(pdf_bytes),
+            media_type="application/pdf",
+            headers={"Content-Disposition": f"attachment; filename={filename}"}
+        )
+
+
+# Singleton instance
+admit_card_store = AdmitCardStore()
+
+
+def pregenerate(workers: Optional[int] = None, force: bool = False) -> dict:
+    """
+    Render every registration's admit card into the store.
+
+    Registrations are read in batches and at most a few cards per worker
+    are queued at once. Files already current are skipped unless force
+    is set, so an interrupted run can simply be restarted.
+
+    Args:
+        workers: Worker processes (defaults to one per core)
+        force: Re-render even if an up-to-date file exists
+
+    Returns:
+        Counts of rendered, skipped and failed cards
+    """
+    from database import SessionLocal
+    from models import Registration
+
+    workers = workers or os.cpu_count() or 1
+    store = AdmitCardStore()
+    counts = {"rendered": 0, "skipped": 0, "failed": 0}
+    started = time.perf_counter()
+
+    db = SessionLocal()
+    try:
+        with ProcessPoolExecutor(
+            max_workers=workers,
+            mp_context=multiprocessing.get_context("spawn")
+        ) as pool:
+            pending = {}
+
+            def collect(timeout: Optional[float]) -> None:
+                done, _ = wait(list(pending), timeout=timeout, return_when=FIRST_COMPLETED)
+                for future in done:
+                    roll_no = pending.pop(future)
+                    try:
+                        future.result()
+                        counts["rendered"] += 1
+                    except Exception as e:
+                        counts["failed"] += 1
+                        logger.error(f"Failed to render admit card for roll_no {roll_no}: {e}")
+
+            for registration in db.query(Registration).order_by(Registration.id).yield_per(1000):
+                fields = AdmitCardGenerator.fields_from_registration(registration)
+                path = store.path_for(fields)
+                if path.exists() and not force:
+                    counts["skipped"] += 1
+                    continue
+
+                while len(pending) >= 4 * workers:
+                    collect(timeout=None)
+                pending[pool.submit(render_to_file, fields, str(path))] = fields["roll_no"]
+                collect(timeout=0)
+
+            while pending:
+                collect(timeout=None)
+    finally:
+        db.close()
+
+    elapsed = time.perf_counter() - started
+    logger.info(
+        f"Admit card pre-generation finished in {elapsed:.1f}s: "
+        f"rendered={counts['rendered']}, skipped={counts['skipped']}, failed={counts['failed']}"
+    )
+    return counts
+
+
+if __name__ == "__main__":
+    logging.basicConfig(
+        level=logging.INFO,
+        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+    )
+    parser = argparse.ArgumentParser(description="Pre-generate admit card PDFs for all registrations.")
+    parser.add_argument("--workers", type=int, default=None, help="worker processes (default: CPU count)")
+    parser.add_argument("--force", action="store_true", help="re-render files that are already current")
+    args = parser.parse_args()
+    print(pregenerate(workers=args.workers, force=args.force))
@@ -1,15 +1,60 @@
 """Authentication and JWT token management."""
 
+from dataclasses import dataclass
 from datetime import datetime, timedelta, timezone
-from typing import Optional
+from functools import lru_cache
+from typing import FrozenSet, Optional
 import jwt
+from sqlalchemy.dialects.postgresql import insert as postgresql_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
 from sqlalchemy.orm import Session
 from models import User
 from config import get_settings
+from ttl_cache import TTLCache
 import logging
+import time
 
 logger = logging.getLogger("auth")
 
+_settings = get_settings()
+# token -> decoded claims, so repeated requests skip signature verification
+_token_cache = TTLCache(_settings.auth_cache_size, _settings.auth_token_cache_seconds)
+# user id -> AuthUser
+_user_cache = TTLCache(_settings.auth_cache_size, _settings.auth_user_cache_seconds)
+
+
+@lru_cache()
+def admin_emails() -> FrozenSet[str]:
+    """Lowercased admin addresses (ADMIN_EMAILS, falling back to SENDER_EMAIL)."""
+    settings = get_settings()
+    return frozenset(e.lower() for e in (settings.admin_emails or [settings.sender_email]))
+
+
+def is_admin_email(email: str) -> bool:
+    """Whether an address belongs to an admin account."""
+    return email.lower() in admin_emails()
+
+
+@dataclass(frozen=True)
+class AuthUser:
+    """
+    The authenticated user's columns, as returned by token lookups.
+
+    Not an ORM object, so it can be cached and shared between requests;
+    query the User (or its registration) with a session when more is needed.
+    """
+
+    id: int
+    email: str
+    is_verified: bool
+    created_at: Optional[datetime]
+    updated_at: Optional[datetime]
+
+    @classmethod
+    def from_user(cls, user: User) -> "AuthUser":
+        return cls(user.id, user.email, user.is_verified, user.created_at, user.updated_at)
+
+
 class AuthService:
     """Service for JWT token management."""
     
@@ -53,6 +98,14 @@ class AuthService:
         Returns:
             Token claims dict if valid, None otherwise
         """
+        payload = _token_cache.get(token)
+        if payload is not None:
+            if payload.get("exp", 0) > time.time():
+                return payload
+            _token_cache.pop(token)
+            logger.warning("Invalid token: Signature has expired")
+            return None
+
         settings = get_settings()
         
         try:
@@ -61,22 +114,26 @@ class AuthService:
                 settings.secret_key,
                 algorithms=[settings.algorithm]
             )
+            _token_cache.set(token, payload)
             return payload
         except (jwt.InvalidTokenError, jwt.DecodeError, jwt.ExpiredSignatureError) as e:
             logger.warning(f"Invalid token: {str(e)}")
             return None
     
     @staticmethod
-    def get_current_user(db: Session, token: str) -> Optional[User]:
+    def get_current_user(db: Session, token: str) -> Optional[AuthUser]:
         """
         Get current authenticated user from token.
+
+        Recently seen users are served from an in-process cache without a
+        query.
         
         Args:
             db: Database session
             token: JWT token
             
         Returns:
-            User object if token is valid, None otherwise
+            AuthUser if token is valid, None otherwise
         """
         payload = AuthService.verify_token(token)
         
@@ -86,17 +143,58 @@ class AuthService:
         user_id = payload.get("user_id")
         if not user_id:
             return None
+
+        user = _user_cache.get(user_id)
+        if user is not None:
+            return user
         
-        user = db.query(User).filter(User.id == user_id).first()
+        row = db.query(User).filter(User.id == user_id).first()
+        if not row:
+            return None
+        user = AuthUser.from_user(row)
+        _user_cache.set(user_id, user)
         return user
 
-def create_or_get_user(db: Session, email: str) -> User:
+    @staticmethod
+    def get_cached_user(token: str) -> Optional[AuthUser]:
+        """
+        Resolve a token from the in-process caches only, without a query.
+
+        Args:
+            token: JWT token
+
+        Returns:
+            AuthUser, or None if the token is invalid or the user isn't cached
+        """
+        payload = AuthService.verify_token(token)
+        if not payload or not payload.get("user_id"):
+            return None
+        return _user_cache.get(payload["user_id"])
+
+    @staticmethod
+    def invalidate_user(user_id: int) -> None:
+        """Forget a cached user after it was changed or deleted."""
+        _user_cache.pop(user_id)
+
+    @staticmethod
+    def cache_stats() -> dict:
+        """Return token and user cache counters."""
+        return {"tokens": _token_cache.stats(), "users": _user_cache.stats()}
+
+
+def _insert(db: Session, model):
+    """INSERT for the session's dialect, which both supported databases extend with ON CONFLICT."""
+    return postgresql_insert(model) if db.get_bind().dialect.name == "postgresql" else sqlite_insert(model)
+
+
+def create_or_get_user(db: Session, email: str, commit: bool = True) -> User:
     """
     Create new user or return existing user.
     
     Args:
         db: Database session
         email: User email
+        commit: Commit a newly created user; pass False to commit it with other rows
         
     Returns:
         User object
@@ -104,10 +202,43 @@ def create_or_get_user(db: Session, email: str) -> User:
     user = db.query(User).filter(User.email == email).first()
     
     if not user:
-        user = User(email=email, is_verified=False)
-        db.add(user)
-        db.commit()
-        db.refresh(user)
-        logger.info(f"User created: {email}")
+        # Another request may create the same user meanwhile; keep whichever row wins
+        created = db.execute(
+            _insert(db, User)
+            .values(email=email, is_verified=False)
+            .on_conflict_do_nothing(index_elements=[User.email])
+        ).rowcount
+        if commit:
+            db.commit()
+        user = db.query(User).filter(User.email == email).one()
+        if created:
+            logger.info(f"User created: {email}")
     
     return user
+
+
+def mark_user_verified(db: Session, email: str) -> int:
+    """
+    Mark a user verified, creating them if needed, without committing.
+
+    Call AuthService.invalidate_user with the returned id once committed,
+    so a request in between can't cache the unverified row again.
+
+    Args:
+        db: Database session
+        email: User email
+
+    Returns:
+        The user's id
+    """
+    # One upsert, so a concurrent create_or_get_user can't make it fail on the unique email
+    user_id = db.execute(
+        _insert(db, User)
+        .values(email=email, is_verified=True)
+        .on_conflict_do_update(
+            index_elements=[User.email],
+            set_={"is_verified": True, "updated_at": datetime.utcnow()}
+        )
+        .returning(User.id)
+    ).scalar_one()
+    return user_id
@@ -0,0 +1,254 @@
+"""Admit card rendering benchmark.
+
+Measures, for each rendering mode (template / platypus story):
+  - single-card latency (cold first card, p50/p95/p99/mean)
+  - throughput in cards/sec with 1..N worker processes
+  - peak RSS of a process rendering cards back to back
+  - output size in bytes
+
+Inputs are synthetic registrations generated from a fixed seed, mixing
+short English names, Hindi (Devanagari) names and very long names.
+Results are written as JSON so runs can be compared across commits.
+
+Usage (from backend/):
+    python benchmarks/bench_admit_card.py
+    python benchmarks/bench_admit_card.py --cards 500 --processes 1,2,4
+    python benchmarks/bench_admit_card.py --compare benchmarks/results/<old>.json
+"""
+
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timezone
+from pathlib import Path
+import argparse
+import json
+import multiprocessing
+import os
+import platform
+import random
+import resource
+import statistics
+import subprocess
+import sys
+import time
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(BACKEND_DIR))
+
+RESULTS_DIR = Path(__file__).resolve().parent / "results"
+
+FIRST_NAMES = ["Aarav", "Vivaan", "Aditya", "Ananya", "Diya", "Ishaan", "Kavya", "Rohan", "Saanvi", "Arjun"]
+LAST_NAMES = ["Sharma", "Verma", "Gupta", "Meena", "Agarwal", "Choudhary", "Yadav", "Jain", "Saini", "Gurjar"]
+HINDI_NAMES = ["आशा कुमारी", "राहुल शर्मा", "प्रिया मीणा", "अनुराग गुप्ता", "सौम्या अग्रवाल", "विकास चौधरी"]
+CENTRES = ["SVPS School, Gangapur City", "PW Vidyapeeth Centre, Jaipur", "Kendriya Vidyalaya, Sawai Madhopur"]
+SLOTS = ["10:00 AM - 12:00 PM", "02:00 PM - 04:00 PM"]
+
+
+def synthetic_registrations(count: int, seed: int) -> list:
+    """Deterministic admit card field dicts covering short, Hindi and long names."""
+    rng = random.Random(seed)
+    cards = []
+    for i in range(count):
+        kind = i % 4
+        if kind == 0:
+            name = f"{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}"
+        elif kind == 1:
+            name = rng.choice(HINDI_NAMES)
+        elif kind == 2:
+            # Long multi-part name well past the width of the value column
+            name = " ".join(rng.choice(FIRST_NAMES + LAST_NAMES) for _ in range(rng.randint(8, 14)))
+        else:
+            name = f"{rng.choice(HINDI_NAMES)} {rng.choice(LAST_NAMES)}"
+        cards.append({
+            "roll_no": f"888{i + 1:04d}",
+            "name": name,
+            "father_name": f"{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}",
+            "current_class": rng.choice(["X", "XI", "XII", "Dropper", ""]),
+            "medium": rng.choice(["Hindi", "English"]),
+            "course": rng.choice(["Engineering (JEE)", "Medical (NEET)", "Foundation (Class 6-10)"]),
+            "exam_centre": rng.choice(CENTRES),
+            "exam_date": f"2026-03-{rng.randint(1, 28):02d}",
+            "exam_time": rng.choice(SLOTS + [""]),
+        })
+    return cards
+
+
+def _percentile(sorted_values: list, pct: float) -> float:
+    index = min(len(sorted_values) - 1, max(0, round(pct / 100 * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+def _set_mode(mode: str) -> None:
+    from config import get_settings
+    get_settings().admit_card_template_mode = (mode == "template")
+
+
+def _peak_rss_mb() -> float:
+    # ru_maxrss is KiB on Linux, bytes on macOS
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return round(peak / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+
+
+def measure_latency(mode: str, cards: list) -> dict:
+    """Render cards one by one in this (fresh) process; runs in a child process."""
+    import logging
+    logging.disable(logging.INFO)
+    from admit_card import AdmitCardGenerator
+    _set_mode(mode)
+
+    rss_before = _peak_rss_mb()
+    started = time.perf_counter()
+    first = AdmitCardGenerator.render_bytes(cards[0])
+    cold_ms = (time.perf_counter() - started) * 1000
+
+    timings, sizes = [], [len(first)]
+    for fields in cards[1:]:
+        started = time.perf_counter()
+        pdf = AdmitCardGenerator.render_bytes(fields)
+        timings.append((time.perf_counter() - started) * 1000)
+        sizes.append(len(pdf))
+
+    timings.sort()
+    return {
+        "cold_first_card_ms": round(cold_ms, 3),
+        "p50_ms": round(_percentile(timings, 50), 3),
+        "p95_ms": round(_percentile(timings, 95), 3),
+        "p99_ms": round(_percentile(timings, 99), 3),
+        "mean_ms": round(statistics.fmean(timings), 3),
+        "size_bytes": {
+            "min": min(sizes),
+            "mean": round(statistics.fmean(sizes)),
+            "max": max(sizes),
+        },
+        "rss_before_mb": rss_before,
+        "peak_rss_mb": _peak_rss_mb(),
+    }
+
+
+def _worker_init(mode: str) -> None:
+    import logging
+    logging.disable(logging.INFO)
+    from admit_card import AdmitCardGenerator
+    _set_mode(mode)
+    # Warm the per-process logo and per-thread layout outside the timed region
+    AdmitCardGenerator.render_bytes(synthetic_registrations(1, 0)[0])
+
+
+def _render_size(fields: dict) -> int:
+    from admit_card import AdmitCardGenerator
+    return len(AdmitCardGenerator.render_bytes(fields))
+
+
+def measure_throughput(mode: str, cards: list, processes: int) -> dict:
+    """Render all cards across a pool of warmed-up worker processes."""
+    context = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(max_workers=processes, mp_context=context,
+                             initializer=_worker_init, initargs=(mode,)) as pool:
+        # Make sure every worker has started and warmed up before timing
+        list(pool.map(_render_size, cards[:processes]))
+        started = time.perf_counter()
+        total_bytes = sum(pool.map(_render_size, cards, chunksize=max(1, len(cards) // (processes * 8))))
+        elapsed = time.perf_counter() - started
+    return {
+        "processes": processes,
+        "cards": len(cards),
+        "seconds": round(elapsed, 3),
+        "cards_per_sec": round(len(cards) / elapsed, 1),
+        "total_bytes": total_bytes,
+    }
+
+
+def _git_commit() -> str:
+    try:
+        return subprocess.check_output(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=BACKEND_DIR, stderr=subprocess.DEVNULL
+        ).decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def run(cards_count: int, processes: list, modes: list, seed: int) -> dict:
+    import reportlab
+
+    cards = synthetic_registrations(cards_count, seed)
+    results = {
+        "benchmark": "admit_card",
+        "commit": _git_commit(),
+        "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "reportlab": reportlab.Version,
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "cards": cards_count,
+        "seed": seed,
+        "modes": {},
+    }
+
+    context = multiprocessing.get_context("spawn")
+    for mode in modes:
+        # Fresh process per mode so peak RSS and cold start are not shared
+        with ProcessPoolExecutor(max_workers=1, mp_context=context) as pool:
+            latency = pool.submit(measure_latency, mode, cards).result()
+        throughput = [measure_throughput(mode, cards, p) for p in processes]
+        results["modes"][mode] = {"latency": latency, "throughput": throughput}
+
+        print(f"[{mode}] p50={latency['p50_ms']}ms p99={latency['p99_ms']}ms "
+              f"cold={latency['cold_first_card_ms']}ms size={latency['size_bytes']['mean']}B "
+              f"peak_rss={latency['peak_rss_mb']}MB")
+        for t in throughput:
+            print(f"[{mode}]   {t['processes']} proc: {t['cards_per_sec']} cards/s")
+
+    return results
+
+
+def compare(baseline_path: Path, results: dict) -> None:
+    """Print per-metric change against an earlier results file."""
+    baseline = json.loads(baseline_path.read_text())
+    print(f"\nvs {baseline_path.name} (commit {baseline.get('commit')}):")
+    for mode, current in results["modes"].items():
+        old = baseline.get("modes", {}).get(mode)
+        if not old:
+            continue
+        for metric in ("p50_ms", "p99_ms", "peak_rss_mb"):
+            before, after = old["latency"][metric], current["latency"][metric]
+            change = (after - before) / before * 100 if before else 0.0
+            print(f"  [{mode}] {metric}: {before} -> {after} ({change:+.1f}%)")
+        before, after = old["latency"]["size_bytes"]["mean"], current["latency"]["size_bytes"]["mean"]
+        print(f"  [{mode}] size_bytes.mean: {before} -> {after} ({(after - before) / before * 100:+.1f}%)")
+        old_tp = {t["processes"]: t["cards_per_sec"] for t in old["throughput"]}
+        for t in current["throughput"]:
+            if t["processes"] in old_tp:
+                before = old_tp[t["processes"]]
+                print(f"  [{mode}] cards/s @{t['processes']}: {before} -> {t['cards_per_sec']} "
+                      f"({(t['cards_per_sec'] - before) / before * 100:+.1f}%)")
+
+
+def main() -> None:
+    cpus = os.cpu_count() or 1
+    parser = argparse.ArgumentParser(description="Benchmark admit card PDF rendering.")
+    parser.add_argument("--cards", type=int, default=200, help="synthetic registrations to render (default 200)")
+    parser.add_argument("--processes", default=",".join(sorted({"1", str(cpus)}, key=int)),
+                        help="comma-separated worker counts for the throughput run (default 1 and CPU count)")
+    parser.add_argument("--modes", default="template,story", help="rendering modes: template, story")
+    parser.add_argument("--seed", type=int, default=2026)
+    parser.add_argument("--output", type=Path, default=None, help="results JSON path (default benchmarks/results/)")
+    parser.add_argument("--compare", type=Path, default=None, help="earlier results JSON to diff against")
+    args = parser.parse_args()
+
+    results = run(
+        cards_count=max(2, args.cards),
+        processes=[int(p) for p in args.processes.split(",") if p],
+        modes=[m.strip() for m in args.modes.split(",") if m.strip()],
+        seed=args.seed,
+    )
+
+    output = args.output or RESULTS_DIR / f"admit_card_{results['commit']}_{int(time.time())}.json"
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(json.dumps(results, indent=2, ensure_ascii=False))
+    print(f"\nResults written to {output}")
+
+    if args.compare:
+        compare(args.compare, results)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,261 @@
+"""Email delivery benchmark against the local SMTP sink.
+
+Drives the real EmailService (SMTP pool, MIME templates) and the bulk
+admit card job runner against ``smtp_sink.SMTPSink`` and reports, per
+phase, messages/sec, SMTP connections opened and send latency
+percentiles. Nothing leaves the machine.
+
+Phases:
+  otp         OTP emails sent from --threads threads, like the outbox worker
+  admit_card  admit card emails (pre-rendered PDFs) from --threads threads
+  bulk        a bulk-send job over --bulk synthetic registrations in a
+              throwaway SQLite database, through BulkSendRunner
+
+Usage (from backend/):
+    python benchmarks/bench_email.py
+    python benchmarks/bench_email.py --messages 500 --connect-latency 0.3 --latency 0.02
+    python benchmarks/bench_email.py --sink subprocess --fail-rate 0.05 --throttle-per-minute 3000
+"""
+
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from pathlib import Path
+import argparse
+import asyncio
+import json
+import os
+import platform
+import signal
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+BENCH_DIR = Path(__file__).resolve().parent
+BACKEND_DIR = BENCH_DIR.parent
+sys.path.insert(0, str(BACKEND_DIR))
+
+from bench_admit_card import RESULTS_DIR, synthetic_registrations, _git_commit, _percentile  # noqa: E402
+from smtp_sink import SMTPSink  # noqa: E402
+
+
+def configure_app(port: int, pool_size: int) -> None:
+    """Point the app's settings at the sink; must run before the app modules are imported."""
+    os.environ.update({
+        "SMTP_SERVER": "127.0.0.1",
+        "SMTP_PORT": str(port),
+        "SMTP_STARTTLS": "false",
+        "SENDER_EMAIL": "bench@example.com",
+        "SENDER_PASSWORD": "bench",
+        "SMTP_POOL_SIZE": str(pool_size),
+    })
+
+
+def _summary(latencies_ms: list, elapsed: float, ok: int, connections: int) -> dict:
+    latencies_ms.sort()
+    return {
+        "messages": len(latencies_ms),
+        "delivered": ok,
+        "seconds": round(elapsed, 3),
+        "messages_per_sec": round(len(latencies_ms) / elapsed, 1) if elapsed else None,
+        "connections": connections,
+        "p50_ms": round(_percentile(latencies_ms, 50), 3) if latencies_ms else None,
+        "p99_ms": round(_percentile(latencies_ms, 99), 3) if latencies_ms else None,
+        "mean_ms": round(statistics.fmean(latencies_ms), 3) if latencies_ms else None,
+    }
+
+
+def bench_direct(send, jobs: list, threads: int, sink_stats) -> dict:
+    """Send every job with send(*job) from a thread pool and time each call."""
+    def timed(job):
+        started = time.perf_counter()
+        ok = send(*job)
+        return (time.perf_counter() - started) * 1000, ok
+
+    before = sink_stats()["connections"]
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        results = list(pool.map(timed, jobs))
+    elapsed = time.perf_counter() - started
+    return _summary(
+        [ms for ms, _ in results], elapsed, sum(1 for _, ok in results if ok),
+        sink_stats()["connections"] - before
+    )
+
+
+def bench_bulk(count: int, per_minute: int, per_day: int, sink_stats) -> dict:
+    """Run one bulk-send job over synthetic registrations in a temporary database."""
+    from sqlalchemy import create_engine
+    import database
+    from models import User, Registration
+    from bulk_send import bulk_send_runner, SendRateShaper
+    from email_service import email_service
+    from executor import run_in_thread, shutdown_pools
+
+    workdir = tempfile.mkdtemp(prefix="bench_email_")
+    engine = create_engine(f"sqlite:///{workdir}/bench.db", connect_args={"check_same_thread": False})
+    database.Base.metadata.create_all(bind=engine)
+    database.SessionLocal.configure(bind=engine)
+
+    db = database.SessionLocal()
+    cards = synthetic_registrations(count, seed=7)
+    db.bulk_insert_mappings(User, [
+        {"id": i + 1, "email": f"student{i + 1}@example.com", "is_verified": True} for i in range(count)
+    ])
+    db.bulk_insert_mappings(Registration, [
+        {
+            "user_id": i + 1, "roll_no": card["roll_no"], "name": card["name"],
+            "father_name": card["father_name"], "current_class": card["current_class"] or "XI",
+            "medium": card["medium"], "course": card["course"], "exam_centre": card["exam_centre"],
+            "exam_date": card["exam_date"], "exam_time": card["exam_time"],
+        }
+        for i, card in enumerate(cards)
+    ])
+    db.commit()
+    db.close()
+
+    bulk_send_runner.shaper = SendRateShaper(per_minute, per_day)
+
+    async def run_job() -> tuple:
+        await bulk_send_runner.start()
+        session = database.SessionLocal()
+        try:
+            job = bulk_send_runner.submit(session, list(range(1, count + 1)), "bench")
+        finally:
+            session.close()
+        started = time.perf_counter()
+        bulk_send_runner.notify()
+        while True:
+            await asyncio.sleep(0.05)
+            session = database.SessionLocal()
+            try:
+                progress = await run_in_thread(bulk_send_runner.progress, session, job["job_id"])
+            finally:
+                session.close()
+            if progress["status"] not in ("queued", "running"):
+                break
+        elapsed = time.perf_counter() - started
+        await bulk_send_runner.stop()
+        return progress, elapsed
+
+    before = sink_stats()["connections"]
+    progress, elapsed = asyncio.run(run_job())
+    shutdown_pools()
+    email_service.smtp_pool.close_all()
+    return {
+        "messages": count,
+        "delivered": progress["counts"]["sent"],
+        "failed": progress["counts"]["failed"],
+        "seconds": round(elapsed, 3),
+        "messages_per_sec": round(count / elapsed, 1),
+        "connections": sink_stats()["connections"] - before,
+    }
+
+
+def start_sink(args) -> tuple:
+    """Start the sink in-process or as a subprocess; returns (port, stats_fn, stop_fn)."""
+    options = {
+        "connect_latency": args.connect_latency,
+        "latency": args.latency,
+        "fail_rate": args.fail_rate,
+        "throttle_per_minute": args.throttle_per_minute,
+        "max_messages_per_connection": args.max_messages_per_connection,
+    }
+    if args.sink == "inprocess":
+        sink = SMTPSink(seed=1, **options).start()
+        return sink.port, sink.stats, sink.stop
+
+    command = [sys.executable, str(BENCH_DIR / "smtp_sink.py"), "--port", str(args.port), "--seed", "1"]
+    for name, value in options.items():
+        command += [f"--{name.replace('_', '-')}", str(value)]
+    process = subprocess.Popen(command, stdout=subprocess.PIPE, text=True)
+    process.stdout.readline()  # {"listening": ...}
+    final = {}
+
+    def stop():
+        process.send_signal(signal.SIGTERM)
+        final.update(json.loads(process.communicate(timeout=10)[0].strip().splitlines()[-1]))
+
+    # Connection counts for a subprocess sink are only known at the end
+    return args.port, lambda: final or {"connections": 0}, stop
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark email delivery against a local SMTP sink.")
+    parser.add_argument("--messages", type=int, default=200, help="messages per direct phase (default 200)")
+    parser.add_argument("--bulk", type=int, default=100, help="registrations in the bulk phase (0 skips it)")
+    parser.add_argument("--threads", type=int, default=4, help="sending threads, also SMTP_POOL_SIZE")
+    parser.add_argument("--phases", default="otp,admit_card,bulk")
+    parser.add_argument("--sink", choices=["inprocess", "subprocess"], default="inprocess")
+    parser.add_argument("--port", type=int, default=2525, help="sink port in subprocess mode")
+    parser.add_argument("--connect-latency", type=float, default=0.2,
+                        help="sink greeting delay standing in for TLS + AUTH (default 0.2s)")
+    parser.add_argument("--latency", type=float, default=0.01, help="sink delay per message (default 0.01s)")
+    parser.add_argument("--fail-rate", type=float, default=0.0)
+    parser.add_argument("--throttle-per-minute", type=int, default=0)
+    parser.add_argument("--max-messages-per-connection", type=int, default=0)
+    parser.add_argument("--per-minute", type=int, default=0, help="bulk job BULK_SEND_PER_MINUTE (0: unpaced)")
+    parser.add_argument("--per-day", type=int, default=0, help="bulk job BULK_SEND_PER_DAY (0: unlimited)")
+    parser.add_argument("--output", type=Path, default=None)
+    args = parser.parse_args()
+
+    port, sink_stats, stop_sink = start_sink(args)
+    configure_app(port, args.threads)
+
+    import logging
+    logging.disable(logging.WARNING)
+    from email_service import EmailService
+    from admit_card import AdmitCardGenerator
+
+    phases = [p.strip() for p in args.phases.split(",") if p.strip()]
+    service = EmailService()
+    results = {
+        "benchmark": "email",
+        "commit": _git_commit(),
+        "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "sink": {k: v for k, v in vars(args).items() if k not in ("output", "phases")},
+        "phases": {},
+    }
+
+    if "otp" in phases:
+        jobs = [(f"user{i}@example.com", f"{i % 1000000:06d}") for i in range(args.messages)]
+        results["phases"]["otp"] = bench_direct(service.send_otp_email, jobs, args.threads, sink_stats)
+
+    if "admit_card" in phases:
+        cards = synthetic_registrations(min(args.messages, 20), seed=3)
+        pdfs = [(card, AdmitCardGenerator.render_bytes(card)) for card in cards]
+        jobs = [
+            (f"user{i}@example.com", pdfs[i % len(pdfs)][0]["name"], pdfs[i % len(pdfs)][0]["roll_no"],
+             pdfs[i % len(pdfs)][1])
+            for i in range(args.messages)
+        ]
+        results["phases"]["admit_card"] = bench_direct(service.send_admit_card_email, jobs, args.threads, sink_stats)
+
+    service.smtp_pool.close_all()
+
+    if "bulk" in phases and args.bulk:
+        results["phases"]["bulk"] = bench_bulk(args.bulk, args.per_minute, args.per_day, sink_stats)
+
+    stop_sink()
+    results["sink_totals"] = sink_stats()
+
+    for name, phase in results["phases"].items():
+        line = f"[{name}] {phase['messages_per_sec']} msg/s, {phase['delivered']}/{phase['messages']} delivered"
+        if args.sink == "inprocess":
+            line += f", {phase['connections']} connections"
+        if "p99_ms" in phase:
+            line += f", p50={phase['p50_ms']}ms p99={phase['p99_ms']}ms"
+        print(line)
+    print(f"sink: {results['sink_totals']}")
+
+    output = args.output or RESULTS_DIR / f"email_{results['commit']}_{int(time.time())}.json"
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(json.dumps(results, indent=2))
+    print(f"\nResults written to {output}")
+
+
+if __name__ == "__main__":
+    main()
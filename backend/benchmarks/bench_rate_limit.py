@@ -0,0 +1,179 @@
+"""Rate limiter microbenchmark.
+
+Drives the limiters in ``rate_limit`` directly (no HTTP) with calls from
+many distinct client IPs and reports the per-call cost, how many keys
+stay tracked and the memory they hold. The previous implementation, a
+list of raw timestamps per key that was never evicted, runs alongside as
+the baseline. The shared SQLite backend is timed against a throwaway file.
+
+Traffic mixes a few busy clients with a long tail of IPs seen once or
+twice, like scanners hitting /auth/send-otp.
+
+Usage (from backend/):
+    python benchmarks/bench_rate_limit.py
+    python benchmarks/bench_rate_limit.py --ips 100000 --calls 500000 --max-keys 50000
+    python benchmarks/bench_rate_limit.py --limit 1000/60    # busy keys keep long timestamp lists
+    python benchmarks/bench_rate_limit.py --backends local,sqlite
+"""
+
+from collections import defaultdict
+from datetime import datetime, timezone
+from pathlib import Path
+import argparse
+import json
+import platform
+import random
+import sys
+import tempfile
+import time
+import tracemalloc
+
+BENCH_DIR = Path(__file__).resolve().parent
+sys.path.insert(0, str(BENCH_DIR.parent))
+
+from bench_admit_card import RESULTS_DIR, _git_commit, _percentile  # noqa: E402
+from rate_limit import LocalRateLimiter, SQLiteRateLimiter  # noqa: E402
+
+class ListRateLimiter:
+    """The previous limiter: every key keeps a list of its call timestamps."""
+
+    def __init__(self):
+        self._buckets: dict = defaultdict(list)
+
+    def hit(self, key: str, max_calls: int, period_seconds: float) -> float:
+        now = time.time()
+        self._buckets[key] = [t for t in self._buckets[key] if now - t < period_seconds]
+        if len(self._buckets[key]) >= max_calls:
+            return 1.0
+        self._buckets[key].append(now)
+        return 0.0
+
+    def stats(self) -> dict:
+        return {"keys": len(self._buckets)}
+
+
+def traffic(ips: int, calls: int, seed: int) -> list:
+    """Build call keys: 20% of calls from 50 hot IPs, the rest spread over `ips` addresses."""
+    rng = random.Random(seed)
+    hot = [f"10.0.0.{i}" for i in range(50)]
+    keys = []
+    for i in range(calls):
+        if rng.random() < 0.2:
+            ip = rng.choice(hot)
+        else:
+            n = rng.randrange(ips) if i >= ips else i  # every IP appears at least once
+            ip = f"{n >> 16 & 255}.{n >> 8 & 255}.{n & 255}.{n % 7}"
+        keys.append(f"send_otp:{ip}")
+    return keys
+
+
+def measure(
+    name: str, make_limiter, keys: list, max_calls: int, period: float,
+    sample_every: int = 100, trace_memory: bool = True
+) -> dict:
+    """
+    Run every key through a fresh limiter twice: once timed, once under tracemalloc.
+
+    Memory is only meaningful for in-process limiters; pass trace_memory=False otherwise.
+
+    Per-call latency is sampled every `sample_every` calls to keep timer overhead out.
+    """
+    limiter = make_limiter()
+    hit = limiter.hit
+    latencies_ns = []
+    rejected = 0
+    started = time.perf_counter()
+    for i, key in enumerate(keys):
+        if i % sample_every:
+            rejected += bool(hit(key, max_calls, period))
+            continue
+        t0 = time.perf_counter_ns()
+        rejected += bool(hit(key, max_calls, period))
+        latencies_ns.append(time.perf_counter_ns() - t0)
+    elapsed = time.perf_counter() - started
+    stats = limiter.stats()
+    del limiter, hit
+
+    memory = None
+    if trace_memory:
+        limiter = make_limiter()
+        tracemalloc.start()
+        for key in keys:
+            limiter.hit(key, max_calls, period)
+        memory, _ = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+    latencies_ns.sort()
+    return {
+        "limiter": name,
+        "calls": len(keys),
+        "rejected": rejected,
+        "ns_per_call": round(elapsed / len(keys) * 1e9),
+        "p50_ns": _percentile(latencies_ns, 50),
+        "p99_ns": _percentile(latencies_ns, 99),
+        "keys_tracked": stats.get("keys"),
+        "evictions": stats.get("evictions"),
+        "memory_bytes": memory,
+        "bytes_per_key": round(memory / stats["keys"]) if memory and stats.get("keys") else None,
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark the per-IP rate limiter.")
+    parser.add_argument("--ips", type=int, default=100000, help="distinct client IPs (default 100000)")
+    parser.add_argument("--calls", type=int, default=300000, help="limiter calls (default 300000)")
+    parser.add_argument("--limit", default="5/60", help="max_calls/period_seconds, like @rate_limit (default 5/60)")
+    parser.add_argument("--max-keys", type=int, default=100000, help="RATE_LIMIT_MAX_KEYS for the GCRA limiter")
+    parser.add_argument("--seed", type=int, default=2026)
+    parser.add_argument("--backends", default="local", help="limiters to time: local, sqlite (default local)")
+    parser.add_argument("--skip-baseline", action="store_true", help="don't run the old list-based limiter")
+    parser.add_argument("--output", type=Path, default=None)
+    args = parser.parse_args()
+
+    max_calls, period = (float(part) for part in args.limit.split("/"))
+    max_calls = int(max_calls)
+    keys = traffic(args.ips, max(args.calls, args.ips), args.seed)
+    backends = [b.strip() for b in args.backends.split(",") if b.strip()]
+    runs = []
+    if "local" in backends:
+        runs.append(measure("gcra", lambda: LocalRateLimiter(args.max_keys), keys, max_calls, period))
+    if "sqlite" in backends:
+        workdir = Path(tempfile.mkdtemp(prefix="bench_rate_limit_"))
+
+        def make_sqlite() -> SQLiteRateLimiter:
+            limiter = SQLiteRateLimiter(workdir / "rate_limit.db", args.max_keys, LocalRateLimiter(args.max_keys))
+            limiter.open()
+            return limiter
+
+        runs.append(measure("gcra sqlite", make_sqlite, keys, max_calls, period, trace_memory=False))
+    if not args.skip_baseline:
+        runs.append(measure("list (previous)", ListRateLimiter, keys, max_calls, period))
+
+    results = {
+        "benchmark": "rate_limit",
+        "commit": _git_commit(),
+        "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "ips": args.ips,
+        "limit": args.limit,
+        "max_keys": args.max_keys,
+        "runs": runs,
+    }
+
+    for run in runs:
+        line = f"[{run['limiter']}] {run['ns_per_call']} ns/call (p50={run['p50_ns']} p99={run['p99_ns']}), "
+        if run["memory_bytes"] is not None:
+            line += (
+                f"{run['keys_tracked']} keys, {run['memory_bytes'] / 1e6:.1f} MB ({run['bytes_per_key']} B/key), "
+            )
+        print(line + f"{run['rejected']} rejected")
+
+    output = args.output or RESULTS_DIR / f"rate_limit_{results['commit']}_{int(time.time())}.json"
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(json.dumps(results, indent=2))
+    print(f"\nResults written to {output}")
+
+
+if __name__ == "__main__":
+    main()
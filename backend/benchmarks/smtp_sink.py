@@ -0,0 +1,239 @@
+"""Local SMTP stand-in for offline email benchmarks.
+
+Accepts EHLO/AUTH/MAIL/RCPT/DATA like Gmail does (without STARTTLS, so
+run the app with SMTP_STARTTLS=false) and discards the messages. It can
+simulate a slow handshake, slow or failing deliveries and provider
+throttling, and counts connections and messages.
+
+In-process:
+    sink = SMTPSink(latency=0.02, fail_rate=0.01).start()
+    ... SMTP_SERVER=127.0.0.1 SMTP_PORT=sink.port ...
+    sink.stop(); print(sink.stats())
+
+As a subprocess (prints stats as JSON on SIGINT/SIGTERM):
+    python benchmarks/smtp_sink.py --port 2525 --connect-latency 0.3 --throttle-per-minute 600
+"""
+
+from typing import Optional
+import argparse
+import asyncio
+import json
+import random
+import signal
+import threading
+import time
+
+
+class SMTPSink:
+    """
+    Minimal asyncio SMTP server with configurable misbehaviour.
+
+    Args:
+        host: Interface to listen on
+        port: Port to listen on (0 picks a free one)
+        connect_latency: Seconds before the greeting, standing in for TLS and AUTH cost
+        latency: Seconds spent accepting each message after DATA
+        fail_rate: Fraction of messages answered with a temporary 451 failure
+        throttle_per_minute: Messages accepted per minute across all
+            connections before answering 421 and closing (0 disables)
+        max_messages_per_connection: Messages after which a connection is
+            closed with 421, like providers recycling sessions (0 disables)
+        seed: Random seed for fail_rate
+    """
+
+    def __init__(
+        self,
+        host: str = "127.0.0.1",
+        port: int = 0,
+        connect_latency: float = 0.0,
+        latency: float = 0.0,
+        fail_rate: float = 0.0,
+        throttle_per_minute: int = 0,
+        max_messages_per_connection: int = 0,
+        seed: Optional[int] = None,
+    ):
+        self.host = host
+        self.port = port
+        self.connect_latency = connect_latency
+        self.latency = latency
+        self.fail_rate = fail_rate
+        self.throttle_per_minute = throttle_per_minute
+        self.max_messages_per_connection = max_messages_per_connection
+        self._random = random.Random(seed)
+        self._accepted_times: list = []
+        self._counts = {"connections": 0, "messages": 0, "failed": 0, "throttled": 0, "bytes": 0}
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._server = None
+        self._writers: set = set()
+        self._thread: Optional[threading.Thread] = None
+        self._ready = threading.Event()
+
+    def stats(self) -> dict:
+        """Return connection and message counters."""
+        return dict(self._counts)
+
+    def _throttled(self) -> bool:
+        if not self.throttle_per_minute:
+            return False
+        now = time.monotonic()
+        self._accepted_times = [t for t in self._accepted_times if t > now - 60]
+        return len(self._accepted_times) >= self.throttle_per_minute
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        self._counts["connections"] += 1
+        self._writers.add(writer)
+        messages_here = 0
+
+        async def reply(line: str) -> None:
+            writer.write(line.encode("ascii") + b"\r\n")
+            await writer.drain()
+
+        try:
+            if self.connect_latency:
+                await asyncio.sleep(self.connect_latency)
+            await reply("220 sink ESMTP ready")
+            while True:
+                line = await reader.readline()
+                if not line:
+                    return
+                command = line.decode("utf-8", "replace").strip()
+                verb = command.split(" ", 1)[0].upper()
+
+                if verb == "EHLO":
+                    writer.write(b"250-sink\r\n250-SIZE 52428800\r\n250-8BITMIME\r\n250 AUTH PLAIN LOGIN\r\n")
+                    await writer.drain()
+                elif verb == "HELO":
+                    await reply("250 sink")
+                elif verb == "AUTH":
+                    parts = command.split()
+                    mechanism = parts[1].upper() if len(parts) > 1 else ""
+                    if mechanism == "LOGIN":
+                        await reply("334 VXNlcm5hbWU6")
+                        await reader.readline()
+                        await reply("334 UGFzc3dvcmQ6")
+                        await reader.readline()
+                    elif mechanism == "PLAIN" and len(parts) == 2:
+                        await reply("334 ")
+                        await reader.readline()
+                    await reply("235 2.7.0 Accepted")
+                elif verb == "MAIL":
+                    if self.max_messages_per_connection and messages_here >= self.max_messages_per_connection:
+                        await reply("421 4.7.0 Too many messages on this connection, closing")
+                        return
+                    if self._throttled():
+                        self._counts["throttled"] += 1
+                        await reply("421 4.7.0 Try again later, closing connection")
+                        return
+                    await reply("250 2.1.0 OK")
+                elif verb == "RCPT":
+                    await reply("250 2.1.5 OK")
+                elif verb == "DATA":
+                    await reply("354 Go ahead")
+                    size = 0
+                    while True:
+                        data_line = await reader.readline()
+                        if not data_line or data_line == b".\r\n":
+                            break
+                        size += len(data_line)
+                    if self.latency:
+                        await asyncio.sleep(self.latency)
+                    messages_here += 1
+                    if self._random.random() < self.fail_rate:
+                        self._counts["failed"] += 1
+                        await reply("451 4.3.0 Temporary failure, try again")
+                    else:
+                        self._counts["messages"] += 1
+                        self._counts["bytes"] += size
+                        self._accepted_times.append(time.monotonic())
+                        await reply("250 2.0.0 OK queued")
+                elif verb in ("RSET", "NOOP"):
+                    await reply("250 2.0.0 OK")
+                elif verb == "QUIT":
+                    await reply("221 2.0.0 Bye")
+                    return
+                else:
+                    await reply("502 5.5.1 Unrecognized command")
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            self._writers.discard(writer)
+            writer.close()
+
+    async def serve(self) -> None:
+        """Run the server on the current event loop until cancelled."""
+        self._server = await asyncio.start_server(self._handle, self.host, self.port)
+        self.port = self._server.sockets[0].getsockname()[1]
+        self._loop = asyncio.get_running_loop()
+        self._ready.set()
+        async with self._server:
+            await self._server.serve_forever()
+
+    def start(self) -> "SMTPSink":
+        """Run the server on a background thread; returns once it is listening."""
+        self._thread = threading.Thread(target=lambda: asyncio.run(self._serve_until_stopped()), daemon=True)
+        self._thread.start()
+        self._ready.wait()
+        return self
+
+    async def _serve_until_stopped(self) -> None:
+        try:
+            await self.serve()
+        except asyncio.CancelledError:
+            pass
+
+    def _shutdown(self) -> None:
+        self._server.close()
+        # Dropping the connections ends their handlers with EOF
+        for writer in list(self._writers):
+            writer.close()
+
+    def stop(self) -> None:
+        """Stop a sink started with start()."""
+        if self._loop and self._server:
+            self._loop.call_soon_threadsafe(self._shutdown)
+        if self._thread:
+            self._thread.join(timeout=5)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Run a local SMTP sink for benchmarks.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=2525)
+    parser.add_argument("--connect-latency", type=float, default=0.0, help="seconds before the greeting")
+    parser.add_argument("--latency", type=float, default=0.0, help="seconds per accepted message")
+    parser.add_argument("--fail-rate", type=float, default=0.0, help="fraction of messages answered 451")
+    parser.add_argument("--throttle-per-minute", type=int, default=0, help="messages/minute before 421")
+    parser.add_argument("--max-messages-per-connection", type=int, default=0)
+    parser.add_argument("--seed", type=int, default=None)
+    args = parser.parse_args()
+
+    sink = SMTPSink(
+        host=args.host,
+        port=args.port,
+        connect_latency=args.connect_latency,
+        latency=args.latency,
+        fail_rate=args.fail_rate,
+        throttle_per_minute=args.throttle_per_minute,
+        max_messages_per_connection=args.max_messages_per_connection,
+        seed=args.seed,
+    )
+
+    async def run() -> None:
+        task = asyncio.create_task(sink.serve())
+        loop = asyncio.get_running_loop()
+        for sig in (signal.SIGINT, signal.SIGTERM):
+            loop.add_signal_handler(sig, task.cancel)
+        while not sink._ready.is_set():
+            await asyncio.sleep(0.01)
+        print(json.dumps({"listening": f"{sink.host}:{sink.port}"}), flush=True)
+        try:
+            await task
+        except asyncio.CancelledError:
+            pass
+
+    asyncio.run(run())
+    print(json.dumps(sink.stats()), flush=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,531 @@
+"""Background bulk admit card sends.
+
+``/admin/users/bulk-send`` records a job and one item per user and returns
+the job id; a runner task on the event loop works through queued jobs,
+rendering each card in the process pool and sending it over the SMTP
+pool. Progress lives in the database, so the admin page can poll it and a
+job interrupted by a restart carries on from its pending items. Users
+whose admit card was already sent are skipped.
+
+With several uvicorn workers each runs a runner, but a job is run by the
+one that claimed it with a conditional UPDATE, and only while no other
+job holds a live claim, so one job runs at a time across all workers.
+The claim is a lease renewed while the job runs; a job whose worker died
+is resumed elsewhere once it lapses, and a job cancelled on another
+worker is noticed at the next renewal.
+
+Sends are paced by ``SendRateShaper`` to stay under the SMTP provider's
+per-minute and rolling 24-hour limits instead of running into them,
+and held while the SMTP circuit breaker is open. The shaper lives in the
+process running the job and is seeded from ``bulk_send_items.sent_at``
+whenever it claims one, so the limits hold across workers and restarts.
+"""
+
+from collections import deque
+from datetime import datetime, timedelta
+from typing import Callable, List, Optional
+from sqlalchemy import exists, func, or_, text
+from sqlalchemy.orm import aliased
+from sqlalchemy.orm import Session
+from database import SessionLocal
+from models import BulkSendJob, BulkSendItem, User, Registration
+from admit_card import AdmitCardGenerator
+from admit_card_cache import admit_card_cache
+from email_service import email_service
+from circuit_breaker import CircuitOpenError
+from executor import run_in_thread
+from config import get_settings
+import asyncio
+import logging
+import os
+import socket
+import time
+import uuid
+
+logger = logging.getLogger("bulk_send")
+
+# Items loaded from the database per round trip
+ITEM_BATCH = 100
+# Rows per INSERT when a job is created
+INSERT_CHUNK = 500
+# How often an idle runner looks for queued jobs when it has not been woken
+POLL_SECONDS = 5
+# PostgreSQL advisory lock id held while claiming a job
+CLAIM_LOCK_KEY = 0x70776275736E64
+DAY_SECONDS = 24 * 60 * 60
+
+
+class SendRateShaper:
+    """
+    Spaces sends evenly to a per-minute rate and caps them per rolling day.
+
+    Args:
+        per_minute: Maximum sends per minute (0 disables the limit)
+        per_day: Maximum sends in any 24 hours (0 disables the limit)
+    """
+
+    def __init__(self, per_minute: int, per_day: int):
+        self.interval = 60.0 / per_minute if per_minute > 0 else 0.0
+        self.per_day = per_day
+        self.waiting_until: Optional[datetime] = None
+        self._next_slot = 0.0
+        self._day: deque = deque()
+
+    def seed(self, sent_times: List[float]) -> None:
+        """Account for sends made in the last day, by any worker or before a restart."""
+        self._day = deque(sorted(sent_times))
+        self._next_slot = self._day[-1] + self.interval if self._day else 0.0
+
+    def _wait_seconds(self, now: float) -> float:
+        while self._day and self._day[0] <= now - DAY_SECONDS:
+            self._day.popleft()
+        if self.per_day and len(self._day) >= self.per_day:
+            return self._day[0] + DAY_SECONDS - now
+        return self._next_slot - now
+
+    async def acquire(self, should_stop: Callable[[], bool]) -> bool:
+        """
+        Wait for the next send slot.
+
+        Args:
+            should_stop: Checked while waiting; waiting ends early when it returns True
+
+        Returns:
+            True when the caller may send, False if it was told to stop
+        """
+        while True:
+            if should_stop():
+                self.waiting_until = None
+                return False
+            now = time.time()
+            wait = self._wait_seconds(now)
+            if wait <= 0:
+                break
+            self.waiting_until = datetime.utcnow() + timedelta(seconds=wait)
+            await asyncio.sleep(min(wait, 1.0))
+
+        self.waiting_until = None
+        self._next_slot = max(now, self._next_slot) + self.interval
+        self._day.append(now)
+        return True
+
+
+class BulkSendRunner:
+    """Creates bulk-send jobs and works through them one at a time."""
+
+    def __init__(self):
+        self.settings = get_settings()
+        self.shaper = SendRateShaper(self.settings.bulk_send_per_minute, self.settings.bulk_send_per_day)
+        self.worker_id = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:6]}"
+        self._wakeup: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+        self._stopping = False
+        # Jobs this worker is running that were cancelled (or whose claim was lost)
+        self._cancelled: set = set()
+
+    # ── Job bookkeeping (sync, run in the thread pool) ────────────────────────
+
+    @staticmethod
+    def submit(db: Session, user_ids: List[int], created_by: Optional[str] = None) -> dict:
+        """
+        Record a job with one pending item per distinct user id.
+
+        Args:
+            db: Database session
+            user_ids: Users to send admit cards to
+            created_by: Admin email, for the job list
+
+        Returns:
+            Dict with the job id and number of items
+        """
+        unique_ids = list(dict.fromkeys(user_ids))
+        job = BulkSendJob(status="queued", created_by=created_by)
+        db.add(job)
+        db.flush()
+        for i in range(0, len(unique_ids), INSERT_CHUNK):
+            db.bulk_insert_mappings(BulkSendItem, [
+                {"job_id": job.id, "user_id": uid, "status": "pending"}
+                for uid in unique_ids[i:i + INSERT_CHUNK]
+            ])
+        db.commit()
+        return {"job_id": job.id, "total": len(unique_ids)}
+
+    @staticmethod
+    def _counts(db: Session, job_ids: List[int]) -> dict:
+        rows = db.query(
+            BulkSendItem.job_id, BulkSendItem.status, func.count(BulkSendItem.id)
+        ).filter(BulkSendItem.job_id.in_(job_ids)).group_by(BulkSendItem.job_id, BulkSendItem.status).all()
+        counts = {job_id: {"pending": 0, "sent": 0, "failed": 0, "skipped": 0} for job_id in job_ids}
+        for job_id, item_status, count in rows:
+            counts[job_id][item_status] = count
+        return counts
+
+    def _describe(self, job: BulkSendJob, counts: dict) -> dict:
+        waiting_until = self.shaper.waiting_until if job.status == "running" else None
+        return {
+            "job_id": job.id,
+            "status": job.status,
+            "created_by": job.created_by,
+            "created_at": job.created_at.isoformat() if job.created_at else None,
+            "started_at": job.started_at.isoformat() if job.started_at else None,
+            "finished_at": job.finished_at.isoformat() if job.finished_at else None,
+            "total": sum(counts.values()),
+            "counts": counts,
+            # Set while sending is paused to respect the SMTP rate limits
+            "rate_limited_until": waiting_until.isoformat() if waiting_until else None,
+        }
+
+    def progress(self, db: Session, job_id: int, include_items: bool = False) -> Optional[dict]:
+        """
+        Return status and per-status item counts for a job.
+
+        Args:
+            db: Database session
+            job_id: Job id
+            include_items: Also list every item's user id, status and detail
+
+        Returns:
+            Progress dict, or None if the job does not exist
+        """
+        job = db.query(BulkSendJob).filter(BulkSendJob.id == job_id).first()
+        if not job:
+            return None
+        result = self._describe(job, self._counts(db, [job_id])[job_id])
+        if include_items:
+            items = db.query(
+                BulkSendItem.user_id, BulkSendItem.status, BulkSendItem.detail
+            ).filter(BulkSendItem.job_id == job_id).order_by(BulkSendItem.id).all()
+            result["items"] = [
+                {"user_id": user_id, "status": item_status, "detail": detail}
+                for user_id, item_status, detail in items
+            ]
+        return result
+
+    def list_jobs(self, db: Session, limit: int = 20) -> List[dict]:
+        """Return the most recent jobs, newest first."""
+        jobs = db.query(BulkSendJob).order_by(BulkSendJob.id.desc()).limit(limit).all()
+        if not jobs:
+            return []
+        counts = self._counts(db, [job.id for job in jobs])
+        return [self._describe(job, counts[job.id]) for job in jobs]
+
+    def cancel(self, db: Session, job_id: int) -> Optional[str]:
+        """
+        Stop a queued or running job; items not yet sent stay pending.
+
+        Returns:
+            The job's status afterwards, or None if the job does not exist
+        """
+        job = db.query(BulkSendJob).filter(BulkSendJob.id == job_id).first()
+        if not job:
+            return None
+        # Conditional, so it can't race with a worker claiming the job
+        cancelled = db.query(BulkSendJob).filter(
+            BulkSendJob.id == job_id,
+            BulkSendJob.status.in_(["queued", "running"])
+        ).update({
+            BulkSendJob.status: "cancelled",
+            BulkSendJob.finished_at: datetime.utcnow(),
+        }, synchronize_session=False)
+        db.commit()
+        db.refresh(job)
+        if cancelled and job.locked_by == self.worker_id:
+            # Running here: stop at once rather than at the next lease renewal
+            self._cancelled.add(job_id)
+        return job.status
+
+    def _claim_next_job(self) -> Optional[int]:
+        """
+        Claim the oldest queued job, or a running one whose worker's lease lapsed.
+
+        Nothing is claimed while another job holds a live lease: each
+        worker paces only its own sends, so the SMTP limits hold only if
+        one job runs at a time. Jobs left running by a crash or restart
+        are resumed here.
+        """
+        now = datetime.utcnow()
+        other = aliased(BulkSendJob)
+        claimable = or_(
+            BulkSendJob.status == "queued",
+            (BulkSendJob.status == "running") & or_(
+                BulkSendJob.locked_until.is_(None), BulkSendJob.locked_until < now
+            )
+        ) & ~exists().where(
+            other.id != BulkSendJob.id,
+            other.status == "running",
+            other.locked_until >= now
+        )
+        db = SessionLocal()
+        serialize = db.get_bind().dialect.name == "postgresql"
+        try:
+            candidates = db.query(BulkSendJob.id, BulkSendJob.status).filter(
+                claimable
+            ).order_by(BulkSendJob.id).limit(5).all()
+            for job_id, job_status in candidates:
+                if serialize:
+                    # SQLite runs the UPDATE under its write lock; on PostgreSQL two claims of
+                    # different jobs could both pass the NOT EXISTS, so take turns
+                    db.execute(text("SELECT pg_advisory_xact_lock(:key)"), {"key": CLAIM_LOCK_KEY})
+                claimed = db.query(BulkSendJob).filter(BulkSendJob.id == job_id, claimable).update({
+                    BulkSendJob.status: "running",
+                    BulkSendJob.started_at: func.coalesce(BulkSendJob.started_at, now),
+                    BulkSendJob.locked_by: self.worker_id,
+                    BulkSendJob.locked_until: now + timedelta(seconds=self.settings.bulk_send_lease_seconds),
+                }, synchronize_session=False)
+                db.commit()
+                if claimed:
+                    if job_status == "running":
+                        logger.info(f"Resuming bulk send job {job_id}")
+                    return job_id
+            return None
+        finally:
+            db.close()
+
+    def _renew_claim(self, job_id: int) -> bool:
+        """Extend this worker's lease on a running job; False once the job was cancelled or taken over."""
+        db = SessionLocal()
+        try:
+            renewed = db.query(BulkSendJob).filter(
+                BulkSendJob.id == job_id,
+                BulkSendJob.status == "running",
+                BulkSendJob.locked_by == self.worker_id
+            ).update({
+                BulkSendJob.locked_until: datetime.utcnow() + timedelta(seconds=self.settings.bulk_send_lease_seconds),
+            }, synchronize_session=False)
+            db.commit()
+            return bool(renewed)
+        finally:
+            db.close()
+
+    @staticmethod
+    def _load_pending(job_id: int, after_item_id: int) -> tuple:
+        """
+        Load the next pending items, settling those that need no email as skipped.
+
+        Returns:
+            (entries, last_item_id): send entries with item id, user id, email
+            and admit card fields, and the last item id seen (None when done)
+        """
+        db = SessionLocal()
+        try:
+            rows = db.query(BulkSendItem, User, Registration).outerjoin(
+                User, User.id == BulkSendItem.user_id
+            ).outerjoin(
+                Registration, Registration.user_id == BulkSendItem.user_id
+            ).filter(
+                BulkSendItem.job_id == job_id,
+                BulkSendItem.status == "pending",
+                BulkSendItem.id > after_item_id
+            ).order_by(BulkSendItem.id).limit(ITEM_BATCH).all()
+
+            entries = []
+            for item, user, registration in rows:
+                if not user or not registration:
+                    item.status, item.detail = "skipped", "no registration"
+                elif registration.admit_card_sent:
+                    item.status, item.detail = "skipped", "already sent"
+                else:
+                    entries.append({
+                        "item_id": item.id,
+                        "user_id": user.id,
+                        "email": user.email,
+                        "fields": AdmitCardGenerator.fields_from_registration(registration),
+                    })
+            db.commit()
+            # Keep paging past skipped rows even if the whole batch was skipped
+            last_id = rows[-1][0].id if rows else None
+            return entries, last_id
+        finally:
+            db.close()
+
+    @staticmethod
+    def _record(item_id: int, user_id: int, ok: bool, detail: Optional[str]) -> None:
+        """Store one delivery outcome; a sent card also flags the registration."""
+        db = SessionLocal()
+        try:
+            db.query(BulkSendItem).filter(BulkSendItem.id == item_id).update({
+                BulkSendItem.status: "sent" if ok else "failed",
+                BulkSendItem.detail: detail,
+                BulkSendItem.sent_at: datetime.utcnow() if ok else None,
+            }, synchronize_session=False)
+            if ok:
+                db.query(Registration).filter(
+                    Registration.user_id == user_id
+                ).update({Registration.admit_card_sent: True}, synchronize_session=False)
+            db.commit()
+        finally:
+            db.close()
+
+    def _finish_job(self, job_id: int, done: bool) -> None:
+        """Mark the job done (when done) and let go of this worker's claim."""
+        values = {BulkSendJob.locked_by: None, BulkSendJob.locked_until: None}
+        if done:
+            values.update({BulkSendJob.status: "done", BulkSendJob.finished_at: datetime.utcnow()})
+        db = SessionLocal()
+        try:
+            db.query(BulkSendJob).filter(
+                BulkSendJob.id == job_id,
+                BulkSendJob.locked_by == self.worker_id
+            ).update(values, synchronize_session=False)
+            db.commit()
+        finally:
+            db.close()
+
+    @staticmethod
+    def _recent_send_times() -> List[float]:
+        since = datetime.utcnow() - timedelta(seconds=DAY_SECONDS)
+        db = SessionLocal()
+        try:
+            rows = db.query(BulkSendItem.sent_at).filter(BulkSendItem.sent_at >= since).all()
+            epoch = datetime(1970, 1, 1)
+            return [(sent_at - epoch).total_seconds() for (sent_at,) in rows]
+        finally:
+            db.close()
+
+    # ── Runner (event loop) ───────────────────────────────────────────────────
+
+    def notify(self) -> None:
+        """Wake the runner after a job was submitted."""
+        if self._wakeup is not None:
+            self._wakeup.set()
+
+    async def _wait_for_smtp(self, should_stop: Callable[[], bool]) -> bool:
+        """Hold sends while the SMTP circuit is open; False if stopped while waiting."""
+        while not should_stop():
+            retry_after = email_service.smtp_breaker.retry_after()
+            if not retry_after:
+                return True
+            await asyncio.sleep(min(retry_after, 1.0))
+        return False
+
+    async def _deliver(self, slots: asyncio.Semaphore, entry: dict, deferred: set) -> None:
+        fields = entry["fields"]
+        detail = None
+        try:
+            pdf_bytes = await admit_card_cache.get_pdf_async(fields)
+            ok = await run_in_thread(
+                email_service.send_admit_card_email,
+                recipient_email=entry["email"],
+                student_name=fields["name"],
+                roll_no=fields["roll_no"],
+                pdf_bytes=pdf_bytes
+            )
+            if not ok:
+                detail = "email delivery failed"
+        except CircuitOpenError:
+            # Not attempted: the item stays pending and is retried once the circuit closes
+            deferred.add(entry["item_id"])
+            return
+        except Exception as e:
+            logger.error(f"Bulk send failed for uid={entry['user_id']}: {e}")
+            ok, detail = False, str(e)
+        finally:
+            slots.release()
+        await run_in_thread(self._record, entry["item_id"], entry["user_id"], ok, detail)
+
+    async def _keep_claim(self, job_id: int) -> None:
+        """Renew the job's lease until cancelled; a lost claim stops the job."""
+        while True:
+            await asyncio.sleep(self.settings.bulk_send_lease_seconds / 3)
+            try:
+                if not await run_in_thread(self._renew_claim, job_id):
+                    logger.info(f"Bulk send job {job_id} was cancelled or taken over; stopping")
+                    self._cancelled.add(job_id)
+                    return
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Could not renew bulk send job {job_id}: {e}")
+
+    async def _run_job(self, job_id: int) -> None:
+        slots = asyncio.Semaphore(self.settings.bulk_send_smtp_concurrency)
+        in_flight: set = set()
+        deferred: set = set()
+        stopped = lambda: self._stopping or job_id in self._cancelled
+        heartbeat = asyncio.create_task(self._keep_claim(job_id))
+
+        try:
+            last_item_id = 0
+            while not stopped():
+                entries, last_id = await run_in_thread(self._load_pending, job_id, last_item_id)
+                if last_id is None:
+                    if in_flight:
+                        await asyncio.gather(*in_flight)
+                    if not deferred:
+                        break
+                    # Items turned away by the open circuit are still pending; take another pass
+                    deferred.clear()
+                    last_item_id = 0
+                    continue
+                last_item_id = last_id
+                for entry in entries:
+                    if not await self._wait_for_smtp(stopped) or not await self.shaper.acquire(stopped):
+                        break
+                    await slots.acquire()
+                    task = asyncio.create_task(self._deliver(slots, entry, deferred))
+                    in_flight.add(task)
+                    task.add_done_callback(in_flight.discard)
+
+            if in_flight:
+                await asyncio.gather(*in_flight)
+        except asyncio.CancelledError:
+            for task in in_flight:
+                task.cancel()
+            raise
+        finally:
+            heartbeat.cancel()
+
+        done = not stopped()
+        # On shutdown the claim is released so the job resumes without waiting for it to lapse
+        await run_in_thread(self._finish_job, job_id, done)
+        if done:
+            logger.info(f"Bulk send job {job_id} finished")
+        self._cancelled.discard(job_id)
+
+    async def _run(self) -> None:
+        while not self._stopping:
+            try:
+                job_id = await run_in_thread(self._claim_next_job)
+                if job_id is not None:
+                    # Another worker may have sent since this one last ran a job
+                    self.shaper.seed(await run_in_thread(self._recent_send_times))
+                    await self._run_job(job_id)
+                    continue
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Bulk send runner error: {e}")
+
+            self._wakeup.clear()
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), POLL_SECONDS)
+            except asyncio.TimeoutError:
+                pass
+
+    async def start(self) -> None:
+        """Start the runner; unfinished jobs from before a restart are resumed."""
+        if self._task is not None:
+            return
+        self._stopping = False
+        self._wakeup = asyncio.Event()
+        self._task = asyncio.create_task(self._run())
+        logger.info("Bulk send runner started")
+
+    async def stop(self) -> None:
+        """Stop starting new sends and give in-flight ones BULK_SEND_DRAIN_SECONDS to finish."""
+        if self._task is None:
+            return
+        self._stopping = True
+        self._wakeup.set()
+        try:
+            await asyncio.wait_for(self._task, self.settings.bulk_send_drain_seconds)
+        except asyncio.TimeoutError:
+            logger.warning("Bulk send runner did not stop in time; unsent items resume on restart")
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+        logger.info("Bulk send runner stopped")
+
+
+# Singleton instance
+bulk_send_runner = BulkSendRunner()
@@ -0,0 +1,146 @@
+"""Circuit breaker for calls to an unreliable dependency (the SMTP server).
+
+The breaker watches the outcome and latency of recent calls. When too
+many of them failed or were slow it opens, and callers fail fast with
+``CircuitOpenError`` instead of waiting on socket timeouts. After a
+cool-down it lets a single probe call through (half-open): success closes
+the circuit, failure re-opens it with a longer cool-down.
+"""
+
+from collections import deque
+from typing import Optional
+import logging
+import math
+import threading
+import time
+
+logger = logging.getLogger("circuit_breaker")
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class CircuitOpenError(RuntimeError):
+    """Raised instead of calling a dependency whose circuit is open; surfaced as 503."""
+
+    def __init__(self, name: str, retry_after: float):
+        super().__init__(f"{name} is unavailable, retry in {math.ceil(retry_after)}s")
+        self.retry_after = retry_after
+
+
+class CircuitBreaker:
+    """
+    Failure- and latency-aware circuit breaker.
+
+    Args:
+        name: Dependency name for errors, logs and stats
+        failure_threshold: Failed or slow calls among the last `window` that open the circuit
+        window: Number of recent calls considered
+        slow_call_seconds: Calls slower than this count as failures
+        open_seconds: Cool-down before the first probe
+        max_open_seconds: Cap for the cool-down, which doubles after each failed probe
+    """
+
+    def __init__(
+        self,
+        name: str,
+        failure_threshold: int = 5,
+        window: int = 20,
+        slow_call_seconds: float = 5.0,
+        open_seconds: float = 30.0,
+        max_open_seconds: float = 300.0,
+    ):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.slow_call_seconds = slow_call_seconds
+        self.open_seconds = open_seconds
+        self.max_open_seconds = max_open_seconds
+
+        self._state = CLOSED
+        self._outcomes: deque = deque(maxlen=window)
+        self._cooldown = open_seconds
+        self._opened_at = 0.0
+        self._probe_in_flight = False
+        self._rejected = 0
+        self._lock = threading.Lock()
+
+    def _retry_after(self, now: float) -> float:
+        return max(0.0, self._opened_at + self._cooldown - now)
+
+    def before_call(self) -> None:
+        """
+        Check that a call may go ahead.
+
+        Raises:
+            CircuitOpenError: While open, or in half-open state with a probe already running
+        """
+        with self._lock:
+            if self._state == CLOSED:
+                return
+            now = time.monotonic()
+            if self._state == OPEN and self._retry_after(now) == 0:
+                self._state = HALF_OPEN
+                logger.info(f"{self.name} circuit half-open, probing")
+            if self._state == HALF_OPEN and not self._probe_in_flight:
+                self._probe_in_flight = True
+                return
+            self._rejected += 1
+            raise CircuitOpenError(self.name, self._retry_after(now) or 1.0)
+
+    def record(self, ok: bool, duration: float) -> None:
+        """
+        Record the outcome of a call that before_call() allowed.
+
+        Args:
+            ok: Whether the call succeeded
+            duration: Seconds the call took; slow calls count as failures
+        """
+        healthy = ok and duration <= self.slow_call_seconds
+        with self._lock:
+            if self._state == HALF_OPEN:
+                self._probe_in_flight = False
+                if healthy:
+                    self._state = CLOSED
+                    self._outcomes.clear()
+                    self._cooldown = self.open_seconds
+                    logger.info(f"{self.name} circuit closed")
+                else:
+                    self._trip(min(self._cooldown * 2, self.max_open_seconds))
+                return
+
+            self._outcomes.append(healthy)
+            failures = self._outcomes.count(False)
+            if self._state == CLOSED and failures >= self.failure_threshold:
+                self._trip(self.open_seconds)
+
+    def _trip(self, cooldown: float) -> None:
+        self._state = OPEN
+        self._opened_at = time.monotonic()
+        self._cooldown = cooldown
+        self._outcomes.clear()
+        logger.warning(f"{self.name} circuit open for {cooldown:.0f}s")
+
+    def retry_after(self) -> Optional[float]:
+        """Seconds until calls are allowed again, or None if the circuit is closed."""
+        with self._lock:
+            if self._state == CLOSED:
+                return None
+            return self._retry_after(time.monotonic())
+
+    def is_open(self) -> bool:
+        """True while calls would be rejected outright (open and still cooling down)."""
+        retry_after = self.retry_after()
+        return retry_after is not None and retry_after > 0
+
+    def stats(self) -> dict:
+        """Return state and counters for the health endpoint."""
+        with self._lock:
+            retry_after = self._retry_after(time.monotonic()) if self._state == OPEN else None
+            return {
+                "state": self._state,
+                "recent_failures": self._outcomes.count(False),
+                "recent_calls": len(self._outcomes),
+                "retry_after": round(retry_after, 1) if retry_after is not None else None,
+                "rejected": self._rejected,
+            }
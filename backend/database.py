@@ -1,28 +1,151 @@
 """Database configuration and session management."""
 
-from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker, declarative_base
+from sqlalchemy import create_engine, event, make_url
+from sqlalchemy.engine import URL, Engine
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.orm import Session, sessionmaker, declarative_base
 from pathlib import Path
+from typing import Any, Callable, Optional
+from config import get_settings
+from executor import run_in_thread
+import functools
+import logging
+import random
+import time
+
+logger = logging.getLogger("database")
 
 # Create database directory if it doesn't exist
 DB_DIR = Path(__file__).parent / "data"
 DB_DIR.mkdir(exist_ok=True)
 
-DATABASE_URL = f"sqlite:///{DB_DIR / 'app.db'}"
+DATABASE_URL = get_settings().database_url or f"sqlite:///{DB_DIR / 'app.db'}"
+# Imported exam results live apart, so imports and public searches never wait
+# on the registration and auth tables' writer
+RESULTS_DATABASE_URL = get_settings().results_database_url or f"sqlite:///{DB_DIR / 'results.db'}"
+if RESULTS_DATABASE_URL == DATABASE_URL:
+    # Each database keeps its own schema_version
+    raise ValueError("RESULTS_DATABASE_URL must name a different database than DATABASE_URL")
+
+
+def _engine_options(url: URL) -> dict:
+    """create_engine() arguments for the URL's dialect, from the DB_POOL_* settings."""
+    settings = get_settings()
+    options = {"echo": False}
+    if url.get_backend_name() == "sqlite":
+        # Sessions are used from the thread pool, not the thread that opened them
+        options["connect_args"] = {"check_same_thread": False}
+        if url.database in (None, "", ":memory:"):
+            # In-memory databases get a single-connection pool that takes no sizing
+            return options
+    else:
+        options["pool_recycle"] = settings.db_pool_recycle_seconds
+        options["pool_pre_ping"] = settings.db_pool_pre_ping
+    options["pool_size"] = settings.db_pool_size
+    options["max_overflow"] = settings.db_pool_max_overflow
+    options["pool_timeout"] = settings.db_pool_timeout_seconds
+    return options
+
+
+def _make_engine(url: str) -> Engine:
+    """Create an engine for the URL, applying the SQLite profile when it is SQLite."""
+    parsed = make_url(url)
+    new_engine = create_engine(parsed, **_engine_options(parsed))
+    if new_engine.dialect.name == "sqlite":
+        event.listen(new_engine, "connect", _apply_sqlite_profile)
+    return new_engine
+
+
+# ── SQLite only ───────────────────────────────────────────────────────────────
+
+def _sqlite_pragmas() -> dict:
+    """PRAGMAs applied to every new SQLite connection, from the SQLITE_* settings."""
+    settings = get_settings()
+    return {
+        "journal_mode": settings.sqlite_journal_mode,
+        "synchronous": settings.sqlite_synchronous,
+        "busy_timeout": settings.sqlite_busy_timeout_ms,
+        # Negative cache_size is in KiB rather than pages
+        "cache_size": -settings.sqlite_cache_size_kib,
+        "mmap_size": settings.sqlite_mmap_size_mb * 1024 * 1024,
+        "temp_store": settings.sqlite_temp_store,
+    }
+
+
+def _apply_sqlite_profile(dbapi_connection, connection_record) -> None:
+    cursor = dbapi_connection.cursor()
+    for name, value in _sqlite_pragmas().items():
+        cursor.execute(f"PRAGMA {name}={value}")
+    cursor.close()
+
+
+def describe_sqlite_profile(db_engine: Optional[Engine] = None) -> dict:
+    """Read back the PRAGMAs in effect on a pooled connection (of the main engine by default)."""
+    with (db_engine or engine).connect() as conn:
+        raw = conn.connection.dbapi_connection
+        # Some PRAGMAs (mmap_size) report nothing for in-memory databases
+        rows = {name: raw.execute(f"PRAGMA {name}").fetchone() for name in _sqlite_pragmas()}
+        return {name: row[0] if row else None for name, row in rows.items()}
+
+
+engine = _make_engine(DATABASE_URL)
+IS_SQLITE = engine.dialect.name == "sqlite"
+results_engine = _make_engine(RESULTS_DATABASE_URL)
+
+
+# ── Write retries ─────────────────────────────────────────────────────────────
+
+# Transient write conflicts: SQLite's lock, and deadlocks or serialization
+# failures on a server database
+_RETRYABLE_ERRORS = ("database is locked", "database is busy", "deadlock detected", "could not serialize access")
+
+
+def _is_lock_error(error: OperationalError) -> bool:
+    message = str(error.orig).lower()
+    return any(fragment in message for fragment in _RETRYABLE_ERRORS)
+
+
+def retry_on_locked(func):
+    """
+    Retry a unit of work that failed with "database is locked" (or a deadlock).
+
+    The wrapped function is re-run from the start after a jittered,
+    exponentially growing pause, up to DB_WRITE_RETRIES times. If its first
+    argument is a Session, that session is rolled back before each retry.
+    Use it on functions that do all of their writes and commit them.
+    """
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        settings = get_settings()
+        for attempt in range(settings.db_write_retries + 1):
+            try:
+                return func(*args, **kwargs)
+            except OperationalError as e:
+                if attempt == settings.db_write_retries or not _is_lock_error(e):
+                    raise
+                if args and isinstance(args[0], Session):
+                    args[0].rollback()
+                delay = settings.db_write_retry_base_ms / 1000 * 2 ** attempt
+                delay *= random.uniform(0.5, 1.5)
+                logger.warning(f"{func.__name__}: {e.orig}, retry {attempt + 1} in {delay * 1000:.0f}ms")
+                time.sleep(delay)
+    return wrapper
 
-engine = create_engine(
-    DATABASE_URL,
-    connect_args={"check_same_thread": False},
-    echo=False
-)
 
 SessionLocal = sessionmaker(
     autocommit=False,
     autoflush=False,
     bind=engine
 )
+ResultsSessionLocal = sessionmaker(
+    autocommit=False,
+    autoflush=False,
+    bind=results_engine
+)
 
 Base = declarative_base()
+# Models stored in the results database
+ResultsBase = declarative_base()
 
 
 def get_db():
@@ -34,64 +157,57 @@ def get_db():
         db.close()
 
 
-def init_db() -> None:
-    """Initialize database tables and apply any missing column migrations."""
-    from sqlalchemy import text, inspect
-    import re
-    Base.metadata.create_all(bind=engine)
-
-    # Migrate: add missing columns to registrations if they don't exist
-    with engine.connect() as conn:
-        inspector = inspect(engine)
-        existing_cols = [c["name"] for c in inspector.get_columns("registrations")]
-        if "exam_time" not in existing_cols:
-            conn.execute(text("ALTER TABLE registrations ADD COLUMN exam_time VARCHAR DEFAULT ''"))
-            conn.commit()
-        if "admit_card_sent" not in existing_cols:
-            conn.execute(text("ALTER TABLE registrations ADD COLUMN admit_card_sent BOOLEAN DEFAULT 0 NOT NULL"))
-            conn.commit()
-        if "current_class" not in existing_cols:
-            conn.execute(text("ALTER TABLE registrations ADD COLUMN current_class VARCHAR DEFAULT ''"))
-            conn.commit()
-        
-        # check for student_results table and add scholarship column if missing
-        try:
-            student_cols = [c["name"] for c in inspector.get_columns("student_results")]
-        except Exception:
-            student_cols = []
-        
-        if "scholarship" not in student_cols:
-            conn.execute(text("ALTER TABLE student_results ADD COLUMN scholarship FLOAT DEFAULT NULL"))
-            conn.commit()
-
-    otp_cols = [c["name"] for c in inspector.get_columns("otp_codes")]
-    with engine.connect() as conn:
-        if "failed_attempts" not in otp_cols:
-            conn.execute(text("ALTER TABLE otp_codes ADD COLUMN failed_attempts INTEGER DEFAULT 0 NOT NULL"))
-            conn.commit()
-
-    # Normalize phone numbers stored in student_results (remove decimals/non-digits)
+def get_results_db():
+    """Dependency for getting a results database session in routes."""
+    db = ResultsSessionLocal()
+    try:
+        yield db
+    finally:
+        db.close()
+
+
+def _with_session(factory: sessionmaker, func: Callable[..., Any], *args: Any) -> Any:
+    db = factory()
     try:
-        student_cols = [c["name"] for c in inspector.get_columns("student_results")]
-    except Exception:
-        student_cols = []
-
-    if student_cols:
-        # Run normalization in Python using SQLAlchemy session
-        from models import StudentResult
-        db = SessionLocal()
-        try:
-            rows = db.query(StudentResult).all()
-            for r in rows:
-                if r.phone:
-                    normalized = ''.join(re.findall(r"\d+", str(r.phone)))
-                    # If phone was parsed as float like '9876543210.0', regex may join groups; handle common trailing '0' from '.0'
-                    # If normalized ends with an extra '0' and original string endswith('.0'), strip the trailing '0'
-                    raw = str(r.phone)
-                    if raw.endswith('.0') and normalized.endswith('0'):
-                        normalized = normalized[:-1]
-                    if normalized != r.phone:
-                        r.phone = normalized
-            db.commit()
-        finally:
-            db.close()
+        return func(db, *args)
+    finally:
+        db.close()
+
+
+async def run_in_session(func: Callable[..., Any], *args: Any, factory: sessionmaker = SessionLocal) -> Any:
+    """
+    Run func(db, *args) on the thread pool with a session of its own.
+
+    The session is opened and closed in the worker thread, so a request
+    holds a pooled connection only while its unit of work runs, never while
+    it waits for a pool slot, another dependency or the client. Async
+    routes use this; get_db remains for sync routes and admin tooling.
+
+    Args:
+        func: Unit of work, called with the session first
+        *args: Further arguments for func
+        factory: Session factory; ResultsSessionLocal for the results database
+
+    Raises:
+        PoolBusyError: If the thread pool is saturated
+    """
+    return await run_in_thread(_with_session, factory, func, *args)
+
+
+def init_db() -> None:
+    """Log the connection setup and bring both schemas up to date (see migrations.py)."""
+    from migrations import migrate, migrate_results
+    for name, db_engine in (("Database", engine), ("Results database", results_engine)):
+        if db_engine.dialect.name == "sqlite":
+            profile = describe_sqlite_profile(db_engine)
+            logger.info(f"{name} {db_engine.url.database}, SQLite profile: " + ", ".join(
+                f"{pragma}={value}" for pragma, value in profile.items()
+            ))
+        else:
+            logger.info(
+                f"{name} {db_engine.url.render_as_string(hide_password=True)} "
+                f"(pool size={db_engine.pool.size()}, max_overflow={get_settings().db_pool_max_overflow})"
+            )
+    # The results schema first: a main database step moves old results into it
+    logger.info(f"Results database schema version {migrate_results()}")
+    logger.info(f"Database schema version {migrate()}")
@@ -0,0 +1,270 @@
+"""Durable outbox for OTP emails.
+
+``/auth/send-otp`` writes the OTP and an ``email_outbox`` row in the same
+transaction and returns straight away; a background task on the event
+loop delivers pending rows through the SMTP pool. Failed sends are
+retried with exponential backoff; while the SMTP circuit breaker is open
+the worker leaves pending rows alone instead of burning their attempts.
+Rows live in the database, so mail queued before a restart is picked up
+again on startup, and shutdown waits a few seconds for due messages to
+drain.
+
+Every uvicorn worker runs the delivery task. A worker sends a message
+only after claiming its row with a conditional UPDATE (status "sending",
+with the lease expiry in next_attempt_at), so each message goes out once;
+a claim left by a crashed worker lapses after EMAIL_OUTBOX_LEASE_SECONDS.
+"""
+
+from datetime import datetime, timedelta
+from typing import Optional
+from sqlalchemy import exists, func, or_, select, update
+from sqlalchemy.orm import Session, aliased
+from database import SessionLocal
+from models import OutboxEmail
+from email_service import email_service
+from circuit_breaker import CircuitOpenError
+from executor import run_in_thread
+from config import get_settings
+import asyncio
+import logging
+import uuid
+
+logger = logging.getLogger("email_outbox")
+
+
+class EmailOutbox:
+    """Queue of outgoing emails backed by the email_outbox table."""
+
+    def __init__(self):
+        self.settings = get_settings()
+        self._wakeup: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+        self._stopping = False
+
+    @staticmethod
+    def enqueue_otp(db: Session, email: str, otp_code: str) -> OutboxEmail:
+        """
+        Add an OTP email to the outbox without committing.
+
+        The caller commits it together with the OTP itself.
+
+        Args:
+            db: Database session
+            email: Recipient address
+            otp_code: OTP to send
+
+        Returns:
+            The pending OutboxEmail row
+        """
+        message = OutboxEmail(
+            public_id=uuid.uuid4().hex,
+            kind="otp",
+            recipient=email,
+            payload=otp_code,
+            status="pending",
+            next_attempt_at=datetime.utcnow(),
+        )
+        db.add(message)
+        return message
+
+    @staticmethod
+    def get_status(db: Session, public_id: str) -> Optional[dict]:
+        """
+        Look up delivery status by the id returned from send-otp.
+
+        Returns:
+            Dict with status and attempts, or None if unknown
+        """
+        message = db.query(OutboxEmail).filter(OutboxEmail.public_id == public_id).first()
+        if not message:
+            return None
+        return {"status": message.status, "attempts": message.attempts}
+
+    @staticmethod
+    def get_stats(db: Session) -> dict:
+        """Return message counts per status."""
+        rows = db.query(OutboxEmail.status, func.count(OutboxEmail.id)).group_by(OutboxEmail.status).all()
+        return {status: count for status, count in rows}
+
+    def notify(self) -> None:
+        """Wake the worker after new messages were committed."""
+        if self._wakeup is not None:
+            self._wakeup.set()
+
+    def _claim_due(self) -> list:
+        """
+        Claim due messages for this worker and return them as tuples.
+
+        OTPs that expired while queued are settled as expired, and OTPs
+        replaced by a newer code for the same address as superseded; neither
+        is sent.
+
+        Returns:
+            (id, kind, recipient, payload, attempts) of each claimed message
+        """
+        now = datetime.utcnow()
+        expired_before = now - timedelta(minutes=self.settings.otp_expiry_minutes)
+        # Pending and due, or claimed by a worker whose lease has lapsed
+        due = (
+            or_(OutboxEmail.status == "pending", OutboxEmail.status == "sending"),
+            OutboxEmail.next_attempt_at <= now,
+        )
+        newer = aliased(OutboxEmail)
+        db = SessionLocal()
+        try:
+            db.execute(update(OutboxEmail).where(
+                *due,
+                OutboxEmail.kind == "otp",
+                OutboxEmail.created_at < expired_before
+            ).values(status="expired", payload=None))
+            db.execute(update(OutboxEmail).where(
+                *due,
+                OutboxEmail.kind == "otp",
+                exists().where(
+                    newer.kind == "otp",
+                    newer.recipient == OutboxEmail.recipient,
+                    newer.id > OutboxEmail.id
+                )
+            ).values(status="superseded", payload=None))
+
+            batch_ids = select(OutboxEmail.id).where(*due).order_by(
+                OutboxEmail.next_attempt_at
+            ).limit(self.settings.email_outbox_batch_size).scalar_subquery()
+            # The conditions are checked again on each row, so of several
+            # workers claiming at once only one gets it
+            claimed = db.execute(
+                update(OutboxEmail).where(OutboxEmail.id.in_(batch_ids), *due).values(
+                    status="sending",
+                    next_attempt_at=now + timedelta(seconds=self.settings.email_outbox_lease_seconds)
+                ).returning(
+                    OutboxEmail.id, OutboxEmail.kind, OutboxEmail.recipient,
+                    OutboxEmail.payload, OutboxEmail.attempts
+                )
+            ).all()
+            db.commit()
+            return [tuple(row) for row in claimed]
+        finally:
+            db.close()
+
+    def _record_result(self, message_id: int, ok: bool, attempts: int) -> None:
+        db = SessionLocal()
+        try:
+            message = db.query(OutboxEmail).filter(
+                OutboxEmail.id == message_id,
+                # Still ours: not settled by a worker that took over a lapsed claim
+                OutboxEmail.status == "sending"
+            ).first()
+            if not message:
+                return
+            message.attempts = attempts
+            if ok:
+                message.status = "sent"
+                message.sent_at = datetime.utcnow()
+                message.payload = None
+                message.last_error = None
+            elif attempts >= self.settings.email_outbox_max_attempts:
+                message.status = "failed"
+                message.payload = None
+                message.last_error = "SMTP delivery failed"
+                logger.error(f"Giving up on {message.kind} email to {message.recipient} after {attempts} attempts")
+            else:
+                delay = min(
+                    self.settings.email_outbox_backoff_base_seconds * 2 ** (attempts - 1),
+                    self.settings.email_outbox_backoff_max_seconds
+                )
+                message.status = "pending"
+                message.next_attempt_at = datetime.utcnow() + timedelta(seconds=delay)
+                message.last_error = "SMTP delivery failed"
+                logger.warning(f"Retrying {message.kind} email to {message.recipient} in {delay}s (attempt {attempts})")
+            db.commit()
+        finally:
+            db.close()
+
+    def _defer(self, message_id: int, seconds: float) -> None:
+        """Push a message back until the SMTP circuit may close, without counting an attempt."""
+        db = SessionLocal()
+        try:
+            db.query(OutboxEmail).filter(
+                OutboxEmail.id == message_id,
+                OutboxEmail.status == "sending"
+            ).update(
+                {
+                    OutboxEmail.status: "pending",
+                    OutboxEmail.next_attempt_at: datetime.utcnow() + timedelta(seconds=seconds),
+                },
+                synchronize_session=False
+            )
+            db.commit()
+        finally:
+            db.close()
+
+    async def _deliver(self, slots: asyncio.Semaphore, message: tuple) -> None:
+        message_id, kind, recipient, payload, attempts = message
+        async with slots:
+            try:
+                ok = await run_in_thread(email_service.send_otp_email, recipient, payload)
+            except CircuitOpenError as e:
+                await run_in_thread(self._defer, message_id, e.retry_after)
+                return
+            except Exception as e:
+                logger.error(f"Outbox delivery to {recipient} raised: {e}")
+                ok = False
+        await run_in_thread(self._record_result, message_id, ok, attempts + 1)
+
+    async def _process_due(self) -> int:
+        """Send every message that is due now; returns how many were attempted."""
+        if email_service.smtp_breaker.is_open():
+            return 0
+        batch = await run_in_thread(self._claim_due)
+        if batch:
+            slots = asyncio.Semaphore(self.settings.smtp_pool_size)
+            await asyncio.gather(*(self._deliver(slots, message) for message in batch))
+        return len(batch)
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                attempted = await self._process_due()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Outbox worker error: {e}")
+                attempted = 0
+
+            if attempted:
+                continue
+            if self._stopping:
+                return
+            self._wakeup.clear()
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), self.settings.email_outbox_poll_seconds)
+            except asyncio.TimeoutError:
+                pass
+
+    async def start(self) -> None:
+        """Start the delivery worker; pending mail from before a restart is sent first."""
+        if self._task is not None:
+            return
+        self._stopping = False
+        self._wakeup = asyncio.Event()
+        self._task = asyncio.create_task(self._run())
+        logger.info("Email outbox worker started")
+
+    async def stop(self) -> None:
+        """Drain messages that are due now, giving up after EMAIL_OUTBOX_DRAIN_SECONDS."""
+        if self._task is None:
+            return
+        self._stopping = True
+        self._wakeup.set()
+        try:
+            await asyncio.wait_for(self._task, self.settings.email_outbox_drain_seconds)
+        except asyncio.TimeoutError:
+            logger.warning("Email outbox did not drain in time; remaining mail stays queued")
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+        logger.info("Email outbox worker stopped")
+
+
+# Singleton instance
+email_outbox = EmailOutbox()
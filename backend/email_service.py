@@ -1,12 +1,12 @@
 """Email service for sending OTP and admit card via Gmail SMTP."""
 
 import smtplib
-from email.mime.text import MIMEText
-from email.mime.multipart import MIMEMultipart
-from email.mime.base import MIMEBase
-from email import encoders
 from config import get_settings
+from smtp_pool import SMTPPool
+from email_templates import OTPEmailTemplate, AdmitCardEmailTemplate
+from circuit_breaker import CircuitBreaker, CircuitOpenError
 import logging
+import time
 
 logger = logging.getLogger("email_service")
 
@@ -21,6 +21,51 @@ class EmailService:
         self.smtp_port = self.settings.smtp_port
         self.sender_email = self.settings.sender_email
         self.sender_password = self.settings.sender_password
+        # Logged-in sessions reused across messages instead of a handshake per send
+        self.smtp_pool = SMTPPool(
+            self.smtp_server,
+            self.smtp_port,
+            self.sender_email,
+            self.sender_password,
+            size=self.settings.smtp_pool_size,
+            max_age=self.settings.smtp_session_max_age_seconds,
+            noop_after=self.settings.smtp_noop_after_idle_seconds,
+            timeout=self.settings.smtp_timeout_seconds,
+            starttls=self.settings.smtp_starttls,
+        )
+        # MIME structure and static text are serialized once, not per message
+        self.otp_template = OTPEmailTemplate(self.sender_email)
+        self.admit_card_template = AdmitCardEmailTemplate(self.sender_email)
+        # Fail fast instead of waiting on timeouts while the SMTP server is degraded
+        self.smtp_breaker = CircuitBreaker(
+            "smtp",
+            failure_threshold=self.settings.smtp_breaker_failure_threshold,
+            window=self.settings.smtp_breaker_window,
+            slow_call_seconds=self.settings.smtp_breaker_slow_call_seconds,
+            open_seconds=self.settings.smtp_breaker_open_seconds,
+            max_open_seconds=self.settings.smtp_breaker_max_open_seconds,
+        )
+
+    def _deliver(self, recipient_email: str, message: bytes) -> None:
+        """
+        Send a rendered message through the pool, guarded by the circuit breaker.
+
+        Raises:
+            CircuitOpenError: If the SMTP circuit is open
+            smtplib.SMTPException: On delivery failure
+        """
+        self.smtp_breaker.before_call()
+        started = time.monotonic()
+        try:
+            self.smtp_pool.sendmail(self.sender_email, recipient_email, message)
+        except smtplib.SMTPRecipientsRefused:
+            # A bad address says nothing about the server's health
+            self.smtp_breaker.record(True, time.monotonic() - started)
+            raise
+        except Exception:
+            self.smtp_breaker.record(False, time.monotonic() - started)
+            raise
+        self.smtp_breaker.record(True, time.monotonic() - started)
     
     def send_otp_email(self, recipient_email: str, otp: str) -> bool:
         """
@@ -32,6 +77,9 @@ class EmailService:
             
         Returns:
             True if email sent successfully, False otherwise
+
+        Raises:
+            CircuitOpenError: If the SMTP circuit is open; nothing was attempted
         """
         try:
             # Check if credentials are configured
@@ -39,56 +87,14 @@ class EmailService:
                 logger.error("Email credentials not configured")
                 return False
             
-            # Create message
-            message = MIMEMultipart("alternative")
-            message["Subject"] = "PWNSAT - Your OTP Code"
-            message["From"] = self.sender_email
-            message["To"] = recipient_email
-            
-            # Email body
-            text = f"""\
-            Hi,
-            
-            Your One-Time Password (OTP) for PWNSAT Registration is:
-            
-            {otp}
-            
-            This OTP is valid for 5 minutes.
-            
-            If you didn't request this, please ignore this email.
-            
-            Best regards,
-            PWNSAT Registration System
-            """
-            
-            html = f"""\
-            <html>
-              <body>
-                <p>Hi,</p>
-                <p>Your One-Time Password (OTP) for PWNSAT Registration is:</p>
-                <h2 style="font-family: monospace; letter-spacing: 5px; color: #0066cc;">{otp}</h2>
-                <p><strong>This OTP is valid for 5 minutes.</strong></p>
-                <p>If you didn't request this, please ignore this email.</p>
-                <p>Best regards,<br/>PWNSAT Registration System</p>
-              </body>
-            </html>
-            """
-            
-            # Attach parts
-            part1 = MIMEText(text, "plain")
-            part2 = MIMEText(html, "html")
-            message.attach(part1)
-            message.attach(part2)
-            
-            # Send email
-            with smtplib.SMTP(self.smtp_server, self.smtp_port, timeout=10) as server:
-                server.starttls()
-                server.login(self.sender_email, self.sender_password)
-                server.sendmail(self.sender_email, recipient_email, message.as_string())
+            message = self.otp_template.render(recipient_email, otp)
+            self._deliver(recipient_email, message)
             
             logger.info(f"OTP email sent successfully to {recipient_email}")
             return True
             
+        except CircuitOpenError:
+            raise
         except smtplib.SMTPException as e:
             logger.error(f"SMTP error sending email to {recipient_email}: {str(e)}")
             return False
@@ -114,52 +120,23 @@ class EmailService:
 
         Returns:
             True if sent successfully, False otherwise
+
+        Raises:
+            CircuitOpenError: If the SMTP circuit is open; nothing was attempted
         """
         try:
             if not self.sender_email or not self.sender_password:
                 logger.error("Email credentials not configured")
                 return False
 
-            message = MIMEMultipart("mixed")
-            message["Subject"] = f"PWNSAT 2026 - Admit Card ({roll_no})"
-            message["From"] = self.sender_email
-            message["To"] = recipient_email
-
-            body = MIMEText(f"""\
-Hi {student_name},
-
-Please find your PWNSAT 2026 Admit Card attached to this email.
-
-Roll Number : {roll_no}
-
-Instructions:
-- Bring this admit card to the examination centre.
-- Carry a valid photo ID along with this admit card.
-- Arrive 30 minutes before the exam starts.
-
-Best regards,
-PWNSAT Registration Team
-""", "plain")
-            message.attach(body)
-
-            # Attach PDF
-            attachment = MIMEBase("application", "pdf")
-            attachment.set_payload(pdf_bytes)
-            encoders.encode_base64(attachment)
-            attachment.add_header(
-                "Content-Disposition",
-                f'attachment; filename="admit_card_{roll_no}.pdf"'
-            )
-            message.attach(attachment)
-
-            with smtplib.SMTP(self.smtp_server, self.smtp_port, timeout=10) as server:
-                server.starttls()
-                server.login(self.sender_email, self.sender_password)
-                server.sendmail(self.sender_email, recipient_email, message.as_string())
+            message = self.admit_card_template.render(recipient_email, student_name, roll_no, pdf_bytes)
+            self._deliver(recipient_email, message)
 
             logger.info(f"Admit card sent to {recipient_email} (roll: {roll_no})")
             return True
 
+        except CircuitOpenError:
+            raise
         except smtplib.SMTPException as e:
             logger.error(f"SMTP error sending admit card to {recipient_email}: {str(e)}")
             return False
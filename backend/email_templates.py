@@ -0,0 +1,188 @@
+"""Pre-built MIME messages for the OTP and admit card emails.
+
+The MIME structure, headers and static bodies are serialized once when
+the email service starts; each send only substitutes the recipient, OTP
+or roll number and joins ready-made byte strings. Messages are produced
+as CRLF-terminated bytes so smtplib sends them without another copy.
+
+Admit card attachments are base64-encoded once per distinct PDF and kept
+in a small LRU, so re-sending the same card skips the encoding entirely.
+"""
+
+from collections import OrderedDict
+from email.mime.multipart import MIMEMultipart
+from email.mime.text import MIMEText
+from email.policy import compat32
+from string import Template
+import base64
+import hashlib
+import threading
+import uuid
+
+# Same output as Message.as_string(), but with SMTP line endings
+SMTP_POLICY = compat32.clone(linesep="\r\n")
+CRLF = b"\r\n"
+
+# Encoded attachments kept for re-sends (each is ~1.4x the PDF size)
+ATTACHMENT_CACHE_ITEMS = 256
+
+OTP_SUBJECT = "PWNSAT - Your OTP Code"
+
+OTP_TEXT = """\
+            Hi,
+
+            Your One-Time Password (OTP) for PWNSAT Registration is:
+
+            $otp
+
+            This OTP is valid for 5 minutes.
+
+            If you didn't request this, please ignore this email.
+
+            Best regards,
+            PWNSAT Registration System
+            """
+
+OTP_HTML = """\
+            <html>
+              <body>
+                <p>Hi,</p>
+                <p>Your One-Time Password (OTP) for PWNSAT Registration is:</p>
+                <h2 style="font-family: monospace; letter-spacing: 5px; color: #0066cc;">$otp</h2>
+                <p><strong>This OTP is valid for 5 minutes.</strong></p>
+                <p>If you didn't request this, please ignore this email.</p>
+                <p>Best regards,<br/>PWNSAT Registration System</p>
+              </body>
+            </html>
+            """
+
+ADMIT_CARD_SUBJECT = "PWNSAT 2026 - Admit Card ($roll_no)"
+
+ADMIT_CARD_TEXT = """\
+Hi {student_name},
+
+Please find your PWNSAT 2026 Admit Card attached to this email.
+
+Roll Number : {roll_no}
+
+Instructions:
+- Bring this admit card to the examination centre.
+- Carry a valid photo ID along with this admit card.
+- Arrive 30 minutes before the exam starts.
+
+Best regards,
+PWNSAT Registration Team
+"""
+
+
+def _boundary() -> str:
+    return f"===============pwnsat{uuid.uuid4().hex}=="
+
+
+class OTPEmailTemplate:
+    """
+    Complete OTP message with only the recipient and code left to fill in.
+
+    Args:
+        sender: From address
+    """
+
+    def __init__(self, sender: str):
+        message = MIMEMultipart("alternative", boundary=_boundary())
+        message["Subject"] = OTP_SUBJECT
+        message["From"] = sender
+        message["To"] = "$recipient"
+        message.attach(MIMEText(OTP_TEXT, "plain"))
+        message.attach(MIMEText(OTP_HTML, "html"))
+        self._template = Template(message.as_string(policy=SMTP_POLICY))
+
+    def render(self, recipient: str, otp: str) -> bytes:
+        """
+        Build the message for one recipient.
+
+        Args:
+            recipient: Destination email
+            otp: The OTP code (6 digits)
+
+        Returns:
+            The message, ready for SMTP.sendmail
+        """
+        return self._template.substitute(recipient=recipient, otp=otp).encode("ascii")
+
+
+class AdmitCardEmailTemplate:
+    """
+    Admit card message assembled from pre-serialized parts.
+
+    Args:
+        sender: From address
+        attachment_cache_items: Encoded PDFs kept for re-sends
+    """
+
+    def __init__(self, sender: str, attachment_cache_items: int = ATTACHMENT_CACHE_ITEMS):
+        boundary = _boundary()
+        message = MIMEMultipart("mixed", boundary=boundary)
+        message["Subject"] = ADMIT_CARD_SUBJECT
+        message["From"] = sender
+        message["To"] = "$recipient"
+        headers = message.as_string(policy=SMTP_POLICY).split("\r\n\r\n", 1)[0]
+        self._headers = Template(headers + "\r\n\r\n")
+
+        self._separator = b"--" + boundary.encode("ascii") + CRLF
+        self._closing = CRLF + b"--" + boundary.encode("ascii") + b"--" + CRLF
+        self._attachments: OrderedDict = OrderedDict()
+        self._max_attachments = attachment_cache_items
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _encode_attachment(roll_no: str, pdf_bytes: bytes) -> bytes:
+        head = (
+            "Content-Type: application/pdf\r\n"
+            "MIME-Version: 1.0\r\n"
+            "Content-Transfer-Encoding: base64\r\n"
+            f'Content-Disposition: attachment; filename="admit_card_{roll_no}.pdf"\r\n'
+            "\r\n"
+        ).encode("ascii")
+        return head + base64.encodebytes(pdf_bytes).replace(b"\n", CRLF)
+
+    def _attachment(self, roll_no: str, pdf_bytes: bytes) -> bytes:
+        """Return the encoded attachment part, reusing it if this exact card was sent before."""
+        key = (roll_no, hashlib.blake2b(pdf_bytes, digest_size=16).digest())
+        with self._lock:
+            part = self._attachments.get(key)
+            if part is not None:
+                self._attachments.move_to_end(key)
+                return part
+
+        part = self._encode_attachment(roll_no, pdf_bytes)
+        with self._lock:
+            self._attachments[key] = part
+            while len(self._attachments) > self._max_attachments:
+                self._attachments.popitem(last=False)
+        return part
+
+    def render(self, recipient: str, student_name: str, roll_no: str, pdf_bytes: bytes) -> bytes:
+        """
+        Build the message for one student.
+
+        Args:
+            recipient: Destination email
+            student_name: Student's full name
+            roll_no: Roll number for subject and filename
+            pdf_bytes: PDF content as bytes
+
+        Returns:
+            The message, ready for SMTP.sendmail
+        """
+        text = ADMIT_CARD_TEXT.format(student_name=student_name, roll_no=roll_no)
+        # Names may be in Devanagari; MIMEText picks us-ascii or utf-8 accordingly
+        body = MIMEText(text, "plain", "us-ascii" if text.isascii() else "utf-8")
+        return b"".join([
+            self._headers.substitute(recipient=recipient, roll_no=roll_no).encode("ascii"),
+            self._separator,
+            body.as_bytes(policy=SMTP_POLICY),
+            CRLF,
+            self._separator,
+            self._attachment(roll_no, pdf_bytes),
+            self._closing,
+        ])
@@ -0,0 +1,215 @@
+"""Bounded worker pools for blocking and CPU-bound work off the event loop.
+
+Route handlers are ``async def`` and the app runs on a single uvicorn worker,
+so anything that blocks (SQLAlchemy sessions, SMTP, file I/O) goes through
+``run_in_thread`` and anything CPU-heavy (PDF rendering, Excel parsing)
+through ``run_in_process``. Both pools cap how much work may queue up and
+report their depth via ``pool_stats()``. A pool whose worker process dies
+is replaced on the spot.
+"""
+
+from concurrent.futures import BrokenExecutor, Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from functools import partial
+from typing import Any, Callable, Optional
+from config import get_settings
+import asyncio
+import logging
+import multiprocessing
+import os
+import threading
+
+logger = logging.getLogger("executor")
+
+
+class PoolBusyError(RuntimeError):
+    """Raised when a pool's queue is full; surfaced to clients as 503."""
+
+
+class WorkerLostError(PoolBusyError):
+    """Raised when a worker process died mid-task (e.g. OOM-killed); the pool is rebuilt and clients get 503."""
+
+
+class BoundedPool:
+    """
+    An executor with a cap on queued work and live depth counters.
+
+    Args:
+        name: Pool name used in stats and log lines
+        factory: Callable creating the underlying executor
+        max_workers: Number of workers the executor runs
+        max_queue: Tasks allowed to wait once all workers are busy
+    """
+
+    def __init__(self, name: str, factory: Callable[[], Executor], max_workers: int, max_queue: int):
+        self.name = name
+        self.max_workers = max_workers
+        self.max_queue = max_queue
+        self._factory = factory
+        self._executor: Optional[Executor] = None
+        self._pending = 0
+        self._completed = 0
+        self._rejected = 0
+        self._lock = threading.Lock()
+
+    @property
+    def executor(self) -> Executor:
+        """The underlying executor, started on first use."""
+        if self._executor is None:
+            with self._lock:
+                if self._executor is None:
+                    self._executor = self._factory()
+                    logger.info(f"{self.name} pool started with {self.max_workers} workers")
+        return self._executor
+
+    def _release(self, _future) -> None:
+        with self._lock:
+            self._pending -= 1
+            self._completed += 1
+
+    async def run(self, func: Callable[..., Any], *args: Any) -> Any:
+        """
+        Run func(*args) on the pool and await its result.
+
+        Raises:
+            PoolBusyError: If the pool already has max_workers + max_queue tasks
+            WorkerLostError: If the worker running the task died
+        """
+        with self._lock:
+            if self._pending >= self.max_workers + self.max_queue:
+                self._rejected += 1
+                raise PoolBusyError(f"{self.name} pool is saturated")
+            self._pending += 1
+
+        for attempt in range(2):
+            executor = self.executor
+            try:
+                future = executor.submit(func, *args)
+                break
+            except BrokenExecutor as e:
+                # Broken before this task was handed over: it is safe to resubmit
+                self._discard(executor, e)
+                if attempt:
+                    with self._lock:
+                        self._pending -= 1
+                    raise WorkerLostError(f"{self.name} pool is broken: {e}") from e
+            except BaseException:
+                with self._lock:
+                    self._pending -= 1
+                raise
+        future.add_done_callback(self._release)
+        try:
+            return await asyncio.wrap_future(future)
+        except BrokenExecutor as e:
+            self._discard(executor, e)
+            raise WorkerLostError(f"{self.name} pool lost a worker: {e}") from e
+
+    def _discard(self, executor: Executor, error: BaseException) -> None:
+        """Replace a broken executor, so later tasks get a fresh one instead of failing until restart."""
+        with self._lock:
+            if self._executor is not executor:
+                # Already replaced by another task that saw the breakage
+                return
+            self._executor = None
+        logger.error(f"{self.name} pool is broken ({error}); starting a new one")
+        executor.shutdown(wait=False, cancel_futures=True)
+
+    def stats(self) -> dict:
+        """Return worker count, active and queued task counts."""
+        with self._lock:
+            active = min(self._pending, self.max_workers)
+            return {
+                "workers": self.max_workers,
+                "active": active,
+                "queued": self._pending - active,
+                "max_queue": self.max_queue,
+                "completed": self._completed,
+                "rejected": self._rejected,
+            }
+
+    def shutdown(self) -> None:
+        """Stop the executor, dropping queued work."""
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=True, cancel_futures=True)
+            logger.info(f"{self.name} pool stopped")
+
+
+def process_pool_size() -> int:
+    """Number of worker processes: PROCESS_POOL_WORKERS, or one per core when 0."""
+    configured = get_settings().process_pool_workers
+    return configured if configured > 0 else (os.cpu_count() or 1)
+
+
+def _make_pools() -> tuple:
+    settings = get_settings()
+    threads = BoundedPool(
+        "thread",
+        lambda: ThreadPoolExecutor(
+            max_workers=settings.thread_pool_workers,
+            thread_name_prefix="blocking"
+        ),
+        settings.thread_pool_workers,
+        settings.thread_pool_max_queue,
+    )
+    workers = process_pool_size()
+    processes = BoundedPool(
+        "process",
+        # spawn: forking a process that already runs event-loop and SMTP
+        # threads can deadlock the child on inherited locks
+        lambda: ProcessPoolExecutor(
+            max_workers=workers,
+            mp_context=multiprocessing.get_context("spawn")
+        ),
+        workers,
+        settings.process_pool_max_queue,
+    )
+    return threads, processes
+
+
+thread_pool, process_pool = _make_pools()
+
+
+async def run_in_thread(func: Callable[..., Any], *args: Any, **kwargs: Any) -> Any:
+    """
+    Run blocking I/O (DB sessions, SMTP, files) in the bounded thread pool.
+
+    Args:
+        func: Callable to run
+        *args: Positional arguments
+        **kwargs: Keyword arguments
+
+    Returns:
+        The function's return value
+    """
+    if kwargs:
+        func = partial(func, **kwargs)
+    return await thread_pool.run(func, *args)
+
+
+async def run_in_process(func: Callable[..., Any], *args: Any) -> Any:
+    """
+    Run a picklable top-level function in the bounded process pool.
+
+    Args:
+        func: Module-level function (or staticmethod) to call
+        *args: Picklable positional arguments
+
+    Returns:
+        The function's return value
+    """
+    return await process_pool.run(func, *args)
+
+
+def pool_stats() -> dict:
+    """Return queue depth and counters for each pool."""
+    return {
+        "thread": thread_pool.stats(),
+        "process": process_pool.stats(),
+    }
+
+
+def shutdown_pools() -> None:
+    """Stop the worker pools; called on application shutdown."""
+    thread_pool.shutdown()
+    process_pool.shutdown()
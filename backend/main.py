@@ -6,8 +6,17 @@ from fastapi.responses import JSONResponse
 from sqlalchemy.orm import Session
 from database import get_db, init_db
 from config import get_settings
+from executor import shutdown_pools, pool_stats, PoolBusyError
+from email_service import email_service
+from circuit_breaker import CircuitOpenError
+from email_outbox import email_outbox
+from bulk_send import bulk_send_runner
+from maintenance import maintenance_scheduler
+from rate_limit import limiter
+from otp_store import otp_store
 from routers import auth_routes, registration_routes, admin_routes, config_routes, results_routes
 import logging
+import math
 
 # Configure logging
 logging.basicConfig(
@@ -45,9 +54,30 @@ app.include_router(results_routes.router)
 
 @app.on_event("startup")
 async def startup_event():
-    """Initialize database on startup."""
+    """Initialize database and start the background email workers and maintenance."""
     init_db()
     logger.info("Database initialized")
+    # Opening the shared rate limit file may wait on other workers; do it before serving
+    limiter.open()
+    if otp_store.name == "memory":
+        logger.warning(
+            "OTP_STORE=memory is for development with a single worker: OTPs are lost on "
+            "restart while their queued emails still go out, and other workers can't verify them"
+        )
+    await email_outbox.start()
+    await bulk_send_runner.start()
+    if settings.maintenance_enabled:
+        await maintenance_scheduler.start()
+
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    """Stop maintenance, drain the email outbox and bulk sends, then stop worker pools and SMTP sessions."""
+    await maintenance_scheduler.stop()
+    await bulk_send_runner.stop()
+    await email_outbox.stop()
+    shutdown_pools()
+    email_service.smtp_pool.close_all()
 
 
 @app.get("/")
@@ -62,8 +92,37 @@ async def root() -> dict:
 
 @app.get("/health")
 async def health_check() -> dict:
-    """Health check endpoint."""
-    return {"status": "healthy"}
+    """Health check endpoint: worker pool queue depths, SMTP sessions and circuit, rate limiter state."""
+    smtp_circuit = email_service.smtp_breaker.stats()
+    return {
+        "status": "degraded" if smtp_circuit["state"] != "closed" else "healthy",
+        "pools": pool_stats(),
+        "smtp": email_service.smtp_pool.stats(),
+        "smtp_circuit": smtp_circuit,
+        "rate_limit": limiter.stats(),
+    }
+
+
+@app.exception_handler(PoolBusyError)
+async def pool_busy_handler(request, exc):
+    """Worker pools are saturated (or lost a worker): ask the client to retry shortly."""
+    logger.warning(f"Rejected request: {str(exc)}")
+    return JSONResponse(
+        status_code=503,
+        content={"detail": "Server is busy. Please try again shortly."},
+        headers={"Retry-After": "1"}
+    )
+
+
+@app.exception_handler(CircuitOpenError)
+async def circuit_open_handler(request, exc):
+    """The SMTP server is failing: reject email work fast instead of timing out."""
+    logger.warning(f"Rejected request: {str(exc)}")
+    return JSONResponse(
+        status_code=503,
+        content={"detail": "Email delivery is temporarily unavailable. Please try again later."},
+        headers={"Retry-After": str(max(1, math.ceil(exc.retry_after)))}
+    )
 
 
 @app.exception_handler(Exception)
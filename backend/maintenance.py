@@ -0,0 +1,276 @@
+"""Periodic database maintenance.
+
+A scheduler task on the event loop runs housekeeping at fixed intervals:
+
+  purge_otps     remove expired OTPs from the OTP store
+  prune_users    delete users who never verified their email, in batches
+  optimize       refresh SQLite planner statistics (ANALYZE, PRAGMA optimize)
+
+Each task has a row in ``maintenance_tasks`` with its next run time. A
+worker runs a task only after claiming that row with a conditional
+UPDATE, so with several uvicorn workers every run happens exactly once;
+a claim left behind by a crashed worker lapses after
+MAINTENANCE_LEASE_SECONDS. The row also keeps the report of the last run.
+"""
+
+from datetime import datetime, timedelta
+from typing import Callable, Dict, List, Optional, Tuple
+from sqlalchemy import and_, delete, exists, or_, select, text
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+from database import SessionLocal, engine, results_engine
+from models import MaintenanceTask, OTPCode, OutboxEmail, Registration, User
+from otp_store import otp_store
+from executor import run_in_thread
+from config import get_settings
+import asyncio
+import json
+import logging
+import os
+import socket
+import time
+import uuid
+
+logger = logging.getLogger("maintenance")
+
+# How often the scheduler checks for due tasks
+POLL_SECONDS = 60
+# Shutdown waits this long for a running task
+STOP_SECONDS = 10
+
+
+class MaintenanceScheduler:
+    """Runs maintenance tasks on one worker at a time."""
+
+    def __init__(self):
+        self.settings = get_settings()
+        self.worker_id = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:6]}"
+        # name -> (interval, task)
+        self.tasks: Dict[str, Tuple[timedelta, Callable[[], dict]]] = {
+            "purge_otps": (timedelta(minutes=self.settings.maintenance_otp_sweep_minutes), self.purge_expired_otps),
+            "prune_users": (timedelta(hours=self.settings.maintenance_prune_users_hours), self.prune_unverified_users),
+            "optimize": (timedelta(hours=self.settings.maintenance_optimize_hours), self.optimize_database),
+        }
+        self._wakeup: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+        self._stopping = False
+
+    # ── Tasks (worker threads) ────────────────────────────────────────────────
+
+    @staticmethod
+    def purge_expired_otps() -> dict:
+        """Remove expired OTPs from the configured OTP store."""
+        return {"otps_removed": otp_store.purge_expired()}
+
+    def _prunable_users(self):
+        """Condition on User for never-verified users old enough to prune."""
+        now = datetime.utcnow()
+        cutoff = now - timedelta(days=self.settings.maintenance_unverified_user_days)
+        otp_window = now - timedelta(minutes=self.settings.otp_expiry_minutes)
+        return and_(
+            User.is_verified.isnot(True),
+            User.created_at < cutoff,
+            ~exists().where(Registration.user_id == User.id),
+            # Someone waiting on a code they just asked for is signing in, not abandoned.
+            # Every OTP gets an outbox row, whichever OTP store holds the code.
+            ~exists().where(
+                OutboxEmail.recipient == User.email,
+                OutboxEmail.kind == "otp",
+                OutboxEmail.created_at >= otp_window
+            ),
+        )
+
+    def prune_unverified_users(self) -> dict:
+        """
+        Delete never-verified users older than MAINTENANCE_UNVERIFIED_USER_DAYS.
+
+        Users with a registration or an OTP that may still be valid are
+        kept; both are checked again in the DELETEs, as a user may ask for
+        a code or register after the batch was picked. Each batch is its
+        own short transaction so registrations aren't held up behind the
+        write lock.
+        """
+        batch_size = self.settings.maintenance_batch_size
+        removed = batches = 0
+        while not self._stopping:
+            db = SessionLocal()
+            try:
+                user_ids = [uid for (uid,) in db.execute(
+                    select(User.id).where(self._prunable_users()).order_by(User.id).limit(batch_size)
+                ).all()]
+                if not user_ids:
+                    break
+                prunable = and_(User.id.in_(user_ids), self._prunable_users())
+                db.execute(delete(OTPCode).where(OTPCode.user_id.in_(select(User.id).where(prunable))))
+                deleted = db.execute(delete(User).where(prunable)).rowcount
+                db.commit()
+            finally:
+                db.close()
+            removed += deleted
+            batches += 1
+            if len(user_ids) < batch_size:
+                break
+        return {"users_removed": removed, "batches": batches}
+
+    @staticmethod
+    def optimize_database() -> dict:
+        """Refresh the query planner's statistics of the main and results databases (SQLite only)."""
+        report = {}
+        for name, db_engine in (("main", engine), ("results", results_engine)):
+            if db_engine.dialect.name != "sqlite":
+                report[name] = {"skipped": f"not supported on {db_engine.dialect.name}"}
+                continue
+            started = time.monotonic()
+            with db_engine.connect() as conn:
+                conn.execute(text("ANALYZE"))
+                conn.execute(text("PRAGMA optimize"))
+                conn.commit()
+            report[name] = {"seconds": round(time.monotonic() - started, 3)}
+        return report
+
+    # ── Scheduling (worker threads) ───────────────────────────────────────────
+
+    def _ensure_rows(self) -> None:
+        """Create a schedule row for every task; new tasks are due straight away."""
+        db = SessionLocal()
+        try:
+            existing = {name for (name,) in db.query(MaintenanceTask.name).all()}
+            for name in self.tasks:
+                if name in existing:
+                    continue
+                db.add(MaintenanceTask(name=name, next_run_at=datetime.utcnow()))
+                try:
+                    db.commit()
+                except IntegrityError:
+                    # Another worker created it first
+                    db.rollback()
+        finally:
+            db.close()
+
+    def _claim(self, name: str) -> bool:
+        """Take the task's lease if it is due and nobody holds it."""
+        now = datetime.utcnow()
+        db = SessionLocal()
+        try:
+            claimed = db.query(MaintenanceTask).filter(
+                MaintenanceTask.name == name,
+                MaintenanceTask.next_run_at <= now,
+                or_(MaintenanceTask.locked_until.is_(None), MaintenanceTask.locked_until < now)
+            ).update({
+                MaintenanceTask.locked_by: self.worker_id,
+                MaintenanceTask.locked_until: now + timedelta(seconds=self.settings.maintenance_lease_seconds),
+                MaintenanceTask.last_started_at: now,
+            }, synchronize_session=False)
+            db.commit()
+            return claimed == 1
+        finally:
+            db.close()
+
+    def _complete(self, name: str, status: str, result: dict) -> None:
+        """Release the lease, schedule the next run and store the report."""
+        now = datetime.utcnow()
+        db = SessionLocal()
+        try:
+            db.query(MaintenanceTask).filter(
+                MaintenanceTask.name == name,
+                MaintenanceTask.locked_by == self.worker_id
+            ).update({
+                MaintenanceTask.locked_by: None,
+                MaintenanceTask.locked_until: None,
+                MaintenanceTask.next_run_at: now + self.tasks[name][0],
+                MaintenanceTask.last_finished_at: now,
+                MaintenanceTask.last_status: status,
+                MaintenanceTask.last_result: json.dumps(result),
+            }, synchronize_session=False)
+            db.commit()
+        finally:
+            db.close()
+
+    def run_task(self, name: str) -> Optional[dict]:
+        """
+        Run a task if it is due and this worker wins the claim.
+
+        Returns:
+            The task's report, or None if it was not run here
+        """
+        if not self._claim(name):
+            return None
+        started = time.monotonic()
+        try:
+            result = self.tasks[name][1]()
+            status = "ok"
+            logger.info(f"Maintenance {name}: {result}")
+        except Exception as e:
+            result = {"error": str(e)}
+            status = "error"
+            logger.error(f"Maintenance {name} failed: {e}")
+        result["duration_seconds"] = round(time.monotonic() - started, 3)
+        self._complete(name, status, result)
+        return result
+
+    @staticmethod
+    def get_status(db: Session) -> List[dict]:
+        """Return the schedule and last report of every task."""
+        return [
+            {
+                "name": task.name,
+                "next_run_at": task.next_run_at.isoformat() if task.next_run_at else None,
+                "running_on": task.locked_by,
+                "last_started_at": task.last_started_at.isoformat() if task.last_started_at else None,
+                "last_finished_at": task.last_finished_at.isoformat() if task.last_finished_at else None,
+                "last_status": task.last_status,
+                "last_result": json.loads(task.last_result) if task.last_result else None,
+            }
+            for task in db.query(MaintenanceTask).order_by(MaintenanceTask.name).all()
+        ]
+
+    # ── Scheduler (event loop) ────────────────────────────────────────────────
+
+    async def _run(self) -> None:
+        await run_in_thread(self._ensure_rows)
+        while not self._stopping:
+            for name in self.tasks:
+                if self._stopping:
+                    break
+                try:
+                    await run_in_thread(self.run_task, name)
+                except asyncio.CancelledError:
+                    raise
+                except Exception as e:
+                    logger.error(f"Maintenance scheduler error: {e}")
+
+            if self._stopping:
+                return
+            self._wakeup.clear()
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), POLL_SECONDS)
+            except asyncio.TimeoutError:
+                pass
+
+    async def start(self) -> None:
+        """Start the scheduler; tasks that came due while the app was down run first."""
+        if self._task is not None:
+            return
+        self._stopping = False
+        self._wakeup = asyncio.Event()
+        self._task = asyncio.create_task(self._run())
+        logger.info("Maintenance scheduler started")
+
+    async def stop(self) -> None:
+        """Stop the scheduler, giving a running task a few seconds to finish its batch."""
+        if self._task is None:
+            return
+        self._stopping = True
+        self._wakeup.set()
+        try:
+            await asyncio.wait_for(self._task, STOP_SECONDS)
+        except asyncio.TimeoutError:
+            logger.warning("Maintenance task did not stop in time; its lease will lapse")
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+        logger.info("Maintenance scheduler stopped")
+
+
+# Singleton instance
+maintenance_scheduler = MaintenanceScheduler()
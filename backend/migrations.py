@@ -0,0 +1,325 @@
+"""Versioned schema and data migrations.
+
+Each database has its own chain of steps: MIGRATIONS for the main
+database and RESULTS_MIGRATIONS for the results database. Every step runs
+once per database, in order, and is recorded in that database's
+``schema_version`` table. A database that is already current costs a
+single ``SELECT max(version)`` at startup.
+
+  - A new database gets the current schema from the models and is stamped
+    with every version without running the steps.
+  - A database from before versioning (tables but no schema_version) runs
+    every step; schema steps check for the tables and columns they touch,
+    so they are safe on databases the old startup code already altered.
+
+To change the schema, update the model and append a step; a new table
+needs a step too (``_create_tables``). Never edit or reorder steps that
+have shipped, and keep every step safe to re-run. Data steps walk the
+table in id order in batches of BATCH_SIZE, committing each batch, so
+neither memory nor how long the write lock is held grows with the table.
+
+With several workers starting at once, each step starts under SQLite's
+write lock (a PostgreSQL advisory lock on PostgreSQL) after re-reading
+the version, so schema steps run only once.
+A data step releases the lock between batches and may overlap with
+another worker's run of it, which is harmless because it can be re-run.
+"""
+
+from datetime import datetime
+from typing import Callable, List, Optional, Tuple
+from sqlalchemy import Column, DateTime, Integer, MetaData, String, Table, inspect, text
+from sqlalchemy.dialects.postgresql import insert as postgresql_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.engine import Connection, Engine
+from sqlalchemy.exc import DBAPIError
+from database import Base, ResultsBase, engine, results_engine
+from models import StudentResult
+import logging
+import re
+import time
+
+logger = logging.getLogger("migrations")
+
+# Rows per transaction in data migrations
+BATCH_SIZE = 1000
+# PostgreSQL advisory lock id held while migrating
+MIGRATION_LOCK_KEY = 0x70776E736174
+
+# Applied steps, one row each; every database has its own
+SCHEMA_VERSION = Table(
+    "schema_version", MetaData(),
+    Column("version", Integer, primary_key=True),
+    Column("description", String, nullable=False),
+    Column("applied_at", DateTime, nullable=False),
+)
+
+Migration = Tuple[int, str, Callable[[Connection], None]]
+
+
+# ── Steps ─────────────────────────────────────────────────────────────────────
+
+def _add_column(conn: Connection, table: str, column: str, ddl: str) -> None:
+    """Add a column unless the table already has it (or doesn't exist)."""
+    inspector = inspect(conn)
+    if not inspector.has_table(table):
+        return
+    if column not in {c["name"] for c in inspector.get_columns(table)}:
+        conn.execute(text(f"ALTER TABLE {table} ADD COLUMN {column} {ddl}"))
+
+
+def _create_tables(*tables: Table) -> Callable[[Connection], None]:
+    """Step that creates the given model tables if they don't exist."""
+    def step(conn: Connection) -> None:
+        tables[0].metadata.create_all(bind=conn, tables=list(tables))
+    return step
+
+
+def _registration_columns(conn: Connection) -> None:
+    _add_column(conn, "registrations", "exam_time", "VARCHAR DEFAULT ''")
+    _add_column(conn, "registrations", "admit_card_sent", "BOOLEAN DEFAULT FALSE NOT NULL")
+    _add_column(conn, "registrations", "current_class", "VARCHAR DEFAULT ''")
+
+
+def _student_result_scholarship(conn: Connection) -> None:
+    _add_column(conn, "student_results", "scholarship", "FLOAT DEFAULT NULL")
+
+
+def _otp_failed_attempts(conn: Connection) -> None:
+    _add_column(conn, "otp_codes", "failed_attempts", "INTEGER DEFAULT 0 NOT NULL")
+
+
+def normalize_legacy_phone(raw: str) -> str:
+    """
+    Reduce a stored phone number to its digits.
+
+    Numbers imported as floats were stored like '9876543210.0'; the '.0'
+    is dropped rather than kept as a trailing digit.
+    """
+    digits = "".join(re.findall(r"\d+", raw))
+    if raw.endswith(".0") and digits.endswith("0"):
+        digits = digits[:-1]
+    return digits
+
+
+def _normalize_result_phones(conn: Connection) -> None:
+    if not inspect(conn).has_table("student_results"):
+        return
+    last_id = updated = 0
+    while True:
+        rows = conn.execute(
+            text("SELECT id, phone FROM student_results WHERE id > :last_id ORDER BY id LIMIT :limit"),
+            {"last_id": last_id, "limit": BATCH_SIZE}
+        ).all()
+        if not rows:
+            break
+        changes = []
+        for row_id, phone in rows:
+            if phone:
+                normalized = normalize_legacy_phone(str(phone))
+                if normalized != phone:
+                    changes.append({"id": row_id, "phone": normalized})
+        if changes:
+            conn.execute(text("UPDATE student_results SET phone = :phone WHERE id = :id"), changes)
+        conn.commit()
+        updated += len(changes)
+        last_id = rows[-1][0]
+    logger.info(f"Normalized {updated} result phone numbers")
+
+
+def _insert_ignoring_duplicates(conn: Connection, table: Table, rows: List[dict]) -> None:
+    """Insert rows, skipping ids another run already copied."""
+    if conn.dialect.name == "sqlite":
+        statement = sqlite_insert(table).on_conflict_do_nothing()
+    elif conn.dialect.name == "postgresql":
+        statement = postgresql_insert(table).on_conflict_do_nothing()
+    else:
+        statement = table.insert()
+    conn.execute(statement, rows)
+
+
+def _move_results(conn: Connection) -> None:
+    """Copy student_results into the results database, keeping ids."""
+    if not inspect(conn).has_table("student_results"):
+        return
+    table = StudentResult.__table__
+    existing = {c["name"] for c in inspect(conn).get_columns("student_results")}
+    # Typed columns, so values (SQLite's text datetimes) come back as Python objects
+    columns = [column for column in table.columns if column.name in existing]
+    select = text(
+        f"SELECT {', '.join(column.name for column in columns)} FROM student_results "
+        "WHERE id > :last_id ORDER BY id LIMIT :limit"
+    ).columns(*columns)
+    last_id = copied = 0
+    with results_engine.connect() as results_conn:
+        while True:
+            try:
+                rows = conn.execute(select, {"last_id": last_id, "limit": BATCH_SIZE}).mappings().all()
+            except DBAPIError:
+                conn.rollback()
+                if not inspect(conn).has_table("student_results"):
+                    # Another worker finished the move and dropped the old table
+                    return
+                raise
+            if not rows:
+                break
+            _insert_ignoring_duplicates(results_conn, table, [dict(row) for row in rows])
+            results_conn.commit()
+            # Don't hold the main database's lock across batches
+            conn.commit()
+            copied += len(rows)
+            last_id = rows[-1]["id"]
+        if results_conn.dialect.name == "postgresql" and copied:
+            # Ids were copied explicitly; move the sequence past them
+            results_conn.execute(text(
+                "SELECT setval(pg_get_serial_sequence('student_results', 'id'), (SELECT max(id) FROM student_results))"
+            ))
+            results_conn.commit()
+    logger.info(f"Copied {copied} results to the results database")
+
+
+def _drop_legacy_results(conn: Connection) -> None:
+    if inspect(conn).has_table("student_results"):
+        conn.execute(text("DROP TABLE student_results"))
+
+
+def _bulk_send_job_lease(conn: Connection) -> None:
+    _add_column(conn, "bulk_send_jobs", "locked_by", "VARCHAR")
+    _add_column(conn, "bulk_send_jobs", "locked_until", "TIMESTAMP")
+
+
+def _outbox_recipient_index(conn: Connection) -> None:
+    if inspect(conn).has_table("email_outbox"):
+        conn.execute(text(
+            "CREATE INDEX IF NOT EXISTS ix_email_outbox_recipient_created ON email_outbox (recipient, created_at)"
+        ))
+
+
+# (version, description, step)
+MIGRATIONS: List[Migration] = [
+    (1, "registrations: exam_time, admit_card_sent, current_class", _registration_columns),
+    (2, "student_results: scholarship", _student_result_scholarship),
+    (3, "otp_codes: failed_attempts", _otp_failed_attempts),
+    (4, "student_results: normalize phone numbers", _normalize_result_phones),
+    (5, "student_results: copy to the results database", _move_results),
+    (6, "student_results: drop from the main database", _drop_legacy_results),
+    (7, "bulk_send_jobs: locked_by, locked_until", _bulk_send_job_lease),
+    (8, "email_outbox: index on recipient, created_at", _outbox_recipient_index),
+]
+
+RESULTS_MIGRATIONS: List[Migration] = [
+    (1, "student_results", _create_tables(StudentResult.__table__)),
+]
+
+
+# ── Runner ────────────────────────────────────────────────────────────────────
+
+def current_version(conn: Connection) -> Optional[int]:
+    """Highest applied version (0 if none), or None if the database isn't versioned."""
+    try:
+        return conn.execute(text("SELECT max(version) FROM schema_version")).scalar() or 0
+    except DBAPIError:
+        conn.rollback()
+        return None
+
+
+def _lock(conn: Connection) -> None:
+    """Start a transaction that holds the migration lock, so one worker migrates at a time."""
+    conn.commit()
+    if conn.dialect.name == "sqlite":
+        # Takes SQLite's write lock up front
+        conn.exec_driver_sql("BEGIN IMMEDIATE")
+    elif conn.dialect.name == "postgresql":
+        # Transaction-scoped advisory lock, released on commit
+        conn.execute(text("SELECT pg_advisory_xact_lock(:key)"), {"key": MIGRATION_LOCK_KEY})
+
+
+def _record(conn: Connection, version: int, description: str) -> None:
+    conn.execute(SCHEMA_VERSION.insert().values(version=version, description=description, applied_at=datetime.utcnow()))
+
+
+def _prepare(conn: Connection, metadata: MetaData, migrations: List[Migration], marker_table: str) -> int:
+    """
+    Create the tables of a new or unversioned database.
+
+    Args:
+        conn: Connection to the database
+        metadata: The database's models
+        migrations: The database's steps
+        marker_table: A table every database from before versioning has
+
+    Returns:
+        The version to migrate from
+    """
+    _lock(conn)
+    inspector = inspect(conn)
+    if inspector.has_table("schema_version"):
+        # Another worker got here first
+        version = conn.execute(text("SELECT max(version) FROM schema_version")).scalar() or 0
+        conn.commit()
+        return version
+
+    is_new = not inspector.has_table(marker_table)
+    SCHEMA_VERSION.create(bind=conn)
+    metadata.create_all(bind=conn)
+    latest = migrations[-1][0]
+    if is_new:
+        for version, description, _ in migrations:
+            _record(conn, version, description)
+        logger.info(f"Created schema of {conn.engine.url.database} at version {latest}")
+        conn.commit()
+        return latest
+    conn.commit()
+    logger.info(f"Unversioned {conn.engine.url.database}; applying all migrations")
+    return 0
+
+
+def _migrate(db_engine: Engine, metadata: MetaData, migrations: List[Migration], marker_table: str) -> int:
+    """Bring one database up to its latest version; returns that version."""
+    latest = migrations[-1][0]
+    with db_engine.connect() as conn:
+        version = current_version(conn)
+        if version == latest:
+            return version
+        if version is None:
+            version = _prepare(conn, metadata, migrations, marker_table)
+
+        for step_version, description, step in migrations:
+            if step_version <= version:
+                continue
+            _lock(conn)
+            if (current_version(conn) or 0) >= step_version:
+                conn.commit()
+                continue
+            started = time.monotonic()
+            step(conn)
+            # Data steps commit as they go, releasing the lock, so another worker
+            # may have run this step alongside; record it only if nobody has
+            _lock(conn)
+            if (current_version(conn) or 0) < step_version:
+                _record(conn, step_version, description)
+            conn.commit()
+            logger.info(f"Migration {step_version} ({description}) applied in {time.monotonic() - started:.2f}s")
+        return latest
+
+
+def migrate() -> int:
+    """
+    Bring the main database up to the latest schema version.
+
+    Run migrate_results() first: a step here copies old results into the
+    results database.
+
+    Returns:
+        The schema version after migrating
+    """
+    return _migrate(engine, Base.metadata, MIGRATIONS, "users")
+
+
+def migrate_results() -> int:
+    """
+    Bring the results database up to the latest schema version.
+
+    Returns:
+        The schema version after migrating
+    """
+    return _migrate(results_engine, ResultsBase.metadata, RESULTS_MIGRATIONS, "student_results")
@@ -1,9 +1,9 @@
 """SQLAlchemy ORM models."""
 
-from sqlalchemy import Column, Integer, String, Boolean, DateTime, ForeignKey, Float
+from sqlalchemy import Column, Integer, String, Boolean, DateTime, ForeignKey, Float, Index
 from sqlalchemy.orm import relationship
 from datetime import datetime
-from database import Base
+from database import Base, ResultsBase
 
 
 class User(Base):
@@ -63,8 +63,8 @@ class Registration(Base):
     user = relationship("User", back_populates="registration")
 
 
-class StudentResult(Base):
-    """Student result entries imported from admin Excel uploads."""
+class StudentResult(ResultsBase):
+    """Student result entries imported from admin Excel uploads (results database)."""
 
     __tablename__ = "student_results"
 
@@ -77,3 +77,79 @@ class StudentResult(Base):
     source_file = Column(String, nullable=True)
     created_at = Column(DateTime, default=datetime.utcnow)
 
+
+
+class OutboxEmail(Base):
+    """Email waiting to be delivered by the background outbox worker."""
+
+    __tablename__ = "email_outbox"
+    # Recent OTP emails to an address: superseded OTPs, and users still signing in
+    __table_args__ = (Index("ix_email_outbox_recipient_created", "recipient", "created_at"),)
+
+    id = Column(Integer, primary_key=True, index=True)
+    # Opaque id handed to the client for delivery status lookups
+    public_id = Column(String, unique=True, index=True, nullable=False)
+    kind = Column(String, nullable=False)  # "otp"
+    recipient = Column(String, nullable=False)
+    # Template values (e.g. the OTP code); cleared once the message is settled
+    payload = Column(String, nullable=True)
+    # pending | sending (claimed; next_attempt_at is the lease expiry) | sent | failed | expired | superseded
+    status = Column(String, nullable=False, default="pending", index=True)
+    attempts = Column(Integer, default=0, nullable=False)
+    next_attempt_at = Column(DateTime, default=datetime.utcnow, nullable=False, index=True)
+    last_error = Column(String, nullable=True)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    sent_at = Column(DateTime, nullable=True)
+
+
+class BulkSendJob(Base):
+    """Admit card bulk-send job, worked through in the background."""
+
+    __tablename__ = "bulk_send_jobs"
+
+    id = Column(Integer, primary_key=True, index=True)
+    status = Column(String, nullable=False, default="queued", index=True)  # queued | running | done | cancelled
+    created_by = Column(String, nullable=True)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    started_at = Column(DateTime, nullable=True)
+    finished_at = Column(DateTime, nullable=True)
+    # Worker running the job, and when its claim lapses unless renewed
+    locked_by = Column(String, nullable=True)
+    locked_until = Column(DateTime, nullable=True)
+
+    # Relationships
+    items = relationship("BulkSendItem", back_populates="job", cascade="all, delete-orphan")
+
+
+class BulkSendItem(Base):
+    """One recipient of a bulk-send job."""
+
+    __tablename__ = "bulk_send_items"
+    __table_args__ = (Index("ix_bulk_send_items_job_status", "job_id", "status"),)
+
+    id = Column(Integer, primary_key=True, index=True)
+    job_id = Column(Integer, ForeignKey("bulk_send_jobs.id"), nullable=False)
+    user_id = Column(Integer, nullable=False)
+    status = Column(String, nullable=False, default="pending")  # pending | sent | failed | skipped
+    detail = Column(String, nullable=True)
+    sent_at = Column(DateTime, nullable=True, index=True)
+
+    # Relationships
+    job = relationship("BulkSendJob", back_populates="items")
+
+
+class MaintenanceTask(Base):
+    """Schedule, single-runner lease and last report of a periodic maintenance task."""
+
+    __tablename__ = "maintenance_tasks"
+
+    name = Column(String, primary_key=True)
+    next_run_at = Column(DateTime, nullable=False)
+    # Worker currently running the task, and when its claim lapses
+    locked_by = Column(String, nullable=True)
+    locked_until = Column(DateTime, nullable=True)
+    last_started_at = Column(DateTime, nullable=True)
+    last_finished_at = Column(DateTime, nullable=True)
+    last_status = Column(String, nullable=True)  # ok | error
+    # JSON report of what the last run did
+    last_result = Column(String, nullable=True)
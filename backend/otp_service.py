@@ -2,10 +2,8 @@
 
 import random
 import string
-from datetime import datetime, timedelta, timezone
 from sqlalchemy.orm import Session
-from models import User, OTPCode
-from config import get_settings
+from otp_store import otp_store
 from typing import Optional
 import logging
 
@@ -14,145 +12,58 @@ logger = logging.getLogger("otp_service")
 
 class OTPService:
     """Service for generating and verifying OTP codes."""
-    
+
     @staticmethod
     def generate_otp() -> str:
         """
         Generate a 6-digit OTP.
-        
+
         Returns:
             6-digit OTP as string
         """
         return ''.join(random.choices(string.digits, k=6))
 
     @staticmethod
-    def _to_aware(dt: Optional[datetime]) -> Optional[datetime]:
-        """Convert a possibly naive datetime from the DB to an aware datetime in UTC."""
-        if dt is None:
-            return None
-        if dt.tzinfo is None:
-            # treat naive datetimes as UTC
-            return dt.replace(tzinfo=timezone.utc)
-        return dt.astimezone(timezone.utc)
-    
-    @staticmethod
-    def create_otp(db: Session, email: str, user_id: Optional[int] = None) -> Optional[OTPCode]:
+    def create_otp(
+        db: Session,
+        email: str,
+        user_id: Optional[int] = None,
+        commit: bool = True,
+        otp_code: Optional[str] = None
+    ) -> Optional[str]:
         """
-        Create and store a new OTP for given email.
-        
+        Create and store a new OTP for given email in the configured OTP store.
+
         Args:
             db: Database session
             email: Email address
             user_id: Optional user ID
-            
+            commit: Commit the OTP; pass False to commit it with other rows
+                (only meaningful for OTP_STORE=database)
+            otp_code: Code to store; generated if not given. Pass the same code
+                when retrying, so the retry isn't mistaken for a resend
+
         Returns:
-            OTPCode object if created, None if rate limited
+            The OTP code if created, None if rate limited
         """
-        settings = get_settings()
-        
-        # Check if OTP was recently sent (rate limiting)
-        recent_otp = db.query(OTPCode).filter(
-            OTPCode.email == email
-        ).order_by(OTPCode.created_at.desc()).first()
-        
-        if recent_otp:
-            recent_created = OTPService._to_aware(recent_otp.created_at)
-            time_diff = datetime.now(timezone.utc) - recent_created
-            if time_diff.total_seconds() < settings.otp_rate_limit_seconds:
-                logger.warning(f"OTP rate limit exceeded for {email}")
-                return None
-        
-        # Clean up ALL previous OTPs for this email (expired and valid)
-        # Ensures only one active OTP per email at a time
-        db.query(OTPCode).filter(
-            OTPCode.email == email
-        ).delete()
-        db.commit()
-        
-        # Generate new OTP
-        otp_code = OTPService.generate_otp()
-        expiry = datetime.now(timezone.utc) + timedelta(minutes=settings.otp_expiry_minutes)
-        
-        otp = OTPCode(
-            user_id=user_id,
-            email=email,
-            otp=otp_code,
-            expiry=expiry
-        )
-        
-        db.add(otp)
-        db.commit()
-        db.refresh(otp)
-        
-        logger.info(f"OTP created for {email}")
-        return otp
-    
+        otp_code = otp_code or OTPService.generate_otp()
+        if not otp_store.issue(db, email, otp_code, user_id, commit=commit):
+            return None
+        return otp_code
+
     @staticmethod
-    def verify_otp(db: Session, email: str, otp_code: str) -> bool:
+    def verify_otp(db: Session, email: str, otp_code: str, commit: bool = True) -> bool:
         """
-        Verify OTP code.
-        
+        Verify OTP code and consume it on success.
+
         Args:
             db: Database session
             email: Email address
             otp_code: OTP to verify
-            
+            commit: Commit the consumed OTP; pass False to commit it with other changes
+                (only meaningful for OTP_STORE=database)
+
         Returns:
             True if OTP is valid, False otherwise
         """
-        # First check if any OTP exists for this email
-        existing_otp = db.query(OTPCode).filter(
-            OTPCode.email == email
-        ).order_by(OTPCode.created_at.desc()).first()
-
-        if not existing_otp:
-            # Log all emails in otp_codes to debug email mismatch
-            all_emails = [r.email for r in db.query(OTPCode.email).all()]
-            logger.warning(f"No OTP exists for '{email}' | DB has OTPs for: {all_emails}")
-            return False
-        
-        logger.info(f"verify_otp: queried='{email}' stored_email='{existing_otp.email}' stored_otp='{existing_otp.otp}'")
-        
-        # Check if OTP has expired
-        existing_expiry = OTPService._to_aware(existing_otp.expiry)
-        if existing_expiry < datetime.now(timezone.utc):
-            logger.warning(f"OTP expired for {email}")
-            db.delete(existing_otp)
-            db.commit()
-            return False
-        
-        # Check if OTP code matches
-        if existing_otp.otp != otp_code:
-            existing_otp.failed_attempts += 1
-            db.commit()
-            logger.warning(
-                f"Invalid OTP code for {email} (attempt {existing_otp.failed_attempts}) "
-                f"| stored='{existing_otp.otp}' len={len(existing_otp.otp)} "
-                f"| submitted='{otp_code}' len={len(otp_code)}"
-            )
-            
-            # Invalidate OTP after too many failed attempts
-            if existing_otp.failed_attempts >= 5:
-                logger.warning(f"OTP invalidated for {email} after 5 failed attempts")
-                db.delete(existing_otp)
-                db.commit()
-            return False
-        
-        logger.info(f"OTP verified for {email}")
-        return True
-    
-    @staticmethod
-    def delete_otp(db: Session, email: str, otp_code: str) -> None:
-        """
-        Delete OTP after successful verification.
-
-        Args:
-            db: Database session
-            email: Email address
-            otp_code: OTP to delete
-        """
-        db.query(OTPCode).filter(
-            OTPCode.email == email,
-            OTPCode.otp == otp_code
-        ).delete()
-        db.commit()
+        return otp_store.verify(db, email, otp_code, commit=commit)
@@ -0,0 +1,399 @@
+"""Storage backends for OTP codes.
+
+Three backends share one interface, selected with ``OTP_STORE``:
+
+  database  the otp_codes table in the main database (the default). The
+            only backend whose writes share a transaction with the
+            caller's, so an OTP is committed together with the outbox
+            email that delivers it and with the user's verification
+  sqlite    a separate SQLite file (WAL) that every worker on the host
+            shares, with each operation a single short transaction; keeps
+            OTP traffic off the main database's writer
+  memory    lock-protected dict in the app process, for development with
+            a single worker: OTPs are lost on restart (while their queued
+            emails still go out) and can't be verified on another worker
+
+Every backend enforces the resend interval, expiry, and the failed
+attempt limit, and consumes an OTP when it is verified.
+"""
+
+from abc import ABC, abstractmethod
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from typing import Dict, Optional
+from sqlalchemy import delete, or_, update
+from sqlalchemy.orm import Session
+from database import DB_DIR, SessionLocal
+from models import OTPCode
+from config import get_settings, Settings
+import hmac
+import logging
+import sqlite3
+import threading
+import time
+
+logger = logging.getLogger("otp_store")
+
+
+class OTPStore(ABC):
+    """
+    Interface for OTP storage backends.
+
+    Args:
+        ttl_seconds: How long an OTP stays valid
+        min_interval_seconds: Minimum time between two OTPs for one email
+        max_failed_attempts: Wrong codes after which the OTP is invalidated
+    """
+
+    name = "base"
+    # True if writes join the caller's session, so rolling it back undoes them
+    shares_transaction = False
+
+    def __init__(self, ttl_seconds: int, min_interval_seconds: int, max_failed_attempts: int):
+        self.ttl_seconds = ttl_seconds
+        self.min_interval_seconds = min_interval_seconds
+        self.max_failed_attempts = max_failed_attempts
+
+    @abstractmethod
+    def issue(
+        self,
+        db: Session,
+        email: str,
+        otp_code: str,
+        user_id: Optional[int] = None,
+        commit: bool = True
+    ) -> bool:
+        """
+        Store a new OTP for an email, replacing any previous one.
+
+        Re-issuing the OTP that is already stored succeeds, so a unit of work
+        that is retried after a database error can store the same code again.
+
+        Args:
+            db: Database session (only used by the database backend)
+            email: Email address
+            otp_code: The generated OTP
+            user_id: Optional user ID
+            commit: Database backend only; pass False to commit with other rows
+
+        Returns:
+            True if stored, False if an OTP was issued within the resend interval
+        """
+
+    @abstractmethod
+    def verify(self, db: Session, email: str, otp_code: str, commit: bool = True) -> bool:
+        """
+        Check an OTP and consume it if it matches.
+
+        Wrong codes count towards the failed attempt limit; expired OTPs are removed.
+
+        Args:
+            db: Database session (only used by the database backend)
+            email: Email address
+            otp_code: OTP submitted by the user
+            commit: Database backend only; pass False to commit a successful
+                verification together with other changes
+
+        Returns:
+            True if the OTP was valid
+        """
+
+    @abstractmethod
+    def purge_expired(self, db: Optional[Session] = None) -> int:
+        """
+        Remove expired OTPs.
+
+        Returns:
+            Number of OTPs removed
+        """
+
+
+class _MemoryEntry:
+    __slots__ = ("otp", "created_at", "expires_at", "failed_attempts")
+
+    def __init__(self, otp: str, created_at: float, expires_at: float):
+        self.otp = otp
+        self.created_at = created_at
+        self.expires_at = expires_at
+        self.failed_attempts = 0
+
+
+class MemoryOTPStore(OTPStore):
+    """In-process OTP store; expired entries are swept at most once per TTL."""
+
+    name = "memory"
+
+    def __init__(self, ttl_seconds: int, min_interval_seconds: int, max_failed_attempts: int):
+        super().__init__(ttl_seconds, min_interval_seconds, max_failed_attempts)
+        self._entries: Dict[str, _MemoryEntry] = {}
+        self._lock = threading.Lock()
+        self._next_sweep = time.monotonic() + ttl_seconds
+
+    def _sweep(self, now: float) -> int:
+        expired = [email for email, entry in self._entries.items() if entry.expires_at <= now]
+        for email in expired:
+            del self._entries[email]
+        self._next_sweep = now + self.ttl_seconds
+        return len(expired)
+
+    def issue(self, db, email, otp_code, user_id=None, commit=True) -> bool:
+        now = time.monotonic()
+        with self._lock:
+            if now >= self._next_sweep:
+                self._sweep(now)
+            entry = self._entries.get(email)
+            if entry and entry.otp != otp_code and now - entry.created_at < self.min_interval_seconds:
+                logger.warning(f"OTP rate limit exceeded for {email}")
+                return False
+            self._entries[email] = _MemoryEntry(otp_code, now, now + self.ttl_seconds)
+        logger.info(f"OTP created for {email}")
+        return True
+
+    def verify(self, db, email, otp_code, commit=True) -> bool:
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(email)
+            if not entry:
+                logger.warning(f"No OTP exists for '{email}'")
+                return False
+            if entry.expires_at <= now:
+                del self._entries[email]
+                logger.warning(f"OTP expired for {email}")
+                return False
+            if not hmac.compare_digest(entry.otp.encode(), otp_code.encode()):
+                entry.failed_attempts += 1
+                logger.warning(f"Invalid OTP code for {email} (attempt {entry.failed_attempts})")
+                if entry.failed_attempts >= self.max_failed_attempts:
+                    del self._entries[email]
+                    logger.warning(f"OTP invalidated for {email} after {entry.failed_attempts} failed attempts")
+                return False
+            del self._entries[email]
+        logger.info(f"OTP verified for {email}")
+        return True
+
+    def purge_expired(self, db=None) -> int:
+        with self._lock:
+            return self._sweep(time.monotonic())
+
+
+class SQLiteOTPStore(OTPStore):
+    """
+    OTP store in its own SQLite file, shared by all workers on the host.
+
+    Args:
+        path: Database file
+    """
+
+    name = "sqlite"
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS otp_codes (
+            email TEXT PRIMARY KEY,
+            otp TEXT NOT NULL,
+            created_at REAL NOT NULL,
+            expires_at REAL NOT NULL,
+            failed_attempts INTEGER NOT NULL DEFAULT 0
+        ) WITHOUT ROWID
+    """
+
+    def __init__(self, path: Path, ttl_seconds: int, min_interval_seconds: int, max_failed_attempts: int):
+        super().__init__(ttl_seconds, min_interval_seconds, max_failed_attempts)
+        self.path = path
+        self._conn: Optional[sqlite3.Connection] = None
+        self._lock = threading.Lock()
+
+    def _connection(self) -> sqlite3.Connection:
+        """Open the store on first use (called with the lock held)."""
+        if self._conn is None:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            conn = sqlite3.connect(str(self.path), timeout=5, isolation_level=None, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute(self.SCHEMA)
+            self._conn = conn
+        return self._conn
+
+    def issue(self, db, email, otp_code, user_id=None, commit=True) -> bool:
+        # Wall-clock time: the file is shared between processes
+        now = time.time()
+        with self._lock:
+            cursor = self._connection().execute(
+                """
+                INSERT INTO otp_codes (email, otp, created_at, expires_at, failed_attempts)
+                VALUES (?, ?, ?, ?, 0)
+                ON CONFLICT (email) DO UPDATE SET
+                    otp = excluded.otp,
+                    created_at = excluded.created_at,
+                    expires_at = excluded.expires_at,
+                    failed_attempts = 0
+                WHERE otp_codes.created_at <= ? OR otp_codes.otp = excluded.otp
+                """,
+                (email, otp_code, now, now + self.ttl_seconds, now - self.min_interval_seconds)
+            )
+        if cursor.rowcount == 0:
+            logger.warning(f"OTP rate limit exceeded for {email}")
+            return False
+        logger.info(f"OTP created for {email}")
+        return True
+
+    def verify(self, db, email, otp_code, commit=True) -> bool:
+        now = time.time()
+        with self._lock:
+            conn = self._connection()
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                consumed = conn.execute(
+                    "DELETE FROM otp_codes WHERE email = ? AND otp = ? AND expires_at > ? RETURNING email",
+                    (email, otp_code, now)
+                ).fetchone()
+                if not consumed:
+                    conn.execute(
+                        "UPDATE otp_codes SET failed_attempts = failed_attempts + 1 WHERE email = ? AND expires_at > ?",
+                        (email, now)
+                    )
+                    conn.execute(
+                        "DELETE FROM otp_codes WHERE email = ? AND (expires_at <= ? OR failed_attempts >= ?)",
+                        (email, now, self.max_failed_attempts)
+                    )
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+        if not consumed:
+            logger.warning(f"OTP verification failed for {email}")
+            return False
+        logger.info(f"OTP verified for {email}")
+        return True
+
+    def purge_expired(self, db=None) -> int:
+        with self._lock:
+            return self._connection().execute(
+                "DELETE FROM otp_codes WHERE expires_at <= ?", (time.time(),)
+            ).rowcount
+
+
+class DatabaseOTPStore(OTPStore):
+    """OTPs in the otp_codes table of the main database."""
+
+    name = "database"
+    shares_transaction = True
+
+    @staticmethod
+    def _to_aware(dt: Optional[datetime]) -> Optional[datetime]:
+        """Convert a possibly naive datetime from the DB to an aware datetime in UTC."""
+        if dt is None:
+            return None
+        if dt.tzinfo is None:
+            # treat naive datetimes as UTC
+            return dt.replace(tzinfo=timezone.utc)
+        return dt.astimezone(timezone.utc)
+
+    def issue(self, db, email, otp_code, user_id=None, commit=True) -> bool:
+        # Check if OTP was recently sent (rate limiting)
+        recent_otp = db.query(OTPCode).filter(
+            OTPCode.email == email
+        ).order_by(OTPCode.created_at.desc()).first()
+
+        if recent_otp:
+            recent_created = self._to_aware(recent_otp.created_at)
+            time_diff = datetime.now(timezone.utc) - recent_created
+            if time_diff.total_seconds() < self.min_interval_seconds:
+                logger.warning(f"OTP rate limit exceeded for {email}")
+                return False
+
+        # Clean up ALL previous OTPs for this email (expired and valid)
+        # Ensures only one active OTP per email at a time
+        db.query(OTPCode).filter(
+            OTPCode.email == email
+        ).delete()
+
+        db.add(OTPCode(
+            user_id=user_id,
+            email=email,
+            otp=otp_code,
+            expiry=datetime.now(timezone.utc) + timedelta(seconds=self.ttl_seconds)
+        ))
+        if commit:
+            db.commit()
+        else:
+            db.flush()
+
+        logger.info(f"OTP created for {email}")
+        return True
+
+    def verify(self, db, email, otp_code, commit=True) -> bool:
+        now = datetime.utcnow()
+        # Consume a matching, unexpired OTP in one statement
+        consumed = db.execute(
+            delete(OTPCode)
+            .where(OTPCode.email == email, OTPCode.otp == otp_code, OTPCode.expiry > now)
+            .returning(OTPCode.id)
+            .execution_options(synchronize_session=False)
+        ).first()
+        if consumed:
+            if commit:
+                db.commit()
+            logger.info(f"OTP verified for {email}")
+            return True
+
+        # Count the wrong attempt, then drop the OTP once it is expired or used up
+        attempts = db.execute(
+            update(OTPCode)
+            .where(OTPCode.email == email, OTPCode.expiry > now)
+            .values(failed_attempts=OTPCode.failed_attempts + 1)
+            .returning(OTPCode.failed_attempts)
+            .execution_options(synchronize_session=False)
+        ).scalar()
+        db.execute(
+            delete(OTPCode)
+            .where(
+                OTPCode.email == email,
+                or_(OTPCode.expiry <= now, OTPCode.failed_attempts >= self.max_failed_attempts)
+            )
+            .execution_options(synchronize_session=False)
+        )
+        db.commit()
+
+        if attempts is None:
+            logger.warning(f"No valid OTP for {email}")
+        else:
+            logger.warning(f"Invalid OTP code for {email} (attempt {attempts})")
+        return False
+
+    def purge_expired(self, db=None) -> int:
+        session = db or SessionLocal()
+        try:
+            removed = session.query(OTPCode).filter(
+                OTPCode.expiry < datetime.now(timezone.utc)
+            ).delete(synchronize_session=False)
+            session.commit()
+            return removed
+        finally:
+            if db is None:
+                session.close()
+
+
+def create_otp_store(settings: Settings) -> OTPStore:
+    """
+    Build the OTP store selected by OTP_STORE.
+
+    Raises:
+        ValueError: If OTP_STORE names an unknown backend
+    """
+    options = {
+        "ttl_seconds": settings.otp_expiry_minutes * 60,
+        "min_interval_seconds": settings.otp_rate_limit_seconds,
+        "max_failed_attempts": settings.otp_max_failed_attempts,
+    }
+    if settings.otp_store == "memory":
+        return MemoryOTPStore(**options)
+    if settings.otp_store == "sqlite":
+        path = Path(settings.otp_store_path) if settings.otp_store_path else DB_DIR / "otp.db"
+        return SQLiteOTPStore(path, **options)
+    if settings.otp_store == "database":
+        return DatabaseOTPStore(**options)
+    raise ValueError(f"Unknown OTP_STORE '{settings.otp_store}' (expected memory, sqlite or database)")
+
+
+# Singleton instance
+otp_store = create_otp_store(get_settings())
@@ -1,12 +1,268 @@
-"""Simple in-memory IP-based rate limiter — no external dependencies."""
+"""Simple IP-based rate limiter — no external dependencies.
 
+Limits use GCRA (generic cell rate algorithm): "max_calls per period"
+allows a burst of max_calls, then one call every period / max_calls, so
+any window of one period admits up to 2 * max_calls - 1 calls.
+Each key is a single float, the theoretical arrival time of the next
+call, so a check is O(1) however busy the key is. Keys live in an LRU
+capped at RATE_LIMIT_MAX_KEYS, and keys whose window has passed are
+swept from the old end every few calls, so clients that never return
+don't accumulate.
+
+With RATE_LIMIT_BACKEND=sqlite the same state is kept in a small SQLite
+file that every uvicorn worker on the host shares, so adding workers
+doesn't multiply the limits. If that file can't be used, checks fall
+back to per-process limits for a while instead of failing requests.
+"""
+
+import functools
+import logging
+import sqlite3
+import threading
 import time
-from collections import defaultdict
+from collections import OrderedDict
+from pathlib import Path
+from typing import Optional
 from fastapi import Request, HTTPException, status
+from config import get_settings, Settings
+from database import DB_DIR
+
+logger = logging.getLogger("rate_limit")
+
+# Calls between sweeps for keys whose window has passed
+SWEEP_EVERY = 1024
+# After a shared store error, use per-process limits for this long
+FALLBACK_SECONDS = 30
+
+
+class LocalRateLimiter:
+    """
+    GCRA limiter for one process.
+
+    Args:
+        max_keys: Most keys tracked at once; the least recently seen are dropped first
+    """
+
+    def __init__(self, max_keys: int):
+        self.max_keys = max_keys
+        # key -> theoretical arrival time (monotonic seconds)
+        self._tats: OrderedDict = OrderedDict()
+        self._lock = threading.Lock()
+        self._calls = 0
+        self.evictions = 0
+
+    def hit(self, key: str, max_calls: int, period_seconds: float) -> float:
+        """
+        Count a call against `key`.
+
+        Args:
+            key: Limit key, e.g. route and client IP
+            max_calls: Calls allowed per period
+            period_seconds: Length of the period
+
+        Returns:
+            0 if the call is allowed, otherwise seconds until it would be
+        """
+        interval = period_seconds / max_calls
+        now = time.monotonic()
+        tats = self._tats
+        with self._lock:
+            tat = tats.get(key)
+            if tat is None or tat < now:
+                tat = now
+            new_tat = tat + interval
+            if new_tat - now > period_seconds:
+                tats.move_to_end(key)
+                return new_tat - period_seconds - now
+
+            tats[key] = new_tat
+            tats.move_to_end(key)
+            self._calls += 1
+            if not self._calls % SWEEP_EVERY or len(tats) > self.max_keys:
+                self._evict(now)
+        return 0.0
+
+    def _evict(self, now: float) -> None:
+        """Drop keys whose window has passed from the old end, then enforce the cap (lock held)."""
+        tats = self._tats
+        while tats:
+            oldest_key = next(iter(tats))
+            if tats[oldest_key] > now:
+                break
+            del tats[oldest_key]
+        while len(tats) > self.max_keys:
+            tats.popitem(last=False)
+            self.evictions += 1
+
+    def open(self) -> None:
+        """Nothing to open; kept so either limiter can be opened at startup."""
+
+    def reset(self) -> None:
+        """Forget every key."""
+        with self._lock:
+            self._tats.clear()
+
+    def stats(self) -> dict:
+        """Return the number of tracked keys and forced evictions."""
+        return {"backend": "local", "keys": len(self._tats), "max_keys": self.max_keys, "evictions": self.evictions}
+
+
+class SQLiteRateLimiter:
+    """
+    GCRA limiter whose state is shared through a SQLite file.
+
+    Each check is a single UPSERT ... RETURNING on the event loop thread.
+    The file is opened (and its schema created) by open() at startup, where
+    waiting on other workers is fine. Checks never wait: the busy timeout
+    is zero by default, and a check that finds the file locked by another
+    worker is answered by the fallback instead.
+
+    Args:
+        path: Database file
+        max_keys: Most keys kept in the file
+        fallback: Limiter used while the file is unavailable
+        busy_timeout: Seconds a check may wait for another worker's write
+    """
 
+    SCHEMA = (
+        "CREATE TABLE IF NOT EXISTS rate_limits (key TEXT PRIMARY KEY, tat REAL NOT NULL) WITHOUT ROWID",
+        "CREATE INDEX IF NOT EXISTS ix_rate_limits_tat ON rate_limits (tat)",
+    )
+
+    # Allowed calls move the key's arrival time forward; a rejected call leaves it alone
+    HIT = """
+        INSERT INTO rate_limits (key, tat) VALUES (:key, :now + :interval)
+        ON CONFLICT (key) DO UPDATE SET tat = max(tat, :now) + :interval
+        WHERE max(tat, :now) + :interval - :now <= :period
+        RETURNING tat
+    """
+
+    def __init__(self, path: Path, max_keys: int, fallback: LocalRateLimiter, busy_timeout: float = 0.0):
+        self.path = path
+        self.max_keys = max_keys
+        self.fallback = fallback
+        self.busy_timeout = busy_timeout
+        self._conn: Optional[sqlite3.Connection] = None
+        self._lock = threading.Lock()
+        self._calls = 0
+        self._fallback_until = 0.0
+        self.fallbacks = 0
+        self.busy = 0
+
+    def open(self, timeout: float = 5.0) -> None:
+        """
+        Open the file and create its schema; call at startup.
+
+        Setup may wait up to `timeout` seconds on other workers doing the
+        same. If it fails, checks use the fallback for a while.
+        """
+        try:
+            with self._lock:
+                self._connection(timeout)
+        except (sqlite3.Error, OSError) as e:
+            self._start_fallback(e)
+
+    def _connection(self, timeout: float) -> sqlite3.Connection:
+        """Return the open connection, opening it first if needed (lock held)."""
+        if self._conn is None:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            conn = sqlite3.connect(str(self.path), timeout=timeout, isolation_level=None, check_same_thread=False)
+            try:
+                conn.execute("PRAGMA journal_mode=WAL")
+                # Limit state is disposable; don't pay for fsyncs
+                conn.execute("PRAGMA synchronous=OFF")
+                for statement in self.SCHEMA:
+                    conn.execute(statement)
+                conn.execute(f"PRAGMA busy_timeout={int(self.busy_timeout * 1000)}")
+            except sqlite3.Error:
+                conn.close()
+                raise
+            self._conn = conn
+        return self._conn
+
+    def _start_fallback(self, error: Exception) -> None:
+        """Use per-process limits for FALLBACK_SECONDS."""
+        self._fallback_until = time.monotonic() + FALLBACK_SECONDS
+        self.fallbacks += 1
+        logger.warning(f"Shared rate limit store unavailable ({error}); per-process limits for {FALLBACK_SECONDS}s")
+
+    def _sweep(self, conn: sqlite3.Connection, now: float) -> None:
+        """Delete keys whose window has passed, then the least recent ones over the cap."""
+        conn.execute("DELETE FROM rate_limits WHERE tat <= ?", (now,))
+        conn.execute(
+            "DELETE FROM rate_limits WHERE key IN ("
+            " SELECT key FROM rate_limits ORDER BY tat"
+            " LIMIT max(0, (SELECT count(*) FROM rate_limits) - ?))",
+            (self.max_keys,)
+        )
+
+    def hit(self, key: str, max_calls: int, period_seconds: float) -> float:
+        """Count a call against `key`; see LocalRateLimiter.hit."""
+        if time.monotonic() < self._fallback_until:
+            return self.fallback.hit(key, max_calls, period_seconds)
+
+        interval = period_seconds / max_calls
+        # Wall-clock time: the file is shared between processes
+        now = time.time()
+        try:
+            with self._lock:
+                # Not opened at startup, or reopening after a fallback: don't wait on other workers here
+                conn = self._connection(self.busy_timeout)
+                # fetchall() runs the statement to completion, ending its write transaction
+                allowed = conn.execute(
+                    self.HIT, {"key": key, "now": now, "interval": interval, "period": period_seconds}
+                ).fetchall()
+                if not allowed:
+                    (tat,) = conn.execute("SELECT tat FROM rate_limits WHERE key = ?", (key,)).fetchone()
+                    return max(tat, now) + interval - period_seconds - now
+                self._calls += 1
+                if not self._calls % SWEEP_EVERY:
+                    self._sweep(conn, now)
+            return 0.0
+        except (sqlite3.Error, OSError) as e:
+            # Extended codes (SQLITE_BUSY_SNAPSHOT, ...) keep the primary code in the low byte
+            if getattr(e, "sqlite_errorcode", 0) & 0xFF == sqlite3.SQLITE_BUSY:
+                # Another worker is writing right now; answer this one call locally
+                self.busy += 1
+            else:
+                self._start_fallback(e)
+            return self.fallback.hit(key, max_calls, period_seconds)
+
+    def reset(self) -> None:
+        """Forget every key, shared and local."""
+        with self._lock:
+            self._connection(self.busy_timeout).execute("DELETE FROM rate_limits")
+        self.fallback.reset()
+
+    def stats(self) -> dict:
+        """Return fallback state, checks answered locally while busy, and the local limiter's counters."""
+        return {
+            "backend": "sqlite",
+            "fallback_active": time.monotonic() < self._fallback_until,
+            "fallbacks": self.fallbacks,
+            "busy": self.busy,
+            "local": self.fallback.stats(),
+        }
 
-# Stores: {key: [timestamp, timestamp, ...]}
-_buckets: dict = defaultdict(list)
+
+def create_limiter(settings: Settings):
+    """
+    Build the limiter selected by RATE_LIMIT_BACKEND.
+
+    Raises:
+        ValueError: If RATE_LIMIT_BACKEND names an unknown backend
+    """
+    local = LocalRateLimiter(settings.rate_limit_max_keys)
+    if settings.rate_limit_backend == "local":
+        return local
+    if settings.rate_limit_backend == "sqlite":
+        path = Path(settings.rate_limit_store_path) if settings.rate_limit_store_path else DB_DIR / "rate_limit.db"
+        return SQLiteRateLimiter(path, settings.rate_limit_max_keys, local)
+    raise ValueError(f"Unknown RATE_LIMIT_BACKEND '{settings.rate_limit_backend}' (expected local or sqlite)")
+
+
+# Singleton instance
+limiter = create_limiter(get_settings())
 
 
 def _get_ip(request: Request) -> str:
@@ -23,12 +279,15 @@ def rate_limit(max_calls: int, period_seconds: int):
 
     Usage:
         @router.post("/endpoint")
-        @rate_limit(5, 60)   # 5 calls per 60 seconds per IP
+        @rate_limit(5, 60)   # per IP: 5 at once, then 1 every 12s
         async def handler(request: Request, ...):
+
+    A full burst followed by steady calls lets 2 * max_calls - 1 through
+    in one period, so pick max_calls at about half the hard limit.
     """
-    def decorator(func):
-        import functools
+    interval = period_seconds / max_calls
 
+    def decorator(func):
         @functools.wraps(func)
         async def wrapper(*args, **kwargs):
             # Extract request from kwargs (FastAPI injects it by name)
@@ -40,21 +299,15 @@ def rate_limit(max_calls: int, period_seconds: int):
                         break
 
             if request is not None:
-                ip = _get_ip(request)
-                key = f"{func.__name__}:{ip}"
-                now = time.time()
-
-                # Keep only timestamps within the window
-                _buckets[key] = [t for t in _buckets[key] if now - t < period_seconds]
-
-                if len(_buckets[key]) >= max_calls:
+                key = f"{func.__name__}:{_get_ip(request)}"
+                retry_after = limiter.hit(key, max_calls, period_seconds)
+                if retry_after:
                     raise HTTPException(
                         status_code=status.HTTP_429_TOO_MANY_REQUESTS,
-                        detail=f"Too many requests. Max {max_calls} per {period_seconds}s."
+                        detail=f"Too many requests. Max {max_calls} at once, then 1 every {interval:g}s.",
+                        headers={"Retry-After": str(max(1, int(retry_after + 0.999)))}
                     )
 
-                _buckets[key].append(now)
-
             return await func(*args, **kwargs)
 
         return wrapper
@@ -1,17 +1,25 @@
 """Admin routes - restricted to admin email accounts."""
 
-from fastapi import APIRouter, Depends, HTTPException, status, Header
+from fastapi import APIRouter, Depends, HTTPException, status, Header, Query
 from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import Session
-from database import get_db
+from database import get_db, retry_on_locked
 from models import User, Registration
-from auth import AuthService
+from auth import AuthService, AuthUser, is_admin_email
 from admit_card import AdmitCardGenerator
+from admit_card_cache import admit_card_cache
+from admit_card_store import admit_card_store
+from admit_card_export import stream_zip, render_merged_file, iter_file
 from email_service import email_service
+from email_outbox import email_outbox
+from bulk_send import bulk_send_runner
+from maintenance import maintenance_scheduler
+from executor import run_in_thread
 from config import get_settings
 from typing import Optional, List
 from pydantic import BaseModel
 import logging
+import re
 
 logger = logging.getLogger("admin_routes")
 
@@ -53,7 +61,7 @@ class UserAdminRow(BaseModel):
 def get_admin_user(
     db: Session = Depends(get_db),
     authorization: Optional[str] = Header(None)
-) -> User:
+) -> AuthUser:
     """Only allow access to configured admin email accounts."""
     if not authorization:
         raise HTTPException(
@@ -78,9 +86,7 @@ def get_admin_user(
             detail="Invalid or expired token"
         )
 
-    settings = get_settings()
-    allowed = [e.lower() for e in (settings.admin_emails or [settings.sender_email])]
-    if user.email.lower() not in allowed:
+    if not is_admin_email(user.email):
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
             detail="Admin access only"
@@ -89,28 +95,123 @@ def get_admin_user(
     return user
 
 
+# ── Blocking helpers (run via the thread pool) ─────────────────────────────────
+
+def _list_user_rows(db: Session) -> List[UserAdminRow]:
+    users = db.query(User).order_by(User.id.desc()).all()
+    return [UserAdminRow.model_validate(u) for u in users]
+
+
+def _get_registration(db: Session, user_id: int) -> Optional[Registration]:
+    return db.query(Registration).filter(
+        Registration.user_id == user_id
+    ).first()
+
+
+def _get_user_and_registration(db: Session, user_id: int) -> tuple:
+    user = db.query(User).filter(User.id == user_id).first()
+    registration = _get_registration(db, user_id) if user else None
+    return user, registration
+
+
+@retry_on_locked
+def _mark_admit_card_sent(db: Session, user_id: int) -> None:
+    db.query(Registration).filter(
+        Registration.user_id == user_id
+    ).update({Registration.admit_card_sent: True}, synchronize_session=False)
+    db.commit()
+
+
+@retry_on_locked
+def _delete_user(db: Session, user_id: int) -> Optional[str]:
+    """Delete a user and their stored admit card; returns their email, or None if not found."""
+    user = db.query(User).filter(User.id == user_id).first()
+    if not user:
+        return None
+    email = user.email
+    roll_no = user.registration.roll_no if user.registration else None
+    db.delete(user)
+    db.commit()
+    AuthService.invalidate_user(user_id)
+    if roll_no:
+        admit_card_store.remove(roll_no)
+    return email
+
+
+@retry_on_locked
+def _delete_users(db: Session, user_ids: List[int]) -> List[int]:
+    deleted, roll_nos = [], []
+    for uid in user_ids:
+        user = db.query(User).filter(User.id == uid).first()
+        if user:
+            if user.registration:
+                roll_nos.append(user.registration.roll_no)
+            db.delete(user)
+            deleted.append(uid)
+    db.commit()
+    for uid in deleted:
+        AuthService.invalidate_user(uid)
+    for roll_no in roll_nos:
+        admit_card_store.remove(roll_no)
+    return deleted
+
+
+def _slot_cards(db: Session, exam_centre: str, exam_date: Optional[str], exam_time: Optional[str]) -> List[dict]:
+    """Admit card fields for every registration in a centre/date/slot, by roll number."""
+    query = db.query(Registration).filter(Registration.exam_centre == exam_centre)
+    if exam_date:
+        query = query.filter(Registration.exam_date == exam_date)
+    if exam_time:
+        query = query.filter(Registration.exam_time == exam_time)
+    return [
+        AdmitCardGenerator.fields_from_registration(r)
+        for r in query.order_by(Registration.roll_no).yield_per(1000)
+    ]
+
+
 # ── Routes ────────────────────────────────────────────────────────────────────
 
 @router.get("/users", response_model=List[UserAdminRow])
 async def list_all_users(
     db: Session = Depends(get_db),
-    _: User = Depends(get_admin_user)
+    _: AuthUser = Depends(get_admin_user)
 ):
     """Return all users with their registration details."""
-    users = db.query(User).order_by(User.id.desc()).all()
-    return [UserAdminRow.model_validate(u) for u in users]
+    return await run_in_thread(_list_user_rows, db)
+
+
+@router.get("/admit-card-cache/stats")
+async def admit_card_cache_stats(_: AuthUser = Depends(get_admin_user)):
+    """Return admit card cache hit/miss counters."""
+    return admit_card_cache.get_stats()
+
+
+@router.get("/email-outbox/stats")
+async def email_outbox_stats(
+    db: Session = Depends(get_db),
+    _: AuthUser = Depends(get_admin_user)
+):
+    """Return outbox message counts per delivery status."""
+    return await run_in_thread(email_outbox.get_stats, db)
+
+
+@router.get("/maintenance")
+async def maintenance_status(
+    db: Session = Depends(get_db),
+    _: AuthUser = Depends(get_admin_user)
+):
+    """Return the schedule and last report of each background maintenance task."""
+    return await run_in_thread(maintenance_scheduler.get_status, db)
 
 
 @router.get("/users/{user_id}/admit-card")
 async def admin_download_admit_card(
     user_id: int,
     db: Session = Depends(get_db),
-    _: User = Depends(get_admin_user)
+    _: AuthUser = Depends(get_admin_user)
 ):
     """Download admit card PDF for any registered user."""
-    registration = db.query(Registration).filter(
-        Registration.user_id == user_id
-    ).first()
+    registration = await run_in_thread(_get_registration, db, user_id)
 
     if not registration:
         raise HTTPException(
@@ -118,24 +219,64 @@ async def admin_download_admit_card(
             detail="Registration not found for this user"
         )
 
-    pdf_buffer = AdmitCardGenerator.generate_pdf(
-        roll_no=registration.roll_no,
-        name=registration.name,
-        father_name=registration.father_name,
-        current_class=registration.current_class or "",
-        medium=registration.medium,
-        course=registration.course,
-        exam_centre=registration.exam_centre,
-        exam_date=registration.exam_date,
-        exam_time=registration.exam_time or ""
+    filename = f"admit_card_{registration.roll_no}.pdf"
+    return await admit_card_store.response_for(
+        AdmitCardGenerator.fields_from_registration(registration),
+        filename
     )
-    pdf_buffer.seek(0)
 
-    filename = f"admit_card_{registration.roll_no}.pdf"
+
+@router.get("/admit-cards/export")
+async def admin_export_admit_cards(
+    exam_centre: str,
+    exam_date: Optional[str] = None,
+    exam_time: Optional[str] = None,
+    fmt: str = Query("pdf", alias="format", pattern="^(pdf|zip)$"),
+    db: Session = Depends(get_db),
+    _: AuthUser = Depends(get_admin_user)
+):
+    """
+    Export admit cards for one exam centre, optionally narrowed to a date/slot.
+
+    format=pdf sends a single merged PDF (one page per student), rendered
+    whole first, for at most ADMIT_CARD_EXPORT_PDF_MAX_CARDS cards;
+    format=zip streams a ZIP of admit_card_<roll_no>.pdf files as they render.
+    """
+    cards = await run_in_thread(_slot_cards, db, exam_centre, exam_date, exam_time)
+    if not cards:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="No registrations found for this centre/date/slot"
+        )
+
+    label = "_".join(
+        re.sub(r"[^A-Za-z0-9]+", "-", part).strip("-")
+        for part in (exam_centre, exam_date, exam_time) if part
+    )
+    logger.info(f"Exporting {len(cards)} admit cards as {fmt} for {label}")
+
+    if fmt == "zip":
+        return StreamingResponse(
+            stream_zip(cards),
+            media_type="application/zip",
+            headers={"Content-Disposition": f"attachment; filename=admit_cards_{label}.zip"}
+        )
+
+    max_cards = get_settings().admit_card_export_pdf_max_cards
+    if len(cards) > max_cards:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"{len(cards)} admit cards is more than {max_cards} for one PDF; export with format=zip"
+        )
+
+    file, size = await render_merged_file(cards)
     return StreamingResponse(
-        pdf_buffer,
+        iter_file(file),
         media_type="application/pdf",
-        headers={"Content-Disposition": f"attachment; filename={filename}"}
+        headers={
+            "Content-Disposition": f"attachment; filename=admit_cards_{label}.pdf",
+            "Content-Length": str(size)
+        }
     )
 
 
@@ -143,44 +284,32 @@ async def admin_download_admit_card(
 async def admin_send_admit_card(
     user_id: int,
     db: Session = Depends(get_db),
-    _: User = Depends(get_admin_user)
+    _: AuthUser = Depends(get_admin_user)
 ):
     """Generate and email the admit card PDF to the registered user."""
-    user = db.query(User).filter(User.id == user_id).first()
+    user, registration = await run_in_thread(_get_user_and_registration, db, user_id)
     if not user:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="User not found"
         )
 
-    registration = db.query(Registration).filter(
-        Registration.user_id == user_id
-    ).first()
-
     if not registration:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Registration not found for this user"
         )
 
-    pdf_buffer = AdmitCardGenerator.generate_pdf(
-        roll_no=registration.roll_no,
-        name=registration.name,
-        father_name=registration.father_name,
-        current_class=registration.current_class or "",
-        medium=registration.medium,
-        course=registration.course,
-        exam_centre=registration.exam_centre,
-        exam_date=registration.exam_date,
-        exam_time=registration.exam_time or ""
+    pdf_bytes = await admit_card_cache.get_pdf_async(
+        AdmitCardGenerator.fields_from_registration(registration)
     )
-    pdf_buffer.seek(0)
 
-    success = email_service.send_admit_card_email(
+    success = await run_in_thread(
+        email_service.send_admit_card_email,
         recipient_email=user.email,
         student_name=registration.name,
         roll_no=registration.roll_no,
-        pdf_bytes=pdf_buffer.read()
+        pdf_bytes=pdf_bytes
     )
 
     if not success:
@@ -189,8 +318,7 @@ async def admin_send_admit_card(
             detail="Failed to send email"
         )
 
-    registration.admit_card_sent = True
-    db.commit()
+    await run_in_thread(_mark_admit_card_sent, db, user_id)
     logger.info(f"Admit card sent to {user.email} (roll: {registration.roll_no})")
     return {"message": f"Admit card sent to {user.email}"}
 
@@ -199,75 +327,78 @@ async def admin_send_admit_card(
 async def admin_delete_user(
     user_id: int,
     db: Session = Depends(get_db),
-    _: User = Depends(get_admin_user)
+    _: AuthUser = Depends(get_admin_user)
 ):
     """Permanently delete a user and their registration."""
-    user = db.query(User).filter(User.id == user_id).first()
-    if not user:
+    email = await run_in_thread(_delete_user, db, user_id)
+    if not email:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="User not found")
 
-    db.delete(user)
-    db.commit()
-    logger.info(f"User {user.email} (id={user_id}) deleted by admin")
-    return {"message": f"User {user.email} deleted"}
+    logger.info(f"User {email} (id={user_id}) deleted by admin")
+    return {"message": f"User {email} deleted"}
 
 
-@router.post("/users/bulk-send")
+@router.post("/users/bulk-send", status_code=status.HTTP_202_ACCEPTED)
 async def admin_bulk_send(
     body: BulkUserIds,
     db: Session = Depends(get_db),
-    _: User = Depends(get_admin_user)
+    admin: AuthUser = Depends(get_admin_user)
 ):
-    """Send admit card emails to multiple users."""
-    sent, failed, skipped = [], [], []
+    """
+    Queue admit card emails to multiple users as a background job.
 
-    for uid in body.user_ids:
-        user = db.query(User).filter(User.id == uid).first()
-        reg = db.query(Registration).filter(Registration.user_id == uid).first() if user else None
-
-        if not user or not reg:
-            skipped.append(uid)
-            continue
-
-        try:
-            pdf_buffer = AdmitCardGenerator.generate_pdf(
-                roll_no=reg.roll_no, name=reg.name, father_name=reg.father_name,
-                medium=reg.medium, course=reg.course, exam_centre=reg.exam_centre,
-                exam_date=reg.exam_date, exam_time=reg.exam_time or ""
-            )
-            pdf_buffer.seek(0)
-            ok = email_service.send_admit_card_email(
-                recipient_email=user.email,
-                student_name=reg.name,
-                roll_no=reg.roll_no,
-                pdf_bytes=pdf_buffer.read()
-            )
-            if ok:
-                reg.admit_card_sent = True
-                db.commit()
-            (sent if ok else failed).append(uid)
-        except Exception as e:
-            logger.error(f"Bulk send failed for uid={uid}: {e}")
-            failed.append(uid)
-
-    logger.info(f"Bulk send: sent={len(sent)}, failed={len(failed)}, skipped={len(skipped)}")
-    return {"message": f"Sent: {len(sent)}, Failed: {len(failed)}, Skipped (no reg): {len(skipped)}",
-            "sent": sent, "failed": failed, "skipped": skipped}
+    Returns the job id straight away; poll /admin/bulk-jobs/{job_id} for
+    progress. Users whose admit card was already sent are skipped.
+    """
+    job = await run_in_thread(bulk_send_runner.submit, db, body.user_ids, admin.email)
+    bulk_send_runner.notify()
+    logger.info(f"Bulk send job {job['job_id']} queued for {job['total']} users by {admin.email}")
+    return {**job, "message": f"Queued admit cards for {job['total']} user(s)"}
+
+
+@router.get("/bulk-jobs")
+async def list_bulk_jobs(
+    db: Session = Depends(get_db),
+    _: AuthUser = Depends(get_admin_user)
+):
+    """Return the most recent bulk-send jobs with their progress."""
+    return await run_in_thread(bulk_send_runner.list_jobs, db)
+
+
+@router.get("/bulk-jobs/{job_id}")
+async def get_bulk_job(
+    job_id: int,
+    items: bool = Query(False, description="Include per-user status"),
+    db: Session = Depends(get_db),
+    _: AuthUser = Depends(get_admin_user)
+):
+    """Return a bulk-send job's status and per-status counts."""
+    progress = await run_in_thread(bulk_send_runner.progress, db, job_id, items)
+    if not progress:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Job not found")
+    return progress
+
+
+@router.post("/bulk-jobs/{job_id}/cancel")
+async def cancel_bulk_job(
+    job_id: int,
+    db: Session = Depends(get_db),
+    _: AuthUser = Depends(get_admin_user)
+):
+    """Stop a queued or running bulk-send job; unsent users are left pending."""
+    job_status = await run_in_thread(bulk_send_runner.cancel, db, job_id)
+    if not job_status:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Job not found")
+    return {"job_id": job_id, "status": job_status}
 
 
 @router.post("/users/bulk-delete")
 async def admin_bulk_delete(
     body: BulkUserIds,
     db: Session = Depends(get_db),
-    _: User = Depends(get_admin_user)
+    _: AuthUser = Depends(get_admin_user)
 ):
     """Permanently delete multiple users and their registrations."""
-    deleted = []
-    for uid in body.user_ids:
-        user = db.query(User).filter(User.id == uid).first()
-        if user:
-            db.delete(user)
-            deleted.append(uid)
-    db.commit()
+    deleted = await run_in_thread(_delete_users, db, body.user_ids)
     logger.info(f"Bulk delete: removed {len(deleted)} users")
     return {"message": f"{len(deleted)} user(s) deleted", "deleted": deleted}
@@ -1,14 +1,17 @@
 """Authentication routes."""
 
-from fastapi import APIRouter, Depends, HTTPException, status, Header, Request
+from fastapi import APIRouter, HTTPException, status, Header, Request
 from sqlalchemy.orm import Session
 from typing import Optional
-from database import get_db
+from database import retry_on_locked, run_in_session
 from schemas import SendOTPRequest, VerifyOTPRequest, TokenResponse
 from models import User
 from otp_service import OTPService
+from otp_store import otp_store
+from email_outbox import email_outbox
 from email_service import email_service
-from auth import AuthService, create_or_get_user
+from circuit_breaker import CircuitOpenError
+from auth import AuthService, create_or_get_user, mark_user_verified, is_admin_email
 from config import get_settings
 from rate_limit import rate_limit
 import logging
@@ -18,25 +21,86 @@ logger = logging.getLogger("auth_routes")
 router = APIRouter(prefix="/auth", tags=["auth"])
 
 
+def _issue_otp(db: Session, email: str) -> Optional[str]:
+    """
+    Create or get the user and queue a fresh OTP email.
+
+    A new user and the outbox row are committed together, and with
+    OTP_STORE=database the OTP too, so none exists without the others.
+    The sqlite and memory stores keep the OTP outside this transaction: it
+    is stored first, and if the commit then fails the user simply asks for
+    a new code.
+
+    Returns:
+        Outbox delivery id, or None if rate limited
+    """
+    # Generated once, so a retried attempt stores the same code
+    return _store_and_queue_otp(db, email, OTPService.generate_otp())
+
+
+@retry_on_locked
+def _store_and_queue_otp(db: Session, email: str, otp_code: str) -> Optional[str]:
+    """Store the user, OTP and outbox row in one transaction (see _issue_otp)."""
+    user = create_or_get_user(db, email, commit=False)
+    if not OTPService.create_otp(db, email, user.id, commit=False, otp_code=otp_code):
+        return None
+    message = email_outbox.enqueue_otp(db, email, otp_code)
+    db.commit()
+    return message.public_id
+
+
+def _verify_and_login(db: Session, email: str, otp_code: str) -> Optional[int]:
+    """
+    Verify and consume the OTP and mark the user verified.
+
+    With OTP_STORE=database both happen in one transaction, retried as a
+    whole. The sqlite and memory stores consume the OTP at once, outside
+    that transaction, so it is verified once up front and only the user
+    update is retried; re-verifying would find the OTP gone.
+
+    Returns:
+        The user id, or None if the OTP is invalid or expired
+    """
+    if otp_store.shares_transaction:
+        user_id = _consume_otp_and_mark_verified(db, email, otp_code)
+    elif OTPService.verify_otp(db, email, otp_code):
+        user_id = _consume_otp_and_mark_verified(db, email, None)
+    else:
+        user_id = None
+    if user_id:
+        AuthService.invalidate_user(user_id)
+    return user_id
+
+
+@retry_on_locked
+def _consume_otp_and_mark_verified(db: Session, email: str, otp_code: Optional[str]) -> Optional[int]:
+    """Consume the OTP (unless already verified, otp_code None) and mark the user verified, then commit."""
+    if otp_code is not None and not OTPService.verify_otp(db, email, otp_code, commit=False):
+        return None
+
+    user_id = mark_user_verified(db, email)
+    db.commit()
+    return user_id
+
+
 @router.post("/send-otp")
-@rate_limit(5, 60)
+@rate_limit(get_settings().rate_limit_send_otp_per_minute, 60)
 async def send_otp(
     request: Request,
     payload: SendOTPRequest,
-    db: Session = Depends(get_db)
 ) -> dict:
     """
     Send OTP to email address.
     
     Args:
         request: SendOTPRequest with email
-        db: Database session
         
     Returns:
         Success message
         
     Raises:
         HTTPException if email is invalid or OTP send fails
+        CircuitOpenError if the SMTP server is currently failing (503)
     """
     email = payload.email.lower().strip()
     settings = get_settings()
@@ -61,51 +125,65 @@ async def send_otp(
             )
 
         # Ensure the email is authorized as an admin email
-        allowed_admins = [e.lower() for e in (settings.admin_emails or [settings.sender_email])]
-        if email not in allowed_admins:
+        if not is_admin_email(email):
             raise HTTPException(
                 status_code=status.HTTP_403_FORBIDDEN,
                 detail="Email is not authorized for admin access"
             )
 
-    # Create or get user
-    user = create_or_get_user(db, email)
-    
-    # Generate OTP
-    otp = OTPService.create_otp(db, email, user.id)
+    # Don't hand out an OTP the outbox can't deliver; the client retries after Retry-After
+    retry_after = email_service.smtp_breaker.retry_after()
+    if retry_after:
+        raise CircuitOpenError("smtp", retry_after)
+
+    # Create or get user, generate OTP and queue the email for the outbox worker
+    delivery_id = await run_in_session(_issue_otp, email)
     
-    if not otp:
+    if not delivery_id:
         raise HTTPException(
             status_code=status.HTTP_429_TOO_MANY_REQUESTS,
             detail="Please wait before requesting another OTP"
         )
     
-    # Send email
-    success = email_service.send_otp_email(email, otp.otp)
+    email_outbox.notify()
+    
+    return {"message": "OTP sent successfully", "email": email, "delivery_id": delivery_id}
+
+
+@router.get("/otp-delivery/{delivery_id}")
+async def otp_delivery_status(
+    delivery_id: str
+) -> dict:
+    """
+    Report delivery status of a queued OTP email.
     
-    if not success:
-        logger.error(f"Failed to send OTP email to {email}")
+    Args:
+        delivery_id: Id returned by /auth/send-otp
+        
+    Returns:
+        Status (pending, sending, sent, failed, expired, or superseded by a
+        newer code) and attempts so far
+    """
+    delivery = await run_in_session(email_outbox.get_status, delivery_id)
+    if not delivery:
         raise HTTPException(
-            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-            detail="Failed to send OTP. Please try again later."
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Unknown delivery id"
         )
-    
-    return {"message": "OTP sent successfully", "email": email}
+    return delivery
 
 
 @router.post("/verify-otp", response_model=TokenResponse)
-@rate_limit(10, 60)
+@rate_limit(get_settings().rate_limit_verify_otp_per_minute, 60)
 async def verify_otp(
     request: Request,
     payload: VerifyOTPRequest,
-    db: Session = Depends(get_db)
 ) -> TokenResponse:
     """
     Verify OTP and return JWT token.
     
     Args:
         request: VerifyOTPRequest with email and OTP
-        db: Database session
         
     Returns:
         TokenResponse with JWT access token
@@ -116,27 +194,17 @@ async def verify_otp(
     email = payload.email.lower().strip()
     otp_code = payload.otp.strip()
     
-    # Verify OTP
-    is_valid = OTPService.verify_otp(db, email, otp_code)
+    # Verify and consume the OTP and mark the user verified
+    user_id = await run_in_session(_verify_and_login, email, otp_code)
     
-    if not is_valid:
+    if not user_id:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Invalid or expired OTP"
         )
     
-    # Get or create user
-    user = create_or_get_user(db, email)
-    
-    # Mark user as verified
-    user.is_verified = True
-    db.commit()
-    
-    # Delete used OTP
-    OTPService.delete_otp(db, email, otp_code)
-    
     # Generate JWT token
-    token = AuthService.create_access_token(email, user.id)
+    token = AuthService.create_access_token(email, user_id)
     
     logger.info(f"User verified and logged in: {email}")
     
@@ -145,14 +213,12 @@ async def verify_otp(
 
 @router.get("/me")
 async def get_current_user(
-    db: Session = Depends(get_db),
     authorization: Optional[str] = Header(None)
 ) -> dict:
     """
     Get current authenticated user.
     
     Args:
-        db: Database session
         authorization: Bearer token from header
         
     Returns:
@@ -179,7 +245,8 @@ async def get_current_user(
         )
     
     # Verify token and get user
-    user = AuthService.get_current_user(db, token)
+    # Recently seen users come from the auth cache without a thread hop
+    user = AuthService.get_cached_user(token) or await run_in_session(AuthService.get_current_user, token)
     
     if not user:
         raise HTTPException(
@@ -191,6 +258,6 @@ async def get_current_user(
         "id": user.id,
         "email": user.email,
         "is_verified": user.is_verified,
-        "is_admin": user.email.lower() in [e.lower() for e in (get_settings().admin_emails or [get_settings().sender_email])],
+        "is_admin": is_admin_email(user.email),
         "created_at": user.created_at.isoformat()
     }
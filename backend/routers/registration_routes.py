@@ -1,13 +1,15 @@
 """Registration and admit card routes."""
 
-from fastapi import APIRouter, Depends, HTTPException, status, Header
-from fastapi.responses import StreamingResponse
+from fastapi import APIRouter, Depends, HTTPException, status, Header, BackgroundTasks
 from sqlalchemy.orm import Session
-from database import get_db
+from database import retry_on_locked, run_in_session
 from schemas import RegistrationCreate, RegistrationUpdate, RegistrationResponse
-from models import User, Registration
-from auth import AuthService
+from models import Registration
+from auth import AuthService, AuthUser
 from admit_card import AdmitCardGenerator
+from admit_card_cache import admit_card_cache
+from admit_card_store import admit_card_store
+from executor import PoolBusyError
 import logging
 import uuid
 from typing import Optional
@@ -17,15 +19,13 @@ logger = logging.getLogger("registration_routes")
 router = APIRouter(prefix="/registration", tags=["registration"])
 
 
-def get_current_user_from_header(
-    db: Session = Depends(get_db),
+async def get_current_user_from_header(
     authorization: Optional[str] = Header(None)
-) -> User:
+) -> AuthUser:
     """
     Get authenticated user from JWT token in header.
     
     Args:
-        db: Database session
         authorization: Bearer token
         
     Returns:
@@ -50,7 +50,8 @@ def get_current_user_from_header(
             detail="Invalid authorization header format"
         )
     
-    user = AuthService.get_current_user(db, token)
+    # Recently seen users come from the auth cache without a thread hop
+    user = AuthService.get_cached_user(token) or await run_in_session(AuthService.get_current_user, token)
     
     if not user:
         raise HTTPException(
@@ -76,32 +77,18 @@ def generate_roll_number(user_id: int) -> str:
     # return f"NSAT2026-{user_id:04d}"
     return f"888{user_id:04d}"
 
-@router.post("/", response_model=RegistrationResponse)
-async def create_or_update_registration(
-    request: RegistrationCreate,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user_from_header)
-) -> RegistrationResponse:
-    """
-    Create or update registration form.
-    
-    Args:
-        request: Registration data
-        db: Database session
-        current_user: Authenticated user
-        
-    Returns:
-        Created/updated registration
-        
-    Raises:
-        HTTPException if registration fails
-    """
+@retry_on_locked
+def _save_registration(db: Session, user: AuthUser, request: RegistrationCreate) -> Registration:
+    """Create or update the user's registration row and commit it."""
     # Check if registration already exists
     registration = db.query(Registration).filter(
-        Registration.user_id == current_user.id
+        Registration.user_id == user.id
     ).first()
     
     if registration:
+        # Drop the cached card rendered from the old values
+        admit_card_cache.invalidate(AdmitCardGenerator.fields_from_registration(registration))
+
         # Update existing registration
         registration.name = request.name
         registration.father_name = request.father_name
@@ -112,13 +99,13 @@ async def create_or_update_registration(
         registration.exam_date = request.exam_date
         registration.exam_time = request.exam_time
         
-        logger.info(f"Registration updated for user: {current_user.email}")
+        logger.info(f"Registration updated for user: {user.email}")
     else:
         # Create new registration
-        roll_no = generate_roll_number(current_user.id)
+        roll_no = generate_roll_number(user.id)
         
         registration = Registration(
-            user_id=current_user.id,
+            user_id=user.id,
             roll_no=roll_no,
             name=request.name,
             father_name=request.father_name,
@@ -131,24 +118,59 @@ async def create_or_update_registration(
         )
         
         db.add(registration)
-        logger.info(f"Registration created for user: {current_user.email}, roll_no: {roll_no}")
+        logger.info(f"Registration created for user: {user.email}, roll_no: {roll_no}")
     
     db.commit()
     db.refresh(registration)
+    return registration
+
+
+def _get_user_registration(db: Session, user_id: int) -> Optional[Registration]:
+    """Load a user's registration row, if any."""
+    return db.query(Registration).filter(
+        Registration.user_id == user_id
+    ).first()
+
+
+@router.post("/", response_model=RegistrationResponse)
+async def create_or_update_registration(
+    request: RegistrationCreate,
+    background_tasks: BackgroundTasks,
+    current_user: AuthUser = Depends(get_current_user_from_header)
+) -> RegistrationResponse:
+    """
+    Create or update registration form.
+    
+    Args:
+        request: Registration data
+        background_tasks: Used to re-render the stored admit card after saving
+        current_user: Authenticated user
+        
+    Returns:
+        Created/updated registration
+        
+    Raises:
+        HTTPException if registration fails
+    """
+    registration = await run_in_session(_save_registration, current_user, request)
+    
+    # Re-render only this student's pre-generated admit card
+    background_tasks.add_task(
+        admit_card_store.refresh_async,
+        AdmitCardGenerator.fields_from_registration(registration)
+    )
     
     return RegistrationResponse.model_validate(registration)
 
 
 @router.get("/", response_model=RegistrationResponse)
 async def get_registration(
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user_from_header)
+    current_user: AuthUser = Depends(get_current_user_from_header)
 ) -> RegistrationResponse:
     """
     Get user's registration data.
     
     Args:
-        db: Database session
         current_user: Authenticated user
         
     Returns:
@@ -157,9 +179,7 @@ async def get_registration(
     Raises:
         HTTPException if registration not found
     """
-    registration = db.query(Registration).filter(
-        Registration.user_id == current_user.id
-    ).first()
+    registration = await run_in_session(_get_user_registration, current_user.id)
     
     if not registration:
         raise HTTPException(
@@ -172,14 +192,12 @@ async def get_registration(
 
 @router.get("/admit-card")
 async def download_admit_card(
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user_from_header)
+    current_user: AuthUser = Depends(get_current_user_from_header)
 ):
     """
     Generate and download admit card PDF.
     
     Args:
-        db: Database session
         current_user: Authenticated user
         
     Returns:
@@ -188,9 +206,7 @@ async def download_admit_card(
     Raises:
         HTTPException if registration not found
     """
-    registration = db.query(Registration).filter(
-        Registration.user_id == current_user.id
-    ).first()
+    registration = await run_in_session(_get_user_registration, current_user.id)
     
     if not registration:
         raise HTTPException(
@@ -199,30 +215,16 @@ async def download_admit_card(
         )
     
     try:
-        # Generate PDF
-        pdf_buffer = AdmitCardGenerator.generate_pdf(
-            roll_no=registration.roll_no,
-            name=registration.name,
-            father_name=registration.father_name,
-            current_class=registration.current_class or "",
-            medium=registration.medium,
-            course=registration.course,
-            exam_centre=registration.exam_centre,
-            exam_date=registration.exam_date,
-            exam_time=registration.exam_time or ""
-        )
-        
+        # Serve the pre-generated file, rendering it first if missing or stale
         filename = f"admit_card_{registration.roll_no}.pdf"
         
-        # Reset buffer position to start
-        pdf_buffer.seek(0)
-        
-        return StreamingResponse(
-            pdf_buffer,
-            media_type="application/pdf",
-            headers={"Content-Disposition": f"attachment; filename={filename}"}
+        return await admit_card_store.response_for(
+            AdmitCardGenerator.fields_from_registration(registration),
+            filename
         )
         
+    except PoolBusyError:
+        raise
     except Exception as e:
         logger.error(f"Error generating admit card: {str(e)}")
         raise HTTPException(
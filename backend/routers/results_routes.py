@@ -1,9 +1,12 @@
 from fastapi import APIRouter, Depends, UploadFile, File, HTTPException, status
 from sqlalchemy.orm import Session
-from database import get_db
+from pandas.api.types import is_numeric_dtype
+from database import ResultsSessionLocal, get_results_db, retry_on_locked, run_in_session
 from models import StudentResult
 from config import get_settings
-from typing import List, Optional
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+import numpy as np
 import pandas as pd
 import json
 import io
@@ -17,37 +20,121 @@ except ImportError:
     RAPIDFUZZ_AVAILABLE = False
 
 from routers.admin_routes import get_admin_user
+from executor import run_in_thread, run_in_process, PoolBusyError
 
 logger = logging.getLogger("results_routes")
 
 router = APIRouter(prefix="/results", tags=["results"])
 
 
+# Excel columns that can be mapped; name and phone are required
+RESULT_FIELDS = ("name", "phone", "percentage", "rank", "scholarship")
+# Rows per INSERT (executemany) when importing results
+INSERT_CHUNK_ROWS = 5000
+
+
+def _split_cells(column: pd.Series) -> Tuple[pd.Series, pd.Series]:
+    """Split an Excel column into its text cells (stripped) and its numeric cells; each is NA where the other applies."""
+    if is_numeric_dtype(column):
+        return pd.Series(pd.NA, index=column.index, dtype="string"), column.astype(float)
+    is_text = column.map(type).eq(str)
+    text = column.where(is_text).astype("string").str.strip()
+    number = pd.to_numeric(column.where(~is_text), errors="coerce")
+    return text, number
+
+
+def _normalize_results(df: pd.DataFrame, mapping: dict) -> Tuple[pd.DataFrame, Dict[str, int]]:
+    """
+    Turn the mapped Excel columns into student_results rows, column by column.
+
+    Phones keep only their digits. Numeric cells (Excel stores them as
+    floats) are written as integers, and a trailing '.0' on text cells is
+    dropped, as migrations.normalize_legacy_phone does for old rows.
+    Percentage, rank and scholarship values that don't parse become NULL;
+    scholarship accepts '90%' and fractions such as 0.9.
+
+    Args:
+        df: The uploaded sheet
+        mapping: Field name to column name; name and phone are required
+
+    Returns:
+        The rows to insert, and the number of rows skipped per reason
+    """
+    names = df[mapping["name"]].astype("string").str.strip().fillna("")
+
+    text, number = _split_cells(df[mapping["phone"]])
+    whole = number.where((number % 1 == 0) & (number.abs() < 2 ** 53))
+    from_number = whole.astype("Int64").astype("string")
+    from_text = text.str.replace(r"\.0$", "", regex=True).str.replace(r"\D", "", regex=True)
+    phones = from_text.fillna(from_number).fillna("")
+
+    def numeric(field: str) -> pd.Series:
+        if not mapping.get(field):
+            return pd.Series(np.nan, index=df.index)
+        return pd.to_numeric(df[mapping[field]], errors="coerce")
+
+    rank = numeric("rank")
+    rank = np.trunc(rank.where(rank.abs() < 2 ** 31)).astype("Int64")
+
+    scholarship = pd.Series(np.nan, index=df.index)
+    if mapping.get("scholarship"):
+        text, number = _split_cells(df[mapping["scholarship"]])
+        from_text = pd.to_numeric(text.str.rstrip("%"), errors="coerce")
+        # Percent-formatted cells arrive as fractions
+        from_number = number.mask((number > 0) & (number < 1), number * 100)
+        scholarship = from_text.fillna(from_number)
+
+    has_name = names != ""
+    has_phone = phones != ""
+    skipped = {
+        "missing_name": int((~has_name).sum()),
+        # Empty, no digits, or a number with a fraction
+        "missing_phone": int((has_name & ~has_phone).sum()),
+    }
+    rows = pd.DataFrame({
+        "name": names,
+        "phone": phones,
+        "percentage": numeric("percentage"),
+        "rank": rank,
+        "scholarship": scholarship,
+    })[has_name & has_phone]
+    return rows, skipped
+
+
+@retry_on_locked
+def _insert_results(db: Session, rows: pd.DataFrame, source_filename: str) -> int:
+    """Insert normalized rows with chunked bulk INSERTs in one transaction; returns rows inserted."""
+    statement = StudentResult.__table__.insert().values(source_file=source_filename, created_at=datetime.utcnow())
+    for start in range(0, len(rows), INSERT_CHUNK_ROWS):
+        chunk = rows.iloc[start:start + INSERT_CHUNK_ROWS].astype(object)
+        # NaN and NA become NULL
+        records = chunk.where(chunk.notna(), None).to_dict("records")
+        db.execute(statement, records)
+    db.commit()
+    return len(rows)
+
+
 @router.post("/upload")
 async def upload_results(
     excel_file: UploadFile = File(...),
     config_file: Optional[UploadFile] = File(None),
-    db: Session = Depends(get_db),
     _=Depends(get_admin_user)
 ):
     """Upload an Excel file and optional JSON mapping config. Admin only."""
     try:
         content = await excel_file.read()
         excel_buf = io.BytesIO(content)
-        # Read Excel into DataFrame
-        df = pd.read_excel(excel_buf)
+        # Read Excel into DataFrame (openpyxl parsing is CPU-bound)
+        df = await run_in_process(pd.read_excel, excel_buf)
+    except PoolBusyError:
+        # Saturated pool or a worker that died (WorkerLostError): 503, not a bad file
+        raise
     except Exception as e:
         logger.error(f"Failed to read Excel file: {e}")
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid Excel file")
 
     # Default mapping: look for obvious column names
-    mapping = {
-        "name": None,
-        "phone": None,
-        "percentage": None,
-        "rank": None,
-        "scholarship": None
-    }
+    mapping = dict.fromkeys(RESULT_FIELDS)
 
     if config_file:
         try:
@@ -72,73 +159,18 @@ async def upload_results(
     # Ensure required mappings exist
     if not mapping["name"] or not mapping["phone"]:
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Mapping must include at least 'name' and 'phone' columns")
+    missing = [mapping[field] for field in RESULT_FIELDS if mapping.get(field) and mapping[field] not in df.columns]
+    if missing:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=f"Mapped columns not found in the sheet: {', '.join(map(str, missing))}")
 
-    inserted = 0
-    source_filename = excel_file.filename
-    for _, row in df.iterrows():
-        try:
-            name = str(row.get(mapping["name"]) or "").strip()
-            raw_phone = row.get(mapping["phone"])
-            # Normalize phone to digits-only string. Handle numeric Excel cells.
-            if pd.isna(raw_phone):
-                phone = ""
-            elif isinstance(raw_phone, (int,)) or (isinstance(raw_phone, float) and float(raw_phone).is_integer()):
-                phone = str(int(raw_phone))
-            else:
-                phone = ''.join(re.findall(r"\d+", str(raw_phone)))
-            phone = phone.strip()
-            percentage = None
-            rank = None
-            if mapping.get("percentage"):
-                try:
-                    percentage = float(row.get(mapping["percentage"]) or None)
-                except Exception:
-                    percentage = None
-            if mapping.get("rank"):
-                try:
-                    rank = int(row.get(mapping["rank"]) or None)
-                except Exception:
-                    rank = None
-            
-            scholarship = None
-            if mapping.get("scholarship"):
-                try:
-                    raw_scholarship = row.get(mapping["scholarship"])
-                    
-                    # Handle fractional value
-                    if isinstance(raw_scholarship, float) and 0 < raw_scholarship < 1:
-                        raw_scholarship = raw_scholarship * 100
-                                        
-                    # print(f"Raw scholarship value: {raw_scholarship} (type: {type(raw_scholarship)})")
-                    if pd.notna(raw_scholarship):
-                        # Handle "90%" format - strip % and convert to float
-                        scholarship_str = str(raw_scholarship).strip().rstrip('%')
-                        scholarship = float(scholarship_str)
-                except Exception:
-                    scholarship = None
-
-            if not name or not phone:
-                continue
-
-            entry = StudentResult(
-                name=name,
-                phone=phone,
-                percentage=percentage,
-                rank=rank,
-                scholarship=scholarship,
-                source_file=source_filename
-            )
-            db.add(entry)
-            inserted += 1
-        except Exception as e:
-            logger.warning(f"Skipping row due to error: {e}")
-
-    db.commit()
-    return {"inserted": inserted}
+    rows, skipped = await run_in_thread(_normalize_results, df, mapping)
+    inserted = await run_in_session(_insert_results, rows, excel_file.filename, factory=ResultsSessionLocal)
+    logger.info(f"Imported {inserted} results from {excel_file.filename}, skipped {skipped}")
+    return {"inserted": inserted, "skipped": skipped}
 
 
 @router.get("/admin", response_model=List[dict])
-def list_results_admin(db: Session = Depends(get_db), _=Depends(get_admin_user)):
+def list_results_admin(db: Session = Depends(get_results_db), _=Depends(get_admin_user)):
     """Return all imported results (admin only)."""
     rows = db.query(StudentResult).order_by(StudentResult.id.desc()).all()
     return [
@@ -157,7 +189,7 @@ def list_results_admin(db: Session = Depends(get_db), _=Depends(get_admin_user))
 
 
 @router.delete("/admin/truncate")
-def truncate_results_admin(db: Session = Depends(get_db), _=Depends(get_admin_user)):
+def truncate_results_admin(db: Session = Depends(get_results_db), _=Depends(get_admin_user)):
     """Delete all imported results (admin only)."""
     deleted = db.query(StudentResult).delete(synchronize_session=False)
     db.commit()
@@ -182,8 +214,12 @@ def _fuzzy_name_match(submitted_name: str, db_name: str, threshold: int = 85) ->
     return _get_fuzzy_score(submitted_name, db_name) >= threshold
 
 
+def _find_by_phone(db: Session, phone: str) -> List[StudentResult]:
+    return db.query(StudentResult).filter(StudentResult.phone == phone).all()
+
+
 @router.get("/search")
-def search_result(name: Optional[str] = None, phone: Optional[str] = None, db: Session = Depends(get_db)):
+async def search_result(name: Optional[str] = None, phone: Optional[str] = None):
     """Search for a student result by name and/or phone (public).
     
     Strategy:
@@ -200,7 +236,7 @@ def search_result(name: Optional[str] = None, phone: Optional[str] = None, db: S
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Phone number is required")
     
     # Step 1: Find all records by phone number
-    all_phone_results = db.query(StudentResult).filter(StudentResult.phone == norm_phone).all()
+    all_phone_results = await run_in_session(_find_by_phone, norm_phone, factory=ResultsSessionLocal)
     
     if not all_phone_results:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Result not found")
@@ -0,0 +1,222 @@
+"""Pool of authenticated SMTP sessions shared by all email sends.
+
+Opening a session to Gmail costs a TCP connect, STARTTLS and AUTH, which
+used to happen for every message. The pool keeps up to ``size`` logged-in
+sessions around, checks long-idle ones with NOOP before reuse, retires
+them after ``max_age`` seconds and reconnects transparently when the
+server has dropped a session.
+"""
+
+from contextlib import contextmanager
+from typing import Iterator, List
+import logging
+import smtplib
+import threading
+import time
+
+logger = logging.getLogger("smtp_pool")
+
+
+class _PooledSession:
+    """An authenticated SMTP session plus bookkeeping timestamps."""
+
+    def __init__(self, smtp: smtplib.SMTP):
+        self.smtp = smtp
+        self.created_at = time.monotonic()
+        self.last_used = self.created_at
+
+
+class SMTPPool:
+    """
+    Bounded pool of logged-in SMTP sessions.
+
+    Args:
+        host: SMTP server host
+        port: SMTP server port (STARTTLS)
+        username: Login user
+        password: Login password
+        size: Maximum sessions open at once
+        max_age: Seconds after which a session is closed instead of reused
+        noop_after: Idle seconds after which a session is checked with NOOP
+        timeout: Socket timeout and maximum wait for a free session
+        starttls: Upgrade the connection with STARTTLS before logging in
+    """
+
+    def __init__(
+        self,
+        host: str,
+        port: int,
+        username: str,
+        password: str,
+        size: int = 4,
+        max_age: float = 240,
+        noop_after: float = 10,
+        timeout: float = 10,
+        starttls: bool = True,
+    ):
+        self.host = host
+        self.port = port
+        self.username = username
+        self.password = password
+        self.size = size
+        self.max_age = max_age
+        self.noop_after = noop_after
+        self.timeout = timeout
+        self.starttls = starttls
+
+        self._idle: List[_PooledSession] = []
+        self._slots = threading.BoundedSemaphore(size)
+        self._lock = threading.Lock()
+        self._opened = 0
+        self._reused = 0
+        self._discarded = 0
+
+    def _connect(self) -> _PooledSession:
+        smtp = smtplib.SMTP(self.host, self.port, timeout=self.timeout)
+        try:
+            if self.starttls:
+                smtp.starttls()
+            if self.username:
+                smtp.login(self.username, self.password)
+        except BaseException:
+            self._close(smtp)
+            raise
+        with self._lock:
+            self._opened += 1
+        logger.debug(f"Opened SMTP session to {self.host}:{self.port}")
+        return _PooledSession(smtp)
+
+    @staticmethod
+    def _close(smtp: smtplib.SMTP) -> None:
+        try:
+            smtp.quit()
+        except Exception:
+            smtp.close()
+
+    def _discard(self, session: _PooledSession) -> None:
+        with self._lock:
+            self._discarded += 1
+        self._close(session.smtp)
+
+    def _is_usable(self, session: _PooledSession) -> bool:
+        now = time.monotonic()
+        if now - session.created_at > self.max_age:
+            return False
+        if now - session.last_used > self.noop_after:
+            try:
+                return session.smtp.noop()[0] == 250
+            except (smtplib.SMTPException, OSError):
+                return False
+        return True
+
+    @staticmethod
+    def _keeps_session(error: BaseException) -> bool:
+        """Whether a session is still usable after an error raised while sending on it."""
+        # Checked in this order because SMTPException subclasses OSError
+        if isinstance(error, smtplib.SMTPServerDisconnected):
+            return False
+        if isinstance(error, smtplib.SMTPResponseException):
+            # 421: server is closing the channel
+            return error.smtp_code != 421
+        # Other SMTP errors (e.g. all recipients refused) leave the session fine;
+        # socket errors and anything else don't
+        return isinstance(error, smtplib.SMTPException)
+
+    def _acquire(self, fresh: bool = False) -> tuple:
+        """Take a free slot and return (session, reused); fresh skips the idle sessions."""
+        if not self._slots.acquire(timeout=self.timeout):
+            raise smtplib.SMTPException("Timed out waiting for a free SMTP session")
+        try:
+            while True:
+                with self._lock:
+                    session = self._idle.pop() if self._idle and not fresh else None
+                if session is None:
+                    return self._connect(), False
+                if self._is_usable(session):
+                    with self._lock:
+                        self._reused += 1
+                    return session, True
+                self._discard(session)
+        except BaseException:
+            self._slots.release()
+            raise
+
+    def _release(self, session: _PooledSession, keep: bool) -> None:
+        try:
+            if keep:
+                session.last_used = time.monotonic()
+                with self._lock:
+                    self._idle.append(session)
+            else:
+                self._discard(session)
+        finally:
+            self._slots.release()
+
+    @contextmanager
+    def session(self) -> Iterator[smtplib.SMTP]:
+        """
+        Borrow one session for any number of messages.
+
+        The session goes back to the pool afterwards unless the connection
+        failed, in which case it is closed.
+        """
+        session, _ = self._acquire()
+        keep = True
+        try:
+            yield session.smtp
+        except BaseException as e:
+            keep = self._keeps_session(e)
+            raise
+        finally:
+            self._release(session, keep)
+
+    def sendmail(self, sender: str, recipient: str, message: bytes) -> None:
+        """
+        Send one message on a pooled session.
+
+        ``message`` is passed to smtplib as is: CRLF-terminated bytes, or
+        a str that smtplib converts itself.
+
+        If a reused session turns out to have been dropped by the server,
+        the message is retried once on a fresh connection.
+
+        Raises:
+            smtplib.SMTPException: On delivery failure
+        """
+        session, reused = self._acquire()
+        while True:
+            try:
+                session.smtp.sendmail(sender, recipient, message)
+            except smtplib.SMTPServerDisconnected:
+                self._release(session, keep=False)
+                if not reused:
+                    raise
+                logger.info("Pooled SMTP session was dropped by the server, reconnecting")
+                # A new connection: another idle session may be just as stale
+                session, reused = self._acquire(fresh=True)
+                continue
+            except BaseException as e:
+                self._release(session, keep=self._keeps_session(e))
+                raise
+            self._release(session, keep=True)
+            return
+
+    def stats(self) -> dict:
+        """Return session counters for the health endpoint."""
+        with self._lock:
+            return {
+                "size": self.size,
+                "idle": len(self._idle),
+                "opened": self._opened,
+                "reused": self._reused,
+                "discarded": self._discarded,
+            }
+
+    def close_all(self) -> None:
+        """Close every idle session; called on application shutdown."""
+        with self._lock:
+            idle, self._idle = self._idle, []
+        for session in idle:
+            self._close(session.smtp)
+        if idle:
+            logger.info(f"Closed {len(idle)} idle SMTP sessions")
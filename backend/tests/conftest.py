@@ -0,0 +1,46 @@
+"""Shared test setup.
+
+The backend modules build their engines and stores from the settings at
+import time, so the databases are pointed at a throwaway directory here,
+before any of them is imported.
+"""
+
+from pathlib import Path
+import os
+import shutil
+import sys
+import tempfile
+
+import pytest
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(BACKEND_DIR))
+
+DATA_DIR = Path(tempfile.mkdtemp(prefix="pw-reg-tests-"))
+os.environ["DATABASE_URL"] = f"sqlite:///{DATA_DIR / 'app.db'}"
+os.environ["RESULTS_DATABASE_URL"] = f"sqlite:///{DATA_DIR / 'results.db'}"
+os.environ["OTP_STORE_PATH"] = str(DATA_DIR / "otp.db")
+os.environ["RATE_LIMIT_STORE_PATH"] = str(DATA_DIR / "rate_limit.db")
+
+
+@pytest.fixture(scope="session", autouse=True)
+def databases():
+    """Create both databases once for the session, and remove them afterwards."""
+    import migrations
+
+    migrations.migrate_results()
+    migrations.migrate()
+    yield
+    shutil.rmtree(DATA_DIR, ignore_errors=True)
+
+
+@pytest.fixture
+def db():
+    """A session on the main database."""
+    from database import SessionLocal
+
+    session = SessionLocal()
+    try:
+        yield session
+    finally:
+        session.close()
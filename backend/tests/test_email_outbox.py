@@ -0,0 +1,82 @@
+"""Tests for claiming due messages in the email outbox."""
+
+from datetime import datetime, timedelta
+import uuid
+
+import pytest
+
+from email_outbox import EmailOutbox
+from models import OutboxEmail
+
+
+@pytest.fixture
+def outbox(db):
+    db.query(OutboxEmail).delete()
+    db.commit()
+    yield EmailOutbox()
+    db.query(OutboxEmail).delete()
+    db.commit()
+
+
+def add(db, recipient: str, minutes_ago: float = 0, status: str = "pending", due_in: float = 0) -> int:
+    now = datetime.utcnow()
+    message = OutboxEmail(
+        public_id=uuid.uuid4().hex,
+        kind="otp",
+        recipient=recipient,
+        payload="123456",
+        status=status,
+        next_attempt_at=now + timedelta(seconds=due_in),
+        created_at=now - timedelta(minutes=minutes_ago),
+    )
+    db.add(message)
+    db.commit()
+    return message.id
+
+
+def status_of(db, message_id: int) -> tuple:
+    db.expire_all()
+    message = db.get(OutboxEmail, message_id)
+    return message.status, message.payload
+
+
+def test_claims_due_message(db, outbox):
+    message_id = add(db, "a@example.com")
+
+    claimed = outbox._claim_due()
+    assert claimed == [(message_id, "otp", "a@example.com", "123456", 0)]
+    assert status_of(db, message_id) == ("sending", "123456")
+    # Leased: a second worker finds nothing to claim
+    assert outbox._claim_due() == []
+
+
+def test_expired_otp_is_settled_not_sent(db, outbox):
+    expired_id = add(db, "a@example.com", minutes_ago=outbox.settings.otp_expiry_minutes + 1)
+
+    assert outbox._claim_due() == []
+    assert status_of(db, expired_id) == ("expired", None)
+
+
+def test_older_otp_is_superseded(db, outbox):
+    older_id = add(db, "a@example.com", minutes_ago=1)
+    newer_id = add(db, "a@example.com")
+    other_id = add(db, "b@example.com", minutes_ago=1)
+
+    claimed_ids = {row[0] for row in outbox._claim_due()}
+    assert claimed_ids == {newer_id, other_id}
+    assert status_of(db, older_id) == ("superseded", None)
+
+
+def test_not_yet_due_message_is_left_alone(db, outbox):
+    message_id = add(db, "a@example.com", due_in=60)
+
+    assert outbox._claim_due() == []
+    assert status_of(db, message_id) == ("pending", "123456")
+
+
+def test_lapsed_lease_is_claimed_again(db, outbox):
+    held_id = add(db, "a@example.com", status="sending", due_in=60)
+    lapsed_id = add(db, "b@example.com", status="sending", due_in=-1)
+
+    assert [row[0] for row in outbox._claim_due()] == [lapsed_id]
+    assert status_of(db, held_id) == ("sending", "123456")
@@ -0,0 +1,85 @@
+"""Tests for the versioned migrations."""
+
+from sqlalchemy import create_engine, inspect, text
+import pytest
+
+from database import Base, results_engine
+from models import StudentResult
+import migrations
+
+
+@pytest.fixture
+def engine(tmp_path):
+    db_engine = create_engine(f"sqlite:///{tmp_path / 'app.db'}")
+    yield db_engine
+    db_engine.dispose()
+
+
+def versions(db_engine) -> list:
+    with db_engine.connect() as conn:
+        return [row[0] for row in conn.execute(text("SELECT version FROM schema_version ORDER BY version"))]
+
+
+def columns(db_engine, table: str) -> set:
+    return {column["name"] for column in inspect(db_engine).get_columns(table)}
+
+
+def migrate(db_engine) -> int:
+    return migrations._migrate(db_engine, Base.metadata, migrations.MIGRATIONS, "users")
+
+
+def test_fresh_database_is_stamped_without_running_steps(engine, monkeypatch):
+    ran = []
+    steps = [(version, description, lambda conn, v=version: ran.append(v))
+             for version, description, _ in migrations.MIGRATIONS]
+    monkeypatch.setattr(migrations, "MIGRATIONS", steps)
+
+    latest = steps[-1][0]
+    assert migrate(engine) == latest
+    assert ran == []
+    assert versions(engine) == [version for version, _, _ in steps]
+    assert set(Base.metadata.tables) <= set(inspect(engine).get_table_names())
+
+    # Already current: nothing is recorded twice
+    assert migrate(engine) == latest
+    assert versions(engine) == [version for version, _, _ in steps]
+
+
+def test_unversioned_database_runs_every_step(engine):
+    # The schema as the startup code of old releases left it
+    Base.metadata.create_all(bind=engine)
+    StudentResult.__table__.create(bind=engine)
+    with engine.begin() as conn:
+        for table, column in [
+            ("registrations", "exam_time"),
+            ("registrations", "admit_card_sent"),
+            ("registrations", "current_class"),
+            ("otp_codes", "failed_attempts"),
+            ("bulk_send_jobs", "locked_by"),
+            ("bulk_send_jobs", "locked_until"),
+            ("student_results", "scholarship"),
+        ]:
+            conn.execute(text(f"ALTER TABLE {table} DROP COLUMN {column}"))
+        conn.execute(text("DROP INDEX ix_email_outbox_recipient_created"))
+        conn.execute(text(
+            "INSERT INTO student_results (id, name, phone, percentage, rank) "
+            "VALUES (900001, 'Asha', '9876543210.0', 91.5, 1)"
+        ))
+
+    try:
+        assert migrate(engine) == migrations.MIGRATIONS[-1][0]
+        assert versions(engine) == [version for version, _, _ in migrations.MIGRATIONS]
+        assert {"exam_time", "admit_card_sent", "current_class"} <= columns(engine, "registrations")
+        assert "failed_attempts" in columns(engine, "otp_codes")
+        assert {"locked_by", "locked_until"} <= columns(engine, "bulk_send_jobs")
+        assert "ix_email_outbox_recipient_created" in {
+            index["name"] for index in inspect(engine).get_indexes("email_outbox")
+        }
+        # Results were normalized, moved to the results database and dropped here
+        assert not inspect(engine).has_table("student_results")
+        with results_engine.connect() as conn:
+            phone = conn.execute(text("SELECT phone FROM student_results WHERE id = 900001")).scalar()
+        assert phone == "9876543210"
+    finally:
+        with results_engine.begin() as conn:
+            conn.execute(text("DELETE FROM student_results WHERE id = 900001"))
@@ -0,0 +1,79 @@
+"""Tests for the GCRA rate limiter."""
+
+import pytest
+
+import rate_limit
+from rate_limit import LocalRateLimiter
+
+
+class Clock:
+    """Stand-in for time.monotonic that only moves when told to."""
+
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    fake = Clock()
+    monkeypatch.setattr(rate_limit.time, "monotonic", fake)
+    return fake
+
+
+def test_burst_then_refused(clock):
+    limiter = LocalRateLimiter(max_keys=100)
+    assert [limiter.hit("ip", 5, 60) for _ in range(5)] == [0.0] * 5
+    # The sixth waits one interval (60 / 5 seconds)
+    assert limiter.hit("ip", 5, 60) == pytest.approx(12.0)
+
+
+def test_refills_one_call_per_interval(clock):
+    limiter = LocalRateLimiter(max_keys=100)
+    for _ in range(5):
+        limiter.hit("ip", 5, 60)
+
+    clock.now += 11.9
+    assert limiter.hit("ip", 5, 60) == pytest.approx(0.1)
+    clock.now += 0.1
+    assert limiter.hit("ip", 5, 60) == 0.0
+    assert limiter.hit("ip", 5, 60) > 0
+
+    # After a full period the whole burst is available again
+    clock.now += 60
+    assert [limiter.hit("ip", 5, 60) for _ in range(5)] == [0.0] * 5
+    assert limiter.hit("ip", 5, 60) > 0
+
+
+def test_refused_calls_do_not_count(clock):
+    limiter = LocalRateLimiter(max_keys=100)
+    for _ in range(5):
+        limiter.hit("ip", 5, 60)
+    for _ in range(10):
+        limiter.hit("ip", 5, 60)
+
+    clock.now += 12
+    assert limiter.hit("ip", 5, 60) == 0.0
+
+
+def test_keys_are_independent(clock):
+    limiter = LocalRateLimiter(max_keys=100)
+    for _ in range(5):
+        limiter.hit("a", 5, 60)
+    assert limiter.hit("a", 5, 60) > 0
+    assert limiter.hit("b", 5, 60) == 0.0
+
+
+def test_key_cap_evicts_least_recently_seen(clock):
+    limiter = LocalRateLimiter(max_keys=2)
+    limiter.hit("a", 1, 60)
+    limiter.hit("b", 1, 60)
+    limiter.hit("a", 1, 60)  # Refused, but still marks "a" as recently seen
+    limiter.hit("c", 1, 60)
+
+    assert limiter.stats()["keys"] == 2
+    assert limiter.evictions == 1
+    # "b" was dropped, so it starts over with a full burst
+    assert limiter.hit("b", 1, 60) == 0.0
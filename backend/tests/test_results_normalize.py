@@ -0,0 +1,90 @@
+"""Tests for the Excel results ingest in routers.results_routes."""
+
+import pandas as pd
+import pytest
+
+from routers.results_routes import _normalize_results
+
+MAPPING = {"name": "Name", "phone": "Phone", "percentage": "Pct", "rank": "Rank", "scholarship": "Sch"}
+
+
+def normalize(rows: dict, mapping: dict = MAPPING):
+    return _normalize_results(pd.DataFrame(rows), mapping)
+
+
+def test_phone_float_and_text_drop_trailing_zero():
+    rows, skipped = normalize({
+        "Name": ["Asha", "Ravi", "Meena"],
+        "Phone": [9876543210.0, "9876543211.0", "+91 98765-43212"],
+        "Pct": [91.5, 80, 70],
+        "Rank": [1, 2, 3],
+        "Sch": [None, None, None],
+    })
+    assert list(rows["phone"]) == ["9876543210", "9876543211", "919876543212"]
+    assert skipped == {"missing_name": 0, "missing_phone": 0}
+
+
+def test_numeric_phone_column():
+    rows, _ = normalize({"Name": ["Asha", "Ravi"], "Phone": [9876543210.0, 9876543211.0]}, {"name": "Name", "phone": "Phone"})
+    assert list(rows["phone"]) == ["9876543210", "9876543211"]
+
+
+def test_scholarship_percent_text_and_fractions():
+    rows, _ = normalize({
+        "Name": ["A", "B", "C", "D", "E"],
+        "Phone": ["1", "2", "3", "4", "5"],
+        "Pct": [1, 2, 3, 4, 5],
+        "Rank": [1, 2, 3, 4, 5],
+        "Sch": ["90%", " 25 % ", 0.9, 50, "n/a"],
+    })
+    scholarship = list(rows["scholarship"])
+    assert scholarship[:4] == [90.0, 25.0, 90.0, 50.0]
+    assert pd.isna(scholarship[4])
+
+
+def test_zero_values_are_kept():
+    rows, _ = normalize({
+        "Name": ["Asha"],
+        "Phone": ["9876543210"],
+        "Pct": [0],
+        "Rank": [0],
+        "Sch": [0],
+    })
+    row = rows.iloc[0]
+    assert row["percentage"] == 0
+    assert row["rank"] == 0
+    assert row["scholarship"] == 0
+
+
+def test_unparseable_numbers_become_null():
+    rows, _ = normalize({
+        "Name": ["Asha"],
+        "Phone": ["9876543210"],
+        "Pct": ["absent"],
+        "Rank": ["-"],
+        "Sch": [None],
+    })
+    row = rows.iloc[0]
+    assert pd.isna(row["percentage"])
+    assert pd.isna(row["rank"])
+    assert pd.isna(row["scholarship"])
+
+
+def test_skip_counts():
+    rows, skipped = normalize({
+        "Name": ["Asha", "", None, "Ravi", "Meena", "Kiran"],
+        "Phone": ["9876543210", "9876543211", "9876543212", "", "n/a", 98765.5],
+        "Pct": [1, 2, 3, 4, 5, 6],
+        "Rank": [1, 2, 3, 4, 5, 6],
+        "Sch": [None] * 6,
+    })
+    assert list(rows["name"]) == ["Asha"]
+    # Nameless rows count once, as missing_name, even without a phone
+    assert skipped == {"missing_name": 2, "missing_phone": 3}
+
+
+@pytest.mark.parametrize("field", ["percentage", "rank", "scholarship"])
+def test_optional_columns_may_be_unmapped(field):
+    mapping = {key: value for key, value in MAPPING.items() if key != field}
+    rows, _ = normalize({"Name": ["Asha"], "Phone": ["9876543210"], "Pct": [1], "Rank": [1], "Sch": [1]}, mapping)
+    assert pd.isna(rows.iloc[0][field])
@@ -0,0 +1,86 @@
+"""Tests for verifying an OTP and logging in, with each OTP store."""
+
+import sqlite3
+import uuid
+
+import pytest
+from sqlalchemy.exc import OperationalError
+
+from config import get_settings
+from models import User
+from otp_store import create_otp_store
+from routers import auth_routes
+import otp_service
+
+CODE = "123456"
+
+
+@pytest.fixture(params=["memory", "sqlite", "database"])
+def store(request, tmp_path, monkeypatch):
+    settings = get_settings().model_copy(update={
+        "otp_store": request.param,
+        "otp_store_path": str(tmp_path / "otp.db"),
+    })
+    otp_store = create_otp_store(settings)
+    monkeypatch.setattr(otp_service, "otp_store", otp_store)
+    monkeypatch.setattr(auth_routes, "otp_store", otp_store)
+    return otp_store
+
+
+@pytest.fixture
+def email(db, store):
+    """A new address with a pending OTP."""
+    address = f"{uuid.uuid4().hex[:12]}@example.com"
+    assert auth_routes._store_and_queue_otp(db, address, CODE)
+    return address
+
+
+def is_verified(db, email: str) -> bool:
+    db.expire_all()
+    return db.query(User).filter(User.email == email).one().is_verified
+
+
+def test_right_code_logs_in_once(db, email):
+    user_id = auth_routes._verify_and_login(db, email, CODE)
+
+    assert user_id == db.query(User.id).filter(User.email == email).scalar()
+    assert is_verified(db, email)
+    # Consumed
+    assert auth_routes._verify_and_login(db, email, CODE) is None
+
+
+def test_wrong_code_is_refused(db, email):
+    assert auth_routes._verify_and_login(db, email, "000000") is None
+    assert not is_verified(db, email)
+    # The right code still works afterwards
+    assert auth_routes._verify_and_login(db, email, CODE)
+
+
+def test_too_many_wrong_codes_invalidate_the_otp(db, email, store):
+    for _ in range(store.max_failed_attempts):
+        assert auth_routes._verify_and_login(db, email, "000000") is None
+    assert auth_routes._verify_and_login(db, email, CODE) is None
+    assert not is_verified(db, email)
+
+
+def test_unknown_email_is_refused(db, store):
+    assert auth_routes._verify_and_login(db, "nobody@example.com", CODE) is None
+
+
+def test_locked_database_is_retried(db, email, monkeypatch):
+    mark_user_verified = auth_routes.mark_user_verified
+    calls = []
+
+    def locked_once(session, address):
+        calls.append(address)
+        if len(calls) == 1:
+            raise OperationalError("UPDATE users", {}, sqlite3.OperationalError("database is locked"))
+        return mark_user_verified(session, address)
+
+    monkeypatch.setattr(auth_routes, "mark_user_verified", locked_once)
+
+    # The OTP is consumed once however the retry is done for this store
+    assert auth_routes._verify_and_login(db, email, CODE)
+    assert len(calls) == 2
+    assert is_verified(db, email)
+    assert auth_routes._verify_and_login(db, email, CODE) is None
@@ -40,6 +40,8 @@ client.interceptors.response.use(
 export const authAPI = {
   // sendOTP now accepts a payload object: { email, admin?, admin_token? }
   sendOTP: (payload) => client.post('/auth/send-otp', payload),
+  // Delivery status of a queued OTP email: pending | sent | failed | expired
+  getOTPDeliveryStatus: (deliveryId) => client.get(`/auth/otp-delivery/${deliveryId}`),
   verifyOTP: (email, otp) => client.post('/auth/verify-otp', { email, otp }),
   getCurrentUser: () => client.get('/auth/me')
 }
@@ -61,7 +63,11 @@ export const adminAPI = {
   downloadAdmitCard: (userId) => client.get(`/admin/users/${userId}/admit-card`, { responseType: 'blob' }),
   sendAdmitCard: (userId) => client.post(`/admin/users/${userId}/send-admit-card`),
   deleteUser: (userId) => client.delete(`/admin/users/${userId}`),
+  // Bulk send runs as a background job: resolves with { job_id, total }
   bulkSendAdmitCards: (userIds) => client.post('/admin/users/bulk-send', { user_ids: userIds }),
+  listBulkJobs: () => client.get('/admin/bulk-jobs'),
+  getBulkJob: (jobId, items = false) => client.get(`/admin/bulk-jobs/${jobId}`, { params: { items } }),
+  cancelBulkJob: (jobId) => client.post(`/admin/bulk-jobs/${jobId}/cancel`),
   bulkDeleteUsers: (userIds) => client.post('/admin/users/bulk-delete', { user_ids: userIds })
 }
 